@@ -0,0 +1,1541 @@
+"""
+Benchmarks for the Dennis Assistant subsystems.
+
+Run one benchmark at a time, for example:
+    python benchmarks.py file-index --files 1000000
+"""
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import tracemalloc
+import tempfile
+import time
+import types
+import wave
+import zipfile
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+import speech_recognition as sr
+
+from main import (DEFAULT_CONFIG, SYSTEM_INSTRUCTION, AssistantDaemon, ChatTranscript, ConversationMemory,
+                  ContentIndex, ContinuousListener, DennisAssistant, DennisAssistantUI, DocumentReader, FileIndex,
+                  FuzzyIndex, IntentRouter, LAZY_MODULES, LatencyRecorder, LocationService, ModelSession,
+                  RecognizerBackend, RequestPipeline, ResponseCache, TaskRegistry,
+                  UIMessageQueue, WavFileSource, WeatherProvider, content_tokens, document_pieces,
+                  make_recognizer_backend, should_skip_dir)
+
+
+def make_assistant(base, cls=DennisAssistant, message_queue=None, file_index=None, location=None, **config):
+    """An assistant whose caches, indexes and settings all live in the temporary directory base
+
+    Keyword arguments override DEFAULT_CONFIG, with warm-up and streaming off.
+    """
+    config = dict(DEFAULT_CONFIG, **{"warm_up": False, "stream_responses": False, **config})
+    return cls(queue.Queue() if message_queue is None else message_queue,
+               file_index or FileIndex(os.path.join(base, "index.db"), roots=[base]), config,
+               location or LocationService(path=os.path.join(base, "location.json")), data_dir=base)
+
+
+def timed(func, *args, repeat=1):
+    """Run func repeat times and return (last result, list of durations in ms)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, durations
+
+
+def generate_tree(base, file_count, files_per_dir=1000, dirs_per_level=32):
+    """Create file_count empty files spread over a two level directory tree"""
+    created = 0
+    dir_number = 0
+    while created < file_count:
+        parent = os.path.join(base, f"group_{dir_number // dirs_per_level:04d}", f"dir_{dir_number:05d}")
+        os.makedirs(parent, exist_ok=True)
+        for i in range(min(files_per_dir, file_count - created)):
+            open(os.path.join(parent, f"file_{dir_number:05d}_{i:04d}.txt"), 'w').close()
+        created += files_per_dir
+        dir_number += 1
+
+
+def walk_lookup(root_dir, target_name):
+    """The original search: walk the whole tree until the name shows up"""
+    for root, dirs, files in os.walk(root_dir, topdown=True):
+        dirs[:] = [d for d in dirs if not should_skip_dir(root, d)]
+        if target_name in files:
+            return os.path.join(root, target_name)
+    return None
+
+
+def bench_file_index(args):
+    base = args.dir or tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        if not os.listdir(base):
+            print(f"Generating {args.files} files in {base}...")
+            _, gen_ms = timed(generate_tree, base, args.files)
+            print(f"  generated in {gen_ms[0] / 1000:.1f}s")
+
+        # The last directory holds the file the walk reaches last
+        last_group = sorted(os.listdir(base))[-1]
+        last_dir = sorted(os.listdir(os.path.join(base, last_group)))[-1]
+        target = sorted(os.listdir(os.path.join(base, last_group, last_dir)))[0]
+
+        index = FileIndex(db_path=os.path.join(base + "_index", "index.db"), roots=[base])
+        _, build_ms = timed(index.build)
+        print(f"Index build: {build_ms[0] / 1000:.2f}s")
+
+        walk_result, walk_ms = timed(walk_lookup, base, target, repeat=args.walk_repeat)
+        index_result, exact_ms = timed(index.find, target, 'file', repeat=args.repeat)
+        _, nocase_ms = timed(index.lookup, target.upper(), 'file', "nocase", repeat=args.repeat)
+        _, prefix_ms = timed(index.lookup, target[:10], 'file', "prefix", repeat=args.repeat)
+        assert walk_result and index_result and walk_result == index_result[0]
+
+        print(f"os.walk lookup:      median {statistics.median(walk_ms):10.2f} ms")
+        print(f"index exact lookup:  median {statistics.median(exact_ms):10.3f} ms")
+        print(f"index nocase lookup: median {statistics.median(nocase_ms):10.3f} ms")
+        print(f"index prefix lookup: median {statistics.median(prefix_ms):10.3f} ms")
+        print(f"Speedup: {statistics.median(walk_ms) / statistics.median(exact_ms):,.0f}x")
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(base, ignore_errors=True)
+            shutil.rmtree(base + "_index", ignore_errors=True)
+
+
+WORDS = ("report", "budget", "lab", "assignment", "invoice", "notes", "project", "final",
+         "draft", "summary", "meeting", "thesis", "resume", "photo", "scan", "quarter",
+         "design", "review", "lecture", "slides", "data", "analysis", "plan", "letter")
+EXTENSIONS = (".pdf", ".docx", ".txt", ".xlsx", ".pptx", ".png", ".py", ".md")
+
+
+def synthetic_names(count, seed=42):
+    """Generate count unique file names in the styles people actually use"""
+    rng = random.Random(seed)
+    styles = ("{a}_{b}_{n}{e}", "{A} {B} {n}{e}", "{A}{B}{n}{e}", "{a}-{b}-{c}-{n}{e}")
+    names = set()
+    while len(names) < count:
+        a, b, c = rng.sample(WORDS, 3)
+        names.add(rng.choice(styles).format(a=a, b=b, c=c, A=a.title(), B=b.title(),
+                                            n=rng.randint(1, 99999), e=rng.choice(EXTENSIONS)))
+    return list(names)
+
+
+def perturb(name, rng):
+    """Make the kind of mistake the model makes when passing a name along"""
+    stem, ext = os.path.splitext(name)
+    choice = rng.randrange(4)
+    if choice == 0:
+        return stem.upper()
+    if choice == 1:
+        return stem.replace("_", " ").replace("-", " ")
+    if choice == 2:
+        return stem.replace(" ", "").replace("_", "").lower() + ext
+    # One dropped character in the middle
+    i = rng.randrange(1, max(2, len(stem) - 1))
+    return stem[:i] + stem[i + 1:] + ext
+
+
+def bench_fuzzy(args):
+    print(f"Generating {args.names} names...")
+    names = synthetic_names(args.names)
+    index = FuzzyIndex(strip_extension=True)
+    _, build_ms = timed(lambda: [index.add(n, n) for n in names])
+    print(f"Index build: {build_ms[0] / 1000:.1f}s for {len(index)} keys")
+
+    rng = random.Random(7)
+    hits = 0
+    latencies = []
+    for target in rng.sample(names, args.queries):
+        query = perturb(target, rng)
+        results, ms = timed(index.search, query, args.k)
+        latencies.extend(ms)
+        if any(target in payloads for _, payloads in results):
+            hits += 1
+
+    latencies.sort()
+    print(f"recall@{args.k}: {hits / args.queries:.1%}")
+    print(f"latency p50 {statistics.median(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms, max {latencies[-1]:.2f} ms")
+
+
+def intent(task, operation="get", name=None, location=None, filetype=None):
+    return {"task": task, "operation": operation, "name": name, "location": location, "filetype": filetype}
+
+
+# Labeled utterances: the intent the router must produce, or None to leave it to the model
+ROUTER_CASES = [
+    ("What time is it?", intent("current_time")),
+    ("what's the time", intent("current_time")),
+    ("tell me the time please", intent("current_time")),
+    ("Dennis, what time is it right now", intent("current_time")),
+    ("today's date", intent("current_date")),
+    ("What is the date today?", intent("current_date")),
+    ("what date is it", intent("current_date")),
+    ("what day is it today", intent("current_day")),
+    ("which day is today", intent("current_day")),
+    ("what year is it", intent("current_year")),
+    ("where am I", intent("get_location")),
+    ("what's my location", intent("get_location")),
+    ("What's the weather in Lahore?", intent("get_weather", name="Lahore")),
+    ("how's the weather today", intent("get_weather")),
+    ("weather in New York", intent("get_weather", name="New York")),
+    ("open youtube.com", intent("open_url", "open", "https://youtube.com")),
+    ("go to www.github.com", intent("open_url", "open", "https://www.github.com")),
+    ("visit bbc.co.uk", intent("open_url", "open", "https://bbc.co.uk")),
+    ("create a folder Reports in C:\\Work", intent("create_folder", "create", "Reports", "C:\\Work")),
+    ("make a new folder called Lab 9", intent("create_folder", "create", "Lab 9")),
+    ("create a python file main", intent("create_file", "create", "main", filetype=".py")),
+    ("create a file called notes.txt in C:\\Notes", intent("create_file", "create", "notes", "C:\\Notes", ".txt")),
+    ("create a text file todo", intent("create_file", "create", "todo", filetype=".txt")),
+    ("create a file called budget", None),
+    ("what time is it in Tokyo", None),
+    ("tell me a joke", None),
+    ("what is the capital of France", None),
+    ("open my lab report", None),
+    ("how are you today", None),
+    ("explain recursion", None),
+    ("search the web for python tutorials", None),
+    ("open it", None),
+    ("read the pdf called thesis", None),
+    ("play some music", None),
+]
+
+
+def bench_router(args):
+    router = IntentRouter()
+    correct = routed = false_routes = 0
+    latencies = []
+    for utterance, expected in ROUTER_CASES:
+        result, ms = timed(router.route, utterance, repeat=args.repeat)
+        latencies.append(statistics.median(ms))
+        if result is not None:
+            routed += 1
+            false_routes += expected is None
+        correct += result == expected
+    latencies.sort()
+    print(f"accuracy: {correct}/{len(ROUTER_CASES)}, false routes: {false_routes}")
+    print(f"routed fraction: {routed / len(ROUTER_CASES):.0%}")
+    print(f"route latency p50 {statistics.median(latencies) * 1000:.1f} us, max {latencies[-1] * 1000:.1f} us")
+
+    # End to end against a stub model that answers after a fixed delay
+    class StubModelAssistant(DennisAssistant):
+        def request_model(self, user_input, history=()):
+            time.sleep(args.model_latency)
+            return json.dumps(dict(ROUTER_CASES).get(user_input) or {"response": "stub"})
+
+        def handle_developer_task(self, task_data):
+            return "done"
+
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        # Streaming off, so replies come from the stubbed request_model
+        assistant = make_assistant(base, StubModelAssistant)
+        assistant.response_cache = ResponseCache(os.path.join(base, "cache.json"), max_entries=0)
+        for use_router in (False, True):
+            if not use_router:
+                assistant.intent_router.route = lambda utterance: None
+            else:
+                assistant.intent_router = IntentRouter()
+            durations = []
+            for utterance, _ in ROUTER_CASES:
+                _, ms = timed(assistant.process_user_input, utterance)
+                durations.extend(ms)
+            label = "with router" if use_router else "model only "
+            print(f"end to end {label}: mean {statistics.mean(durations):7.1f} ms, "
+                  f"median {statistics.median(durations):7.1f} ms")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def bench_response_cache(args):
+    """Model calls and reply latency for repeated utterances; correctness is in tests/test_response_cache.py"""
+    model_calls = []
+
+    class StubCacheAssistant(DennisAssistant):
+        def request_model(self, user_input, history=()):
+            model_calls.append(user_input)
+            time.sleep(args.model_latency / 1000)
+            if "time" in user_input:
+                return json.dumps({"task": "current_time", "operation": None, "name": None, "path": None})
+            return json.dumps({"response": "The printing press was invented around 1440."})
+
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        assistant = make_assistant(base, StubCacheAssistant)
+        # Send everything to the model, as utterances the router does not know would be
+        assistant.intent_router.route = lambda utterance: None
+
+        for utterance in ("who invented the printing press", "tell me the current time"):
+            model_calls.clear()
+            durations = []
+            for n in range(args.repeat):
+                # Case and punctuation differences hit the same entry
+                _, ms = timed(assistant.process_user_input, utterance.upper() + "?" if n % 2 else utterance)
+                durations.extend(ms)
+            print(f"{utterance!r} x{args.repeat}: {len(model_calls)} model call, first {durations[0]:.1f} ms, "
+                  f"repeats median {statistics.median(durations[1:]):.2f} ms")
+        print(f"cache stats: {assistant.response_cache.stats()}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+COMPOUND_COMMAND = "create a folder Reports on D and open it, open chrome, tell me the time and the weather in Lahore"
+COMPOUND_TASKS = [
+    intent("create_folder", "create", "Reports", "D:/"),
+    intent("open_folder", "open", "Reports", "D:/"),
+    intent("open_app", "open", "chrome"),
+    intent("current_time"),
+    intent("get_weather", name="Lahore"),
+]
+
+
+def bench_multi_intent(args):
+    """Latency of a compound command with a stub model and stub tasks; correctness is in tests/test_multi_intent.py"""
+    events = []
+    events_lock = threading.Lock()
+    model_calls = []
+
+    class StubTaskAssistant(DennisAssistant):
+        def request_model(self, user_input, history=()):
+            model_calls.append(user_input)
+            time.sleep(args.model_latency / 1000)
+            return json.dumps({"tasks": COMPOUND_TASKS})
+
+        def handle_developer_task(self, task_data):
+            with events_lock:
+                events.append(("start", task_data["task"], time.perf_counter()))
+            time.sleep(args.task_latency / 1000)
+            with events_lock:
+                events.append(("end", task_data["task"], time.perf_counter()))
+            return f"{task_data['task']} done"
+
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        output = queue.Queue()
+        assistant = make_assistant(base, StubTaskAssistant, output)
+        assistant.response_cache = ResponseCache(os.path.join(base, "cache.json"), max_entries=0)
+        _, ms = timed(assistant.process_user_input, COMPOUND_COMMAND)
+        replies = [message for message_type, message in list(output.queue) if message_type == "assistant_response"]
+
+        times = {(kind, task): at for kind, task, at in events}
+        one_by_one = len(COMPOUND_TASKS) * (args.model_latency + args.task_latency)
+        print(f"{len(COMPOUND_TASKS)} tasks in {ms[0]:.0f} ms with {len(model_calls)} model call "
+              f"(a model call and a task per sub-command, one at a time: ~{one_by_one:.0f} ms)")
+        overlapping = sum(1 for task in ("open_app", "current_time", "get_weather")
+                          if times[("start", task)] < times[("end", "create_folder")])
+        print(f"independent tasks started while the folder was being created: {overlapping}/3")
+        in_order = times[("start", "open_folder")] >= times[("end", "create_folder")]
+        print(f"open_folder waited for create_folder: {in_order}")
+        expected = "\n".join(f"{task['task']} done" for task in COMPOUND_TASKS)
+        print(f"one reply with the results in spoken order: {replies == [expected]}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def bench_tasks(args):
+    rng = random.Random(7)
+    registry = TaskRegistry(slow_threshold=0.05)
+    # Stub handlers whose cost varies like the real ones: clock reads, disk work and network calls
+    costs = {"current_time": 0.0, "open_folder": 0.005, "get_weather": 0.08, "play_music": 0.03}
+    for name, cost in costs.items():
+        registry.register(name, lambda name=None, cost=cost: time.sleep(rng.uniform(0, 2 * cost)) if cost else name,
+                          ("name",))
+
+    overhead = TaskRegistry()
+    overhead.register("noop", lambda: None)
+    _, direct = timed(lambda: None, repeat=args.calls)
+    _, dispatched = timed(overhead.dispatch, "noop", {}, repeat=args.calls)
+    print(f"dispatch overhead: {(statistics.mean(dispatched) - statistics.mean(direct)) * 1000:.1f} us per call")
+
+    names = list(costs)
+    for _ in range(args.tasks):
+        registry.dispatch(rng.choices(names, weights=[4, 3, 2, 1])[0], {"name": "x"})
+    for name, stats in sorted(registry.stats().items(), key=lambda item: -item[1]["total_ms"]):
+        print(f"{name:>13}: x{stats['count']:<5} total {stats['total_ms']:8.1f} ms, "
+              f"p50 {stats['p50']:6.1f} ms, p95 {stats['p95']:6.1f} ms")
+    print(f"status bar: slowest tasks: {registry.summary()}")
+    print(f"slow-task log: {len(registry.slow_log)} entries over {registry.slow_threshold * 1000:.0f} ms")
+
+
+class StubGenaiClient:
+    """Just enough of genai.Client for ModelSession; counts tokens the way the API reports them"""
+
+    def __init__(self, cache_supported=True):
+        self.cache_supported = cache_supported
+        self.caches_created = 0
+        self.sent_contents = []
+        self.models = self
+        self.caches = self
+
+    @staticmethod
+    def tokens(text):
+        return ConversationMemory.estimate_tokens(text)
+
+    def create(self, model, config):
+        if not self.cache_supported:
+            raise ValueError("Cached content is too small")
+        self.caches_created += 1
+        self.cached_tokens = self.tokens(config.system_instruction)
+        return types.SimpleNamespace(name=f"cachedContents/{self.caches_created}")
+
+    def get(self, model):
+        return types.SimpleNamespace(name=model)
+
+    def generate_content(self, model, contents, config):
+        self.sent_contents.append(contents)
+        prompt = sum(self.tokens(part.text) for content in contents for part in content.parts)
+        cached = 0
+        if config.cached_content:
+            cached = self.cached_tokens
+        else:
+            prompt += sum(self.tokens(part.text) for part in config.system_instruction)
+        text = json.dumps({"response": f"Answer number {len(self.sent_contents)} to that question."})
+        usage = types.SimpleNamespace(prompt_token_count=prompt + cached, cached_content_token_count=cached,
+                                      candidates_token_count=self.tokens(text))
+        return types.SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content_stream(self, model, contents, config):
+        yield self.generate_content(model, contents, config)
+
+
+CONVERSATION = [
+    "tell me about the history of the printing press",
+    "who invented it",
+    "what about the steam engine",
+    "explain recursion with an example",
+    "give me another one",
+    "what is the capital of australia",
+    "and its population",
+    "recommend a book about space",
+    "is it suitable for kids",
+    "tell me a joke",
+]
+
+
+def bench_conversation(args):
+    """Tokens sent per turn; correctness is in tests/test_conversation.py"""
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        for cache_supported in (True, False):
+            client = StubGenaiClient(cache_supported)
+            session = ModelSession("stand-in-key", "stand-in")
+            session.client
+            session._client = client
+            assistant = make_assistant(base, history_tokens=args.history_tokens)
+            assistant.model_session = session
+            assistant.response_cache = ResponseCache(os.path.join(base, f"cache{cache_supported}.json"))
+            for turn in range(args.turns):
+                assistant.process_user_input(CONVERSATION[turn % len(CONVERSATION)] + f" ({turn})")
+
+            sent = [usage["prompt"] - usage["cached"] for usage in session.usage]
+            label = "cached system instruction" if cache_supported else "instruction sent every turn"
+            print(f"{label}: {len(sent)} model calls, tokens sent per turn "
+                  f"first {sent[0]}, median {statistics.median(sent):.0f}, max {max(sent)}; "
+                  f"{client.caches_created} cache created")
+        history = assistant.conversation.history()
+        print(f"history after {args.turns} turns: {len(history) // 2} entries, ~{assistant.conversation.tokens()} "
+              f"tokens, digest {'present' if history[0][1].startswith('Summary') else 'absent'}")
+        print(f"system instruction alone: ~{ConversationMemory.estimate_tokens(SYSTEM_INSTRUCTION)} tokens")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+class StandInModelHandler(BaseHTTPRequestHandler):
+    """Answers Gemini generateContent and models.get calls with a canned reply"""
+
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment to avoid delayed-ACK stalls
+    wbufsize = 65536
+    connect_delay = 0.0
+    connections = 0
+    reply = {"response": "Hello from the stand-in model"}
+
+    def setup(self):
+        # Stand in for TCP and TLS setup on every new connection
+        type(self).connections += 1
+        time.sleep(self.connect_delay)
+        super().setup()
+
+    def do_GET(self):
+        self._send({"name": "models/stand-in", "displayName": "Stand-in"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send({"candidates": [{
+            "content": {"role": "model", "parts": [{"text": json.dumps(self.reply)}]},
+            "finishReason": "STOP",
+        }]})
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(handler):
+    """Serve handler on a free local port in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+def bench_model_session(args):
+    StandInModelHandler.connect_delay = args.connect_delay / 1000
+    server, base_url = start_server(StandInModelHandler)
+    try:
+        def per_turn_client(text):
+            # What generate_response used to do: a new client and config every turn
+            return ModelSession("stand-in-key", "stand-in", base_url).generate(text)
+
+        session = ModelSession("stand-in-key", "stand-in", base_url)
+        _, warm_ms = timed(session.warm_up)
+
+        for label, func in (("new client per turn", per_turn_client), ("shared session    ", session.generate)):
+            StandInModelHandler.connections = 0
+            _, ms = timed(func, "what is recursion", repeat=args.turns)
+            print(f"{label}: median {statistics.median(ms):7.2f} ms/turn, "
+                  f"{StandInModelHandler.connections} connections for {args.turns} turns")
+        print(f"warm-up: {warm_ms[0]:.2f} ms (paid once at startup)")
+    finally:
+        server.shutdown()
+
+
+class StandInWeatherHandler(StandInModelHandler):
+    """Answers OpenWeatherMap current-weather calls after a configurable delay"""
+
+    delay = 0.0
+    requests_served = 0
+
+    def do_GET(self):
+        type(self).requests_served += 1
+        time.sleep(self.delay)
+        city = parse_qs(urlparse(self.path).query).get("q", ["?"])[0]
+        self._send({"name": city.title(), "sys": {"country": "PK"}, "main": {"temp": 31.0, "humidity": 60},
+                    "weather": [{"description": "clear sky"}], "wind": {"speed": 3.1}})
+
+
+def bench_weather(args):
+    StandInWeatherHandler.connect_delay = args.connect_delay / 1000
+    StandInWeatherHandler.delay = args.upstream_delay / 1000
+    server, base_url = start_server(StandInWeatherHandler)
+    rng = random.Random(11)
+    cities = ["Karachi", "Lahore", "Islamabad", "London", "Nairobi", "Dubai"]
+    # Most people ask about the same few places
+    queries = [rng.choices(cities, weights=[20, 8, 4, 2, 1, 1])[0] for _ in range(args.queries)]
+    try:
+        def per_query_request(city):
+            # What get_weather used to do: a fresh connection for every question
+            url = f"{base_url}data/2.5/weather?q={city}&appid=key&units=metric"
+            return requests.get(url, timeout=10).json()
+
+        provider = WeatherProvider("key", base_url)
+        for label, func in (("new request per query", per_query_request), ("weather provider    ", provider.current)):
+            StandInWeatherHandler.connections = StandInWeatherHandler.requests_served = 0
+            durations = []
+            for city in queries:
+                durations.extend(timed(func, city)[1])
+            print(f"{label}: median {statistics.median(durations):6.2f} ms, max {max(durations):6.2f} ms, "
+                  f"{StandInWeatherHandler.requests_served} upstream calls, "
+                  f"{StandInWeatherHandler.connections} connections for {len(queries)} queries")
+        stats = provider.stats()
+        print(f"hit rate {stats['hit_rate']:.0%}, upstream " +
+              ", ".join(f"{k} {v:.1f} ms" for k, v in stats["upstream_ms"].items()))
+
+        # Everyone asks at once on a cold cache
+        provider = WeatherProvider("key", base_url)
+        StandInWeatherHandler.requests_served = 0
+        with concurrent.futures.ThreadPoolExecutor(args.concurrent) as pool:
+            list(pool.map(provider.current, ["Karachi"] * args.concurrent))
+        print(f"{args.concurrent} concurrent cold queries: {StandInWeatherHandler.requests_served} upstream call, "
+              f"{provider.stats()['coalesced']} coalesced")
+
+        # The cached report has expired and the upstream has become slow
+        provider = WeatherProvider("key", base_url, ttl=0.05, revalidate_wait=0.2)
+        provider.current("Karachi")
+        time.sleep(0.1)
+        StandInWeatherHandler.delay = 2.0
+        _, ms = timed(provider.current, "Karachi")
+        print(f"expired entry, upstream taking 2 s: answered in {ms[0]:.0f} ms from the stale report "
+              f"(stale hits {provider.stats()['stale_hits']})")
+    finally:
+        server.shutdown()
+
+
+class StandInGeolocationHandler(StandInModelHandler):
+    """Answers like ipinfo.io/json after a configurable delay"""
+
+    delay = 0.0
+    requests_served = 0
+
+    def do_GET(self):
+        type(self).requests_served += 1
+        time.sleep(self.delay)
+        self._send({"ip": "203.0.113.7", "city": "Lahore", "region": "Punjab", "country": "PK",
+                    "loc": "31.5497,74.3436"})
+
+
+def bench_location(args):
+    StandInGeolocationHandler.delay = args.upstream_delay / 1000
+    StandInWeatherHandler.delay = args.upstream_delay / 1000
+    geo_server, geo_url = start_server(StandInGeolocationHandler)
+    weather_server, weather_url = start_server(StandInWeatherHandler)
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        # Warm-up prefetches the location, so the first weather question only waits for the weather
+        assistant = make_assistant(base, location=LocationService(geo_url, path=os.path.join(base, "location.json")),
+                                   weather_base_url=weather_url)
+        assistant.warm_up()
+        time.sleep(args.startup / 1000)
+        reply, ms = timed(assistant.get_weather)
+        print(f"first \"what's the weather\" {args.startup:.0f} ms after startup: {ms[0]:.1f} ms -> "
+              f"{reply.splitlines()[0]}")
+        _, ms = timed(assistant.get_weather, repeat=args.queries)
+        print(f"next {args.queries}: median {statistics.median(ms):.2f} ms, "
+              f"{StandInGeolocationHandler.requests_served} geolocation calls in total")
+
+        # A restart on the same network reads the location from disk
+        StandInGeolocationHandler.requests_served = 0
+        restarted = LocationService(geo_url, path=os.path.join(base, "location.json"))
+        _, ms = timed(restarted.city)
+        print(f"after restart: city in {ms[0]:.2f} ms with {StandInGeolocationHandler.requests_served} "
+              f"geolocation calls")
+
+        # Moving to another network looks the location up again
+        restarted.network_id = lambda: "10.99.0.1"
+        _, ms = timed(restarted.city)
+        print(f"after a network change: city in {ms[0]:.2f} ms with {StandInGeolocationHandler.requests_served} "
+              f"geolocation call")
+    finally:
+        geo_server.shutdown()
+        weather_server.shutdown()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+# Utterances of the synthetic trace, how often each comes up, and the stand-in model's reply
+# (None when the intent router answers it locally)
+REPLAY_MIX = [
+    ("what time is it", 12, None),
+    ("today's date", 4, None),
+    ("what's the weather in Lahore", 10, None),
+    ("how's the weather today", 6, None),
+    ("where am I", 3, None),
+    ("create a folder Reports {n} in {base}", 5, None),
+    ("tell me a joke", 8, {"response": "Why did the developer go broke? Because they used up all their cache."}),
+    ("what is the capital of France", 6, {"response": "Paris is the capital of France."}),
+    ("open my lab report", 5, intent("open_file", "open", "lab report")),
+    ("play some music", 4, intent("play_music", "play", "lofi beats")),
+    ("find the file notes", 4, intent("get_path", "get", "notes")),
+]
+
+
+class StandInReplayModelHandler(StandInModelHandler):
+    """Answers generateContent with the REPLAY_MIX reply for the last user turn, after a delay"""
+
+    delay = 0.0
+    replies = {text: reply for text, _, reply in REPLAY_MIX if reply}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        text = body.get("contents", [{}])[-1].get("parts", [{}])[0].get("text", "")
+        time.sleep(self.delay)
+        reply = self.replies.get(text, {"response": f"Here is what I know about {text}."})
+        self._send({"candidates": [{
+            "content": {"role": "model", "parts": [{"text": json.dumps(reply)}]},
+            "finishReason": "STOP",
+        }]})
+
+
+def synthetic_trace(count, rate, base, seed=13):
+    """Utterances with Poisson arrival times at rate per second"""
+    rng = random.Random(seed)
+    texts = [text for text, _, _ in REPLAY_MIX]
+    weights = [weight for _, weight, _ in REPLAY_MIX]
+    trace, at = [], 0.0
+    for n in range(count):
+        at += rng.expovariate(rate)
+        trace.append({"at": at, "text": rng.choices(texts, weights)[0].format(n=n, base=base)})
+    return trace
+
+
+def bench_replay(args):
+    """Replays an utterance trace against the daemon's HTTP API with stand-in model and web services"""
+    StandInReplayModelHandler.delay = args.model_latency / 1000
+    StandInWeatherHandler.delay = StandInGeolocationHandler.delay = args.upstream_delay / 1000
+    servers = [start_server(handler) for handler in
+               (StandInReplayModelHandler, StandInWeatherHandler, StandInGeolocationHandler)]
+    (_, model_url), (_, weather_url), (_, geo_url) = servers
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+
+    class ReplayAssistant(DennisAssistant):
+        # Tasks that would launch programs on this machine take a fixed time instead
+        def stand_in(self, name, *_):
+            time.sleep(args.task_latency / 1000)
+            return f"Opened {name}"
+
+        open_application = open_file = open_url = play_music = stand_in
+
+    try:
+        if args.trace:
+            with open(args.trace, encoding="utf-8") as f:
+                trace = [json.loads(line) for line in f if line.strip()]
+        else:
+            trace = synthetic_trace(args.requests, args.rate, base)
+        if args.save_trace:
+            with open(args.save_trace, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in trace)
+
+        assistant = make_assistant(base, ReplayAssistant,
+                                   location=LocationService(geo_url, path=os.path.join(base, "location.json")),
+                                   api_key="stand-in-key", model_base_url=model_url, cache_system_instruction=False,
+                                   weather_base_url=weather_url)
+        daemon = AssistantDaemon(assistant, port=0, max_in_flight=args.in_flight).start()
+        auth = {"Authorization": f"Bearer {daemon.token}"}
+        sessions = threading.local()
+
+        def send(entry, scheduled):
+            if not hasattr(sessions, "session"):
+                sessions.session = requests.Session()
+                sessions.session.headers.update(auth)
+            # Open-loop replays count from the trace's arrival time, so client-side queueing is included
+            scheduled = scheduled or time.perf_counter()
+            first = done = None
+            with sessions.session.post(f"{daemon.url}message", json={"text": entry["text"]}, stream=True,
+                                       timeout=60) as response:
+                response.raise_for_status()
+                # Read to the end of the stream so the connection can be reused
+                for line in response.iter_lines():
+                    event = json.loads(line)
+                    first = first or time.perf_counter()
+                    if event["type"] == "done":
+                        done = event, time.perf_counter()
+            assert done, f"no done event for {entry['text']!r}"
+            event, finished = done
+            return event["tasks"] or [entry["text"]], first - scheduled, finished - scheduled
+
+        requests.get(f"{daemon.url}health", timeout=5).raise_for_status()
+        # Replay against a warmed-up daemon; what startup costs is the startup benchmark's job
+        for module in LAZY_MODULES.values():
+            module.load()
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.clients) as pool:
+            futures = []
+            for entry in trace:
+                scheduled = start + entry["at"] / args.speed if args.speed else None
+                if scheduled:
+                    time.sleep(max(0.0, scheduled - time.perf_counter()))
+                futures.append(pool.submit(send, entry, scheduled))
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        latencies = collections.defaultdict(lambda: LatencyRecorder(len(results)))
+        first_event = LatencyRecorder(len(results))
+        for tasks, first, total in results:
+            latencies["+".join(tasks) or "none"].record(total)
+            first_event.record(first)
+        print(f"{len(results)} requests in {elapsed:.2f} s: {len(results) / elapsed:.1f} requests/s "
+              f"({args.clients} clients, {args.in_flight} in flight on the daemon)")
+        for name, recorder in sorted(latencies.items(), key=lambda item: -item[1].count):
+            p = recorder.percentiles()
+            print(f"{name:>15}: x{recorder.count:<5} p50 {p['p50']:7.1f} ms, p95 {p['p95']:7.1f} ms, "
+                  f"p99 {p['p99']:7.1f} ms")
+        p = first_event.percentiles()
+        print(f"{'first event':>15}:        p50 {p['p50']:7.1f} ms, p95 {p['p95']:7.1f} ms, p99 {p['p99']:7.1f} ms")
+
+        # The other endpoints, once each
+        stats = requests.get(f"{daemon.url}stats", headers=auth, timeout=5).json()
+        served = sum(s["count"] for s in stats["requests"].values())
+        print(f"daemon stats: {served} request timings, slowest tasks: {assistant.tasks.summary()}")
+        reply = requests.post(f"{daemon.url}message", json={"text": "what time is it", "stream": False},
+                              headers=auth, timeout=10).json()
+        print(f"non-streaming reply: {reply['response']!r} ({reply['tasks']})")
+        bad = requests.post(f"{daemon.url}message", json={"text": ""}, headers=auth, timeout=10)
+        print(f"empty message: HTTP {bad.status_code}")
+        assert len(results) == len(trace) and served >= len(trace) and reply["response"] and bad.status_code == 400
+
+        # Requests a web page or another program could make must not reach the assistant
+        handled = served + 1  # the non-streaming reply; the empty message was never submitted
+        body = json.dumps({"text": "what time is it"})
+        refused = {
+            "no token": requests.post(f"{daemon.url}message", data=body,
+                                      headers={"Content-Type": "application/json"}, timeout=10),
+            "wrong token": requests.post(f"{daemon.url}message", data=body, timeout=10, headers={
+                "Content-Type": "application/json", "Authorization": "Bearer guess"}),
+            "text/plain": requests.post(f"{daemon.url}message", data=body, timeout=10,
+                                        headers={**auth, "Content-Type": "text/plain"}),
+            "foreign Origin": requests.post(f"{daemon.url}message", json={"text": "what time is it"}, timeout=10,
+                                            headers={**auth, "Origin": "http://evil.example"}),
+            "foreign Host": requests.post(f"{daemon.url}message", json={"text": "what time is it"}, timeout=10,
+                                          headers={**auth, "Host": "evil.example"}),
+            "stats without token": requests.get(f"{daemon.url}stats", timeout=5),
+        }
+        print("refused: " + ", ".join(f"{name} HTTP {r.status_code}" for name, r in refused.items()))
+        stats = requests.get(f"{daemon.url}stats", headers=auth, timeout=5).json()
+        assert all(r.status_code in (401, 403, 415) for r in refused.values())
+        assert sum(s["count"] for s in stats["requests"].values()) == handled, "a refused request was processed"
+        daemon.shutdown()
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def fixture_sentences(rng, count):
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+        yield " ".join(words).capitalize() + "."
+
+
+def write_pdf_fixture(path, pages, lines_per_page=50, seed=17):
+    """A text-only PDF with one Helvetica content stream per page"""
+    rng = random.Random(seed)
+    offsets = []
+    with open(path, "wb") as f:
+        def add(body):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % len(offsets) + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)).encode()
+        add(b"<< /Type /Catalog /Pages 2 0 R >>")
+        add(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages)
+        add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i in range(pages):
+            lines = b"".join(b"(%s) Tj T*\n" % line.encode() for line in fixture_sentences(rng, lines_per_page))
+            stream = b"BT /F1 10 Tf 14 TL 50 780 Td\n" + lines + b"ET"
+            add(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+                b"/Contents %d 0 R >>" % (5 + 2 * i))
+            add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, xref))
+
+
+def write_docx_fixture(path, paragraphs, seed=19):
+    """A minimal DOCX with plain paragraphs and a small table every 100 paragraphs"""
+    rng = random.Random(seed)
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/officeDocument"/></Relationships>'))
+        with archive.open("word/document.xml", "w") as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="{ns}"><w:body>'.encode())
+            for i in range(paragraphs):
+                text = " ".join(fixture_sentences(rng, rng.randint(1, 4)))
+                f.write(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>".encode())
+                if i % 100 == 99:
+                    cells = "".join(f"<w:tc><w:p><w:r><w:t>cell {i} {c}</w:t></w:r></w:p></w:tc>" for c in range(3))
+                    f.write(f"<w:tbl><w:tr>{cells}</w:tr></w:tbl>".encode())
+            f.write(b"</w:body></w:document>")
+
+
+def measure_read(read, memory=True):
+    """(ms to the first piece of text, ms to all of it, peak traced KiB, pieces) of a generator of text"""
+    start = time.perf_counter()
+    first = None
+    pieces = []
+    for text in read():
+        first = first or time.perf_counter()
+        pieces.append(text)
+    total = time.perf_counter() - start
+    peak = 0
+    if memory:
+        # Again under tracemalloc, which slows the parse down too much to time it
+        tracemalloc.start()
+        collections.deque(read(), 0)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return (first - start) * 1000, total * 1000, peak / 1024, pieces
+
+
+def bench_documents(args):
+    import PyPDF2
+    try:
+        import docx
+    except ImportError:
+        docx = None
+
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    try:
+        pdf_path = os.path.join(base, "handbook.pdf")
+        docx_path = os.path.join(base, "thesis.docx")
+        write_pdf_fixture(pdf_path, args.pages)
+        write_docx_fixture(docx_path, args.paragraphs)
+        print(f"fixtures: {args.pages}-page PDF ({os.path.getsize(pdf_path) / 1e6:.1f} MB), "
+              f"{args.paragraphs}-paragraph DOCX ({os.path.getsize(docx_path) / 1e6:.1f} MB)")
+
+        def whole_pdf():
+            # What a read-everything-first implementation does: parse, then join every page
+            reader = PyPDF2.PdfReader(pdf_path)
+            yield "\n".join(page.extract_text() for page in reader.pages)
+
+        def whole_docx():
+            yield "\n".join(p.text for p in docx.Document(docx_path).paragraphs)
+
+        reader = DocumentReader(os.path.join(base, "cache"))
+        cases = [("PDF ", pdf_path, whole_pdf), ("DOCX", docx_path, whole_docx if docx else None)]
+        for label, path, whole in cases:
+            if whole:
+                first, total, peak, _ = measure_read(whole)
+                print(f"{label} read whole   : first text {first:8.1f} ms, all {total:8.1f} ms, "
+                      f"peak {peak:9.0f} KiB")
+            # Memory first, so the timed pass below is the one that fills the cache
+            _, _, peak, _ = measure_read(lambda: reader.pdf_pages(path) if label == "PDF " else
+                                         reader.docx_paragraphs(path))
+            first, total, _, pieces = measure_read(lambda: reader.chunks(path), memory=False)
+            print(f"{label} streamed     : first text {first:8.1f} ms, all {total:8.1f} ms, "
+                  f"peak {peak:9.0f} KiB, {len(pieces)} pieces")
+            first, total, peak, cached = measure_read(lambda: reader.chunks(path))
+            print(f"{label} from cache   : first text {first:8.1f} ms, all {total:8.1f} ms, "
+                  f"peak {peak:9.0f} KiB")
+            assert cached == pieces, "cached text differs from the extracted text"
+
+        # A changed file is extracted again
+        misses = reader.misses
+        os.utime(pdf_path, ns=(time.time_ns(), time.time_ns()))
+        next(reader.chunks(pdf_path))
+        print(f"modified PDF re-extracted: {reader.misses > misses}")
+        assert reader.misses > misses
+
+        # End to end: the first page reaches the UI long before the document is parsed
+        messages = []
+
+        class TimedQueue(queue.Queue):
+            def put(self, item, block=True, timeout=None):
+                messages.append((time.perf_counter(), item))
+
+        assistant = make_assistant(base, message_queue=TimedQueue())
+        assistant.documents = DocumentReader(os.path.join(base, "cache2"))
+        for attempt in ("first reading", "second reading"):
+            # The first reading stops at read_aloud_chars and extracts the rest in the background
+            cache_path = assistant.documents.cache_path(pdf_path)
+            deadline = time.time() + 60
+            while attempt == "second reading" and not os.path.exists(cache_path) and time.time() < deadline:
+                time.sleep(0.05)
+            messages.clear()
+            reply, ms = timed(assistant.read_pdf, "handbook", base)
+            first = next(at for at, (kind, _) in messages if kind == "assistant_delta") - (messages[0][0])
+            print(f"read_pdf, {attempt}: first page shown after {first * 1000:.1f} ms, reply after {ms[0]:.1f} ms "
+                  f"({len(reply)} characters)")
+        print(f"read_docx by name: {assistant.read_docx('thesis', None)[:60]!r}...")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def zipf_vocabulary(rng, size):
+    """Made-up words with Zipf-like cumulative weights, like word use in real text"""
+    syllables = ["ka", "lo", "mi", "ter", "san", "du", "ve", "rip", "o", "na", "gel", "bo", "xu", "fa", "ti", "qua"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def write_content_corpus(base, args, rng):
+    """Text, Markdown, PDF and DOCX documents; three of them mention the planted phrase"""
+    words, weights = zipf_vocabulary(rng, args.vocabulary)
+    paths = []
+    for i in range(args.documents):
+        folder = os.path.join(base, f"dir{i % 20}")
+        os.makedirs(folder, exist_ok=True)
+        text = " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(args.words // 2, args.words * 3 // 2)))
+        path = os.path.join(folder, f"doc{i}{'.md' if i % 4 == 0 else '.txt'}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    for i in range(args.rich_documents):
+        pdf_path, docx_path = os.path.join(base, f"scan{i}.pdf"), os.path.join(base, f"memo{i}.docx")
+        write_pdf_fixture(pdf_path, 5, seed=i)
+        write_docx_fixture(docx_path, 200, seed=i)
+        paths += [pdf_path, docx_path]
+    # The phrase once as written, and its words apart in two more documents
+    planted = os.path.join(base, "dir3", "finance review.txt")
+    with open(planted, "w", encoding="utf-8") as f:
+        f.write(" ".join(rng.choices(words, k=300)) + " the Q3 budget was approved " + " ".join(rng.choices(words, k=300)))
+    for n, filler in enumerate(("q3 q3", "budget budget")):
+        with open(os.path.join(base, "dir5", f"scattered{n}.md"), "w", encoding="utf-8") as f:
+            f.write(f"budget {' '.join(rng.choices(words, k=50))} q3 {' '.join(rng.choices(words, k=50))} {filler}")
+    return paths + [planted], words
+
+
+def bench_content(args):
+    rng = random.Random(23)
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    corpus = os.path.join(base, "corpus")
+    try:
+        paths, words = write_content_corpus(corpus, args, rng)
+        corpus_bytes = sum(os.path.getsize(path) for path in paths)
+        file_index = FileIndex(os.path.join(base, "index.db"), roots=[corpus])
+        file_index.build()
+        print(f"corpus: {len(paths)} documents, {corpus_bytes / 1e6:.1f} MB "
+              f"({args.rich_documents} PDF and {args.rich_documents} DOCX), {os.cpu_count()} CPUs")
+
+        # Indexing throughput, in this process and in the process pool
+        for label, workers in (("one process ", 0), ("process pool", args.workers)):
+            db_path = os.path.join(base, f"content{workers}.db")
+            index = ContentIndex(db_path, file_index, workers=workers or None)
+            if not workers:
+                index.POOL_THRESHOLD = math.inf
+            (indexed, _), ms = timed(index.update)
+            stats = index.stats()
+            print(f"{label}: {indexed} documents in {ms[0] / 1000:.2f} s, {indexed / ms[0] * 1000:.0f} docs/s, "
+                  f"{stats['words'] / ms[0] / 1000:.2f} M words/s; index {stats['bytes'] / 1e6:.1f} MB, "
+                  f"{stats['terms']} terms")
+
+        # Incremental updates only re-read what changed
+        (indexed, removed), ms = timed(index.update)
+        print(f"update with nothing changed: {ms[0]:.0f} ms, {indexed} re-indexed")
+        touched = rng.sample(paths[:args.documents], 10)
+        for path in touched:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(" revised")
+        for path in paths[args.documents - 5:args.documents]:
+            os.remove(path)
+        file_index.build()
+        (indexed, removed), ms = timed(index.update)
+        print(f"update after 10 edits and 5 deletions: {ms[0]:.0f} ms, {indexed} re-indexed, {removed} removed")
+        assert (indexed, removed) == (10, 5)
+
+        # Query latency
+        queries = [" ".join(rng.sample(words[:2000], rng.randint(1, 3))) for _ in range(args.queries)]
+        durations = []
+        for query in queries:
+            durations.extend(timed(index.search, query)[1])
+        durations.sort()
+        p = {point: durations[min(len(durations) - 1, len(durations) * point // 100)] for point in (50, 95, 99)}
+        print(f"{args.queries} queries of 1-3 words: p50 {p[50]:.2f} ms, p95 {p[95]:.2f} ms, p99 {p[99]:.2f} ms")
+
+        results, ms = timed(index.search, "Q3 budget")
+        print(f"\"Q3 budget\": {ms[0]:.2f} ms, best match {os.path.basename(results[0]['path'])} "
+              f"(phrase {results[0]['phrase']}), {len(results)} matches")
+        assert os.path.basename(results[0]["path"]) == "finance review.txt"
+
+        # What answering without an index takes: read every document
+        def scan(phrase):
+            return [path for path in paths if os.path.exists(path)
+                    and phrase in " ".join(content_tokens(" ".join(document_pieces(path))))]
+        _, ms = timed(scan, "q3 budget")
+        print(f"reading every document instead: {ms[0]:.0f} ms")
+
+        # The task, routed locally from the spoken command
+        assistant = make_assistant(base, file_index=file_index)
+        assistant.content_index = index
+        task = assistant.intent_router.route("find the report that mentions Q3 budget")
+        reply = assistant.handle_developer_task(task)
+        print(f"find_content: {reply.splitlines()[1].strip()!r}")
+        assert task["task"] == "find_content" and "finance review.txt" in reply.splitlines()[1]
+
+        # With content_index off, find_content neither searches nor starts indexing
+        assistant.config["content_index"] = False
+        assistant.content_index = ContentIndex(os.path.join(base, "off.db"), file_index)
+        reply = assistant.find_content("Q3 budget")
+        print(f"content_index off: {reply!r}, indexing started: {assistant.content_index.updating}")
+        assert not assistant.content_index.updating and "turned off" in reply
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def bench_pipeline(args):
+    """Throughput and memory of the request pipeline; correctness is in tests/test_pipeline.py"""
+    rng = random.Random(3)
+
+    def stub_backend(request):
+        # Replies take a random time, so later requests often finish first
+        time.sleep(rng.random() * args.max_delay / 1000)
+        request.post("status", f"working on {request.text}")
+        request.post("assistant_response", request.text)
+
+    for supersede in (False, True):
+        output = queue.Queue()
+        pipeline = RequestPipeline(stub_backend, output, max_in_flight=args.in_flight)
+        tracemalloc.start()
+        start = time.perf_counter()
+        requests = [pipeline.submit(f"request {i}", supersede=supersede) for i in range(args.requests)]
+        for request in requests:
+            try:
+                request.future.result()
+            except concurrent.futures.CancelledError:
+                pass
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        replies = []
+        while not output.empty():
+            message_type, message = output.get()
+            if message_type == "assistant_response":
+                replies.append(message)
+        expected = [r.text for r in requests if not r.cancelled.is_set()]
+        label = "supersede" if supersede else "in order "
+        print(f"{label}: {len(replies)} replies in {elapsed:.2f}s, ordered={replies == expected}, "
+              f"pending after={pipeline.pending()}, peak traced memory {peak / 1024:.0f} KiB")
+
+
+HEAVY_MODULES = ("requests", "google.genai", "speech_recognition", "pyttsx3")
+
+
+def python_seconds(code, env):
+    """Wall time of a fresh interpreter running code, and what it printed"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def bench_startup(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+    check = f"import main, sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    eager = f"import tkinter; {'; '.join(f'import {m}' for m in HEAVY_MODULES)}"
+
+    bare, _ = zip(*(python_seconds("pass", env) for _ in range(args.runs)))
+    lazy, loaded = zip(*(python_seconds(check, env) for _ in range(args.runs)))
+    heavy, _ = zip(*(python_seconds(eager, env) for _ in range(args.runs)))
+    interpreter = statistics.median(bare)
+    print(f"interpreter alone:         {interpreter * 1000:7.1f} ms")
+    print(f"import main:               {(statistics.median(lazy) - interpreter) * 1000:7.1f} ms "
+          f"(heavy modules loaded: {loaded[0].strip() or 'none'})")
+    print(f"import the heavy modules:  {(statistics.median(heavy) - interpreter) * 1000:7.1f} ms "
+          "(what warm-up now does after the first paint)")
+    assert not loaded[0].strip(), "importing main pulled in heavy modules"
+
+    if not os.environ.get("DISPLAY"):
+        print("no display; skipping time to first window (run main.py --profile-startup on a desktop)")
+        return
+    firsts = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, os.path.join(here, "main.py"), "--profile-startup"],
+                                capture_output=True, text=True, env=env, check=True)
+        firsts.append(float(re.search(r"time to first window: ([\d.]+) ms", result.stdout).group(1)))
+    print(result.stdout.rstrip())
+    print(f"time to first window over {args.runs} runs: median {statistics.median(firsts):.1f} ms")
+
+
+def resident_memory_kib():
+    """Current resident set size on Linux, or 0 elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return 0
+
+
+def bench_transcript(args):
+    """Needs a display; run headless with: xvfb-run python benchmarks.py transcript"""
+    import tkinter as tk
+
+    root = tk.Tk()
+    root.geometry("800x600")
+    frame = tk.Frame(root)
+    frame.pack(fill=tk.BOTH, expand=True)
+    transcript = ChatTranscript(frame)
+    root.update()
+
+    text = "A typical reply that wraps onto a second line in the chat window. " * 2
+    print(f"{'messages':>9} {'ms/append':>10} {'RSS MiB':>8}")
+    for done in range(args.batch, args.messages + 1, args.batch):
+        start = time.perf_counter()
+        for i in range(args.batch):
+            message_id = transcript.add("user" if i % 2 else "assistant", text)
+            if i % 10 == 0:
+                transcript.append(message_id, " (streamed)")
+            # Let Tk lay out and draw like the real event loop would
+            root.update_idletasks()
+        root.update()
+        per_append = (time.perf_counter() - start) * 1000 / args.batch
+        print(f"{done:>9} {per_append:>10.3f} {resident_memory_kib() / 1024:>8.1f}")
+    root.destroy()
+
+
+def generate_speech_wav(path, bursts, sample_rate=16000, seed=5):
+    """Write background noise with tone bursts standing in for utterances; returns their (start, end) in seconds"""
+    rng = random.Random(seed)
+    samples = []
+    spans = []
+    t = 0.0
+
+    def noise(seconds):
+        for _ in range(int(seconds * sample_rate)):
+            samples.append(int(rng.gauss(0, 60)))
+
+    noise(1.5)
+    for i in range(bursts):
+        length = rng.uniform(0.6, 3.0)
+        start = len(samples) / sample_rate
+        frequency = rng.uniform(150, 400)
+        for n in range(int(length * sample_rate)):
+            # Amplitude wobbles like syllables do
+            envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 4 * n / sample_rate)
+            samples.append(int(4000 * envelope * math.sin(2 * math.pi * frequency * n / sample_rate)
+                               + rng.gauss(0, 60)))
+        spans.append((start, len(samples) / sample_rate))
+        noise(rng.uniform(1.0, 2.5))
+
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(array("h", [max(-32768, min(32767, x)) for x in samples]).tobytes())
+    return spans
+
+
+def bench_vad(args):
+    path = os.path.join(tempfile.mkdtemp(), "speech.wav")
+    spans = generate_speech_wav(path, args.utterances)
+    duration = spans[-1][1] + 1.0
+    texts = []
+
+    class StubBackend(RecognizerBackend):
+        def transcribe(self, audio):
+            # Stands in for a recognition round trip
+            time.sleep(args.recognize_delay / 1000)
+            texts.append((time.perf_counter(), len(audio.frame_data) / audio.sample_rate / audio.sample_width))
+            return f"utterance {len(texts)}"
+
+    listener = ContinuousListener(lambda: WavFileSource(path, realtime=args.realtime), StubBackend,
+                                  on_text=lambda text: None)
+    start = time.perf_counter()
+    listener.start()
+    listener.wait()
+    elapsed = time.perf_counter() - start
+
+    print(f"audio {duration:.1f}s, {len(spans)} utterances, {listener.segments} segments found, "
+          f"processed at {duration / elapsed:.1f}x real time")
+    expected = [end - begin for begin, end in spans]
+    found = [length for _, length in texts]
+    for want, got in zip(expected, found):
+        print(f"  utterance {want:5.2f}s -> segment {got:5.2f}s")
+    if args.realtime:
+        # Wall time from the end of each utterance in the audio to its transcript
+        latencies = sorted((at - start - end) * 1000 for (at, _), (_, end) in zip(texts, spans))
+        print(f"end of speech to text: p50 {statistics.median(latencies):.0f} ms, "
+              f"max {latencies[-1]:.0f} ms (recognizer {args.recognize_delay:.0f} ms)")
+    shutil.rmtree(os.path.dirname(path))
+
+
+def bench_ui_stress(args):
+    """Needs a display; run headless with: xvfb-run python benchmarks.py ui-stress
+
+    Times the Tk loop under a flood of updates; tests/test_ui_messages.py checks the draining without a display.
+    """
+    import tkinter as tk
+
+    base = tempfile.mkdtemp(prefix="dennis_bench_")
+    root = tk.Tk()
+    try:
+        assistant = make_assistant(base, message_queue=UIMessageQueue(), stream_responses=True)
+        ui = DennisAssistantUI(root, assistant)
+        ui.toggle_speech()
+        root.update()
+
+        post = ui.message_queue.put
+
+        def hammer(worker):
+            for i in range(args.messages):
+                post(("status", f"worker {worker} status {i}"))
+                if i % 10 == 0:
+                    post(("progress", (f"worker {worker}", i / args.messages)))
+                if i % 25 == 0:
+                    post(("input_fill", (f"worker {worker} partial {i}", False)))
+                if i % 50 == 0:
+                    post(("mic_state", i % 100 == 0))
+
+        # The main loop should keep servicing timers while the flood is applied
+        lateness = []
+        tick_ms = 10
+
+        def heartbeat(expected):
+            lateness.append((time.perf_counter() - expected) * 1000)
+            root.after(tick_ms, heartbeat, time.perf_counter() + tick_ms / 1000)
+
+        root.after(tick_ms, heartbeat, time.perf_counter() + tick_ms / 1000)
+        threads = [threading.Thread(target=hammer, args=(w,)) for w in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads) or not ui.message_queue.empty():
+            root.update()
+        root.update()
+        elapsed = time.perf_counter() - start
+
+        lateness.sort()
+        render = ui.render_latency.percentiles()
+        print(f"{args.threads} threads x {args.messages} statuses in {elapsed:.2f}s, "
+              f"{ui.render_latency.count} UI updates after coalescing")
+        print(f"heartbeat lateness: p50 {statistics.median(lateness):.1f} ms, "
+              f"p99 {lateness[int(len(lateness) * 0.99)]:.1f} ms, max {lateness[-1]:.1f} ms")
+        print("enqueue to render: " + ", ".join(f"{k} {v:.1f} ms" for k, v in render.items()))
+    finally:
+        root.destroy()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9' ]", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+ASR_PHRASES = [
+    "open the downloads folder",
+    "what is the weather in London today",
+    "create a file called notes dot text on the desktop",
+    "play some music",
+    "open visual studio code",
+    "what time is it",
+    "read the pdf report from my documents",
+    "search the web for python tutorials",
+]
+
+
+def load_asr_fixtures(directory):
+    """Pairs of name.wav and name.txt holding its reference transcript"""
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".wav") and os.path.exists(os.path.join(directory, name[:-4] + ".txt")):
+            with open(os.path.join(directory, name[:-4] + ".txt"), encoding="utf-8") as f:
+                fixtures.append((os.path.join(directory, name), f.read().strip()))
+    return fixtures
+
+
+def synthesize_asr_fixtures(directory):
+    """Speak ASR_PHRASES to WAV files with the local TTS engine"""
+    import pyttsx3
+    engine = pyttsx3.init()
+    for i, phrase in enumerate(ASR_PHRASES):
+        engine.save_to_file(phrase, os.path.join(directory, f"phrase{i:02}.wav"))
+        with open(os.path.join(directory, f"phrase{i:02}.txt"), "w", encoding="utf-8") as f:
+            f.write(phrase)
+    engine.runAndWait()
+
+
+def bench_asr(args):
+    directory = args.fixtures or tempfile.mkdtemp()
+    if not args.fixtures:
+        synthesize_asr_fixtures(directory)
+    fixtures = load_asr_fixtures(directory)
+    if not fixtures:
+        raise SystemExit(f"No .wav/.txt fixture pairs in {directory}")
+    audio = []
+    for path, reference in fixtures:
+        with sr.AudioFile(path) as source:
+            audio.append((sr.Recognizer().record(source), reference))
+    total_audio = sum(len(a.frame_data) / a.sample_rate / a.sample_width for a, _ in audio)
+    print(f"{len(audio)} fixtures, {total_audio:.1f}s of audio")
+    print(f"{'backend':>8} {'load s':>7} {'RTF':>6} {'WER':>6} {'final ms':>9}")
+
+    for name in args.backends.split(","):
+        try:
+            start = time.perf_counter()
+            backend = make_recognizer_backend(name, getattr(args, f"{name}_model", None))
+            load_time = time.perf_counter() - start
+        except Exception as e:
+            print(f"{name:>8} unavailable: {e}")
+            continue
+
+        # Whole-utterance transcription: real-time factor and accuracy
+        errors, words, busy = 0.0, 0, 0.0
+        for clip, reference in audio:
+            start = time.perf_counter()
+            try:
+                text = backend.transcribe(clip)
+            except sr.UnknownValueError:
+                text = ""
+            busy += time.perf_counter() - start
+            errors += word_error_rate(reference, text) * len(normalize_words(reference))
+            words += len(normalize_words(reference))
+
+        # Streaming: audio is fed while "spoken", so only finish() is left once speech ends
+        finish_times = []
+        for clip, _ in audio:
+            recognition = backend.start_stream(clip.sample_rate, clip.sample_width)
+            chunk = clip.sample_rate * 30 // 1000 * clip.sample_width
+            for offset in range(0, len(clip.frame_data), chunk):
+                recognition.feed(clip.frame_data[offset:offset + chunk])
+            start = time.perf_counter()
+            try:
+                recognition.finish()
+            except sr.UnknownValueError:
+                pass
+            finish_times.append((time.perf_counter() - start) * 1000)
+
+        print(f"{name:>8} {load_time:>7.2f} {busy / total_audio:>6.3f} {errors / max(words, 1):>6.1%} "
+              f"{statistics.median(finish_times):>9.1f}")
+
+    if not args.fixtures:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dennis Assistant benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("file-index", help="indexed lookup vs full os.walk")
+    p.add_argument("--files", type=int, default=1_000_000)
+    p.add_argument("--dir", help="reuse an existing generated tree")
+    p.add_argument("--repeat", type=int, default=200)
+    p.add_argument("--walk-repeat", type=int, default=3)
+    p.add_argument("--keep", action="store_true", help="keep the generated tree")
+    p.set_defaults(func=bench_file_index)
+
+    p = sub.add_parser("fuzzy", help="fuzzy name search recall and latency")
+    p.add_argument("--names", type=int, default=1_000_000)
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("-k", type=int, default=5)
+    p.set_defaults(func=bench_fuzzy)
+
+    p = sub.add_parser("router", help="local intent routing accuracy and latency")
+    p.add_argument("--repeat", type=int, default=200)
+    p.add_argument("--model-latency", type=float, default=0.8, help="stub model delay in seconds")
+    p.set_defaults(func=bench_router)
+
+    p = sub.add_parser("response-cache", help="model calls and latency for repeated utterances with the reply cache")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--model-latency", type=float, default=300, help="stub model delay in ms")
+    p.set_defaults(func=bench_response_cache)
+
+    p = sub.add_parser("multi-intent", help="compound commands: one model call, parallel tasks, ordered reply")
+    p.add_argument("--model-latency", type=float, default=800.0, help="stub model time in ms")
+    p.add_argument("--task-latency", type=float, default=200.0, help="stub time per task in ms")
+    p.set_defaults(func=bench_multi_intent)
+
+    p = sub.add_parser("tasks", help="task registry dispatch overhead and per-task stats")
+    p.add_argument("--calls", type=int, default=100000)
+    p.add_argument("--tasks", type=int, default=200)
+    p.set_defaults(func=bench_tasks)
+
+    p = sub.add_parser("conversation", help="tokens sent per turn with history, digest and a cached instruction")
+    p.add_argument("--turns", type=int, default=40)
+    p.add_argument("--history-tokens", type=int, default=400)
+    p.set_defaults(func=bench_conversation)
+
+    p = sub.add_parser("model-session", help="per-turn overhead of a new client vs a shared session")
+    p.add_argument("--turns", type=int, default=50)
+    p.add_argument("--connect-delay", type=float, default=30.0,
+                   help="ms added to each new connection to stand in for TCP+TLS setup")
+    p.set_defaults(func=bench_model_session)
+
+    p = sub.add_parser("weather", help="weather lookups: pooled cached provider vs a request per query")
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--concurrent", type=int, default=10)
+    p.add_argument("--upstream-delay", type=float, default=80.0, help="stub API time in ms")
+    p.add_argument("--connect-delay", type=float, default=30.0,
+                   help="ms added to each new connection to stand in for TCP+TLS setup")
+    p.set_defaults(func=bench_weather)
+
+    p = sub.add_parser("location", help="weather for the user's city with a prefetched, disk-cached location")
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("--startup", type=float, default=300.0, help="ms between startup and the first question")
+    p.add_argument("--upstream-delay", type=float, default=80.0, help="stub API time in ms")
+    p.set_defaults(func=bench_location)
+
+    p = sub.add_parser("replay", help="replay an utterance trace through the headless daemon's HTTP API")
+    p.add_argument("--trace", help="JSON lines of {\"at\": seconds, \"text\": ...}; synthesized if omitted")
+    p.add_argument("--save-trace", help="write the trace that was replayed to this file")
+    p.add_argument("--requests", type=int, default=500, help="length of the synthetic trace")
+    p.add_argument("--rate", type=float, default=50.0, help="arrivals per second in the synthetic trace")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed-up; 0 sends as fast as clients allow")
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--in-flight", type=int, default=8, help="requests the daemon processes at once")
+    p.add_argument("--model-latency", type=float, default=400.0, help="stand-in model time in ms")
+    p.add_argument("--upstream-delay", type=float, default=80.0, help="stand-in weather and geolocation time in ms")
+    p.add_argument("--task-latency", type=float, default=20.0, help="time of tasks that would launch programs, ms")
+    p.set_defaults(func=bench_replay)
+
+    p = sub.add_parser("documents", help="streamed, cached PDF/DOCX extraction vs reading the whole document first")
+    p.add_argument("--pages", type=int, default=500)
+    p.add_argument("--paragraphs", type=int, default=20000)
+    p.set_defaults(func=bench_documents)
+
+    p = sub.add_parser("content", help="content index throughput, incremental updates and BM25 query latency")
+    p.add_argument("--documents", type=int, default=2000, help="text and Markdown documents")
+    p.add_argument("--rich-documents", type=int, default=20, help="PDF and DOCX documents of each kind")
+    p.add_argument("--words", type=int, default=1000, help="average words per text document")
+    p.add_argument("--vocabulary", type=int, default=20000)
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--queries", type=int, default=500)
+    p.set_defaults(func=bench_content)
+
+    p = sub.add_parser("startup", help="import time of main.py and time to first window with lazy subsystems")
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("pipeline", help="ordering and memory of the request pipeline under load")
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--in-flight", type=int, default=8)
+    p.add_argument("--max-delay", type=float, default=5.0, help="max stub reply time in ms")
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser("transcript", help="append cost and memory of the chat transcript (needs a display)")
+    p.add_argument("--messages", type=int, default=10000)
+    p.add_argument("--batch", type=int, default=1000)
+    p.set_defaults(func=bench_transcript)
+
+    p = sub.add_parser("vad", help="utterance segmentation of continuous listening on synthetic audio")
+    p.add_argument("--utterances", type=int, default=20)
+    p.add_argument("--recognize-delay", type=float, default=300.0, help="stub recognizer time in ms")
+    p.add_argument("--realtime", action="store_true", help="feed audio at real-time pace and measure latency")
+    p.set_defaults(func=bench_vad)
+
+    p = sub.add_parser("ui-stress", help="UI responsiveness while many threads post updates (needs a display)")
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--messages", type=int, default=2000, help="status updates per thread")
+    p.set_defaults(func=bench_ui_stress)
+
+    p = sub.add_parser("asr", help="real-time factor and word error rate of each speech backend")
+    p.add_argument("--fixtures", help="directory of name.wav + name.txt pairs; synthesized with TTS if omitted")
+    p.add_argument("--backends", default="vosk,whisper", help="comma-separated, e.g. google,vosk,whisper")
+    p.add_argument("--vosk-model", help="Vosk model directory")
+    p.add_argument("--whisper-model", help="whisper.cpp model name or path")
+    p.set_defaults(func=bench_asr)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
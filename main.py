@@ -1,22 +1,3202 @@
+import time
+
+# Start of main.py's own imports, for --profile-startup
+IMPORT_STARTED_AT = time.perf_counter()
+
+import asyncio
+import bisect
+import collections
+import concurrent.futures
+import hashlib
+import hmac
+import heapq
+import itertools
 import json
+import logging
+import math
 import os
+import re
+import secrets
+import shlex
+import shutil
+import socket
+import struct
+import sys
+import wave
 import subprocess
 import webbrowser
 import threading
 import queue
-import speech_recognition as sr
+import sqlite3
+import importlib
+import zipfile
+import multiprocessing
+import argparse
+from array import array
 from datetime import datetime
-import tkinter as tk
-from tkinter import scrolledtext, filedialog, ttk
-import pyttsx3
-import requests
-from google import genai
-from google.genai import types
+
+try:
+    import audioop
+except ImportError:
+    # Removed from the standard library in Python 3.13 (see audioop-lts)
+    audioop = None
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access
+
+    Heavy dependencies are imported this way so the window can appear
+    before they load; warm_up() then loads them in the background, and a
+    first use during that import simply waits for it to finish.
+    """
+
+    # One lock for all of them: importing a package and its submodule from two
+    # threads at once can fail with a KeyError
+    _lock = threading.RLock()
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{' (loaded)' if self.loaded else ''}>"
+
+
+sr = LazyModule("speech_recognition")
+pyttsx3 = LazyModule("pyttsx3")
+requests = LazyModule("requests")
+genai = LazyModule("google.genai")
+types = LazyModule("google.genai.types")
+# Only needed when a document is read
+PyPDF2 = LazyModule("PyPDF2")
+ElementTree = LazyModule("xml.etree.ElementTree")
+# Only needed by the window, so --daemon runs where Tk is not installed
+tk = LazyModule("tkinter")
+scrolledtext = LazyModule("tkinter.scrolledtext")
+filedialog = LazyModule("tkinter.filedialog")
+ttk = LazyModule("tkinter.ttk")
+
+# Heavy modules in the order warm-up loads them
+LAZY_MODULES = {
+    "requests": requests,
+    "google.genai": genai,
+    "google.genai.types": types,
+    "speech_recognition": sr,
+    "pyttsx3": pyttsx3,
+}
+
+logger = logging.getLogger(__name__)
+
+IMPORTS_FINISHED_AT = time.perf_counter()
+
+
+# Directory where Dennis keeps its caches and indexes; DENNIS_DATA_DIR moves it elsewhere
+DATA_DIR = os.getenv("DENNIS_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".dennis")
+
+# Directories that are never worth searching for user files
+SKIP_DIR_NAMES = {
+    'Windows',
+    'System32',
+    'SysWOW64',
+    'Program Files',
+    'Program Files (x86)',
+    '$Recycle.Bin',
+    'System Volume Information',
+    'node_modules',
+    '__pycache__',
+}
+SKIP_DIR_PATHS = {'/proc', '/sys', '/dev', '/run', '/snap', '/var/lib/docker', DATA_DIR}
+
+
+def default_index_roots():
+    """Return the directories the file index covers on this platform"""
+    if os.name == "nt":
+        return [f"{d}:\\" for d in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' if os.path.exists(f"{d}:\\")]
+    return [os.path.expanduser("~")]
+
+
+def open_path(path):
+    """Open a file or folder with the desktop's default application"""
+    if hasattr(os, "startfile"):
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", path], start_new_session=True)
+    else:
+        subprocess.Popen(["xdg-open", path], start_new_session=True)
+
+
+def should_skip_dir(parent, name):
+    """Check whether a directory should be left out of searches and the index"""
+    return (name.startswith('$') or name in SKIP_DIR_NAMES
+            or os.path.join(parent, name) in SKIP_DIR_PATHS)
+
+
+class ParallelSearch:
+    """Shared thread pool that scans directory trees and stops at the first hit"""
+
+    def __init__(self, max_workers=8, progress_every=1000):
+        self.progress_every = progress_every
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="search")
+
+    def search(self, roots, match, progress=None):
+        """Return the path of the first os.DirEntry accepted by match, or None
+
+        Every directory is its own task, so one large drive is spread over
+        the whole pool. progress(scanned_dirs) is called periodically.
+        """
+        state = {"pending": 0, "scanned": 0, "hit": None}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def submit(paths):
+            # Count every path before any is scanned, so pending cannot reach 0 early
+            with lock:
+                state["pending"] += len(paths)
+            for path in paths:
+                self._executor.submit(scan, path)
+
+        def scan(path):
+            try:
+                if done.is_set():
+                    return
+                subdirs = []
+                try:
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            if match(entry):
+                                with lock:
+                                    if state["hit"] is None:
+                                        state["hit"] = entry.path
+                                done.set()
+                                return
+                            if entry.is_dir(follow_symlinks=False) and not should_skip_dir(path, entry.name):
+                                subdirs.append(entry.path)
+                except OSError:
+                    return
+                submit(subdirs)
+                with lock:
+                    state["scanned"] += 1
+                    scanned = state["scanned"]
+                if progress and scanned % self.progress_every == 0:
+                    progress(scanned)
+            finally:
+                with lock:
+                    state["pending"] -= 1
+                    if state["pending"] == 0:
+                        done.set()
+
+        roots = [r for r in roots if os.path.isdir(r)]
+        if not roots:
+            return None
+        submit(roots)
+        done.wait()
+        # Tasks still queued see done and return without scanning
+        return state["hit"]
+
+
+class LatencyRecorder:
+    """Keeps the most recent latency samples and reports percentiles"""
+
+    def __init__(self, max_samples=1000):
+        self.samples = collections.deque(maxlen=max_samples)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, points=(50, 95, 99)):
+        """Return {"p50": ms, ...} over the kept samples"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {f"p{p}": 0.0 for p in points}
+        return {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in points}
+
+
+class UIMessageQueue(queue.Queue):
+    """Queue of (type, message) pairs for the UI that wakes the Tk loop when filled
+
+    This is the only way other threads may change the UI. Message types:
+    status (text), assistant_delta (text), assistant_response (text),
+    input_fill ((text, send)), mic_state (listening flag) and progress
+    ((label, fraction or None for busy) or None to hide).
+
+    notify is called at most once between two drained() calls, so a burst
+    of messages costs a single wake-up.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.notify = None
+        self.last_enqueued_at = None
+        self._enqueued_at = collections.deque()
+        self._signalled = False
+
+    def _put(self, item):
+        self._enqueued_at.append(time.perf_counter())
+        super()._put(item)
+
+    def _get(self):
+        self.last_enqueued_at = self._enqueued_at.popleft()
+        return super()._get()
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        # Checked and set under the queue's lock, or two producers could both notify
+        with self.mutex:
+            signal = self.notify is not None and not self._signalled
+            self._signalled = self._signalled or signal
+        if signal:
+            self.notify()
+
+    def drained(self):
+        """Called by the consumer before it empties the queue"""
+        with self.mutex:
+            self._signalled = False
+
+
+class FileIndex:
+    """Persistent SQLite index of file and folder names for fast lookups"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_lower TEXT NOT NULL,
+            kind TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+    BATCH_SIZE = 10000
+
+    def __init__(self, db_path=None, roots=None, max_age=7 * 24 * 3600):
+        self.db_path = db_path or os.path.join(DATA_DIR, "file_index.db")
+        self.roots = roots or default_index_roots()
+        self.max_age = max_age
+        self.ready = threading.Event()
+        self.building = False
+        # Callables notified with the applied deltas, or None after a full rebuild
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._conn = None
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        if self.built_at() is not None:
+            self.ready.set()
+
+    def built_at(self):
+        """Return the time of the last completed build, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def is_stale(self):
+        built_at = self.built_at()
+        return built_at is None or time.time() - built_at > self.max_age
+
+    def start_background_build(self):
+        """Build the index in a daemon thread unless a build is already running"""
+        if self.building:
+            return
+        self.building = True
+        threading.Thread(target=self.build, daemon=True).start()
+
+    def build(self):
+        """Walk every root once and replace the index with the result"""
+        self.building = True
+        tmp_path = self.db_path + ".building"
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            conn = sqlite3.connect(tmp_path)
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(self.SCHEMA)
+
+            rows = []
+            for root_dir in self.roots:
+                for root, dirs, files in os.walk(root_dir, topdown=True):
+                    dirs[:] = [d for d in dirs if not should_skip_dir(root, d)]
+                    for d in dirs:
+                        rows.append((os.path.join(root, d), d, d.lower(), 'dir'))
+                    for f in files:
+                        rows.append((os.path.join(root, f), f, f.lower(), 'file'))
+                    if len(rows) >= self.BATCH_SIZE:
+                        conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+                        rows = []
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+
+            # Building the lookup index after the bulk insert is much faster
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(name_lower, kind)")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('built_at', ?)", (str(time.time()),))
+            conn.commit()
+            conn.close()
+
+            with self._lock:
+                self._conn.close()
+                os.replace(tmp_path, self.db_path)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.ready.set()
+            for listener in self.listeners:
+                listener(None)
+        finally:
+            self.building = False
+
+    @staticmethod
+    def _prefix_end(prefix):
+        """Smallest string greater than every string starting with prefix, or None if there is none"""
+        while prefix:
+            last = ord(prefix[-1])
+            if last < sys.maxunicode:
+                # Surrogates cannot be stored, so the range continues after them
+                return prefix[:-1] + chr(0xE000 if 0xD800 <= last + 1 <= 0xDFFF else last + 1)
+            prefix = prefix[:-1]
+        return None
+
+    def lookup(self, name, kind=None, mode="exact", limit=20):
+        """Find paths by name. mode is 'exact', 'nocase' or 'prefix'"""
+        name_lower = name.lower()
+        if mode == "prefix":
+            # Text compares by UTF-8 bytes, which order like code points, so this is the prefix range
+            sql = "SELECT path FROM entries WHERE name_lower >= ?"
+            params = [name_lower]
+            end = self._prefix_end(name_lower)
+            if end is not None:
+                sql += " AND name_lower < ?"
+                params.append(end)
+        else:
+            sql = "SELECT path FROM entries WHERE name_lower = ?"
+            params = [name_lower]
+            if mode == "exact":
+                # Filter before LIMIT so case variants cannot crowd out the exact match
+                sql += " AND name = ?"
+                params.append(name)
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [path for path, in rows]
+
+    def find(self, name, kind=None):
+        """Return the best matching paths, preferring exact over case-insensitive matches"""
+        return self.lookup(name, kind) or self.lookup(name, kind, mode="nocase")
+
+    def directories(self):
+        """Return every indexed directory path"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT path FROM entries WHERE kind = 'dir'")]
+
+    def names(self):
+        """Return every distinct (name, kind) pair in the index"""
+        with self._lock:
+            return self._conn.execute("SELECT DISTINCT name, kind FROM entries").fetchall()
+
+    def entries(self):
+        """Return (path, kind) for every indexed entry"""
+        with self._lock:
+            return self._conn.execute("SELECT path, kind FROM entries").fetchall()
+
+    def apply(self, changes):
+        """Apply ("add", path, kind), ("remove", path) and ("rename", old, new) deltas"""
+        with self._lock, self._conn:
+            for change in changes:
+                if change[0] == "add":
+                    _, path, kind = change
+                    name = os.path.basename(path)
+                    self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                       (path, name, name.lower(), kind))
+                elif change[0] == "remove":
+                    self._conn.execute("DELETE FROM entries WHERE path = ?", (change[1],))
+                    self._conn.execute("DELETE FROM entries WHERE path >= ? AND path < ?",
+                                       self._subtree_range(change[1]))
+                elif change[0] == "rename":
+                    _, old_path, new_path = change
+                    rows = self._conn.execute(
+                        "SELECT path, kind FROM entries WHERE path = ? OR (path >= ? AND path < ?)",
+                        (old_path,) + self._subtree_range(old_path)).fetchall()
+                    self._conn.execute("DELETE FROM entries WHERE path = ?", (old_path,))
+                    self._conn.execute("DELETE FROM entries WHERE path >= ? AND path < ?",
+                                       self._subtree_range(old_path))
+                    for path, kind in rows:
+                        moved = new_path + path[len(old_path):]
+                        name = os.path.basename(moved)
+                        self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                           (moved, name, name.lower(), kind))
+        for listener in self.listeners:
+            listener(changes)
+
+    @staticmethod
+    def _subtree_range(path):
+        # Everything below path sorts between "path/" and "path0" ("0" follows "/")
+        return (path + os.sep, path + chr(ord(os.sep) + 1))
+
+
+class FuzzyIndex:
+    """Trigram index over names that ranks near matches like "Lab 9" for "lab9.pdf" """
+
+    # Stop counting once this many postings were read; the rarest trigrams go first
+    MAX_POSTINGS = 100000
+    CANDIDATES = 100
+
+    def __init__(self, strip_extension=False):
+        self.strip_extension = strip_extension
+        self.keys = []
+        self.payloads = []
+        self._key_ids = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def normalize(self, name):
+        """Lowercase a name and drop everything but letters and digits"""
+        if self.strip_extension:
+            name = os.path.splitext(name)[0]
+        return re.sub(r'[^a-z0-9]', '', name.lower())
+
+    @staticmethod
+    def trigrams(key):
+        padded = f"^{key}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name, payload):
+        key = self.normalize(name)
+        if not key:
+            return
+        with self._lock:
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = len(self.keys)
+                self._key_ids[key] = key_id
+                self.keys.append(key)
+                self.payloads.append([payload])
+                for gram in self.trigrams(key):
+                    postings = self._postings.get(gram)
+                    if postings is None:
+                        postings = self._postings[gram] = array('I')
+                    postings.append(key_id)
+            elif payload not in self.payloads[key_id]:
+                self.payloads[key_id].append(payload)
+
+    def search(self, query, k=5, min_score=0.3):
+        """Return up to k (score, payloads) pairs, best first"""
+        key = self.normalize(query)
+        if not key:
+            return []
+        grams = self.trigrams(key)
+        counts = collections.Counter()
+        with self._lock:
+            exact_id = self._key_ids.get(key)
+            postings = sorted((self._postings[g] for g in grams if g in self._postings), key=len)
+            read = 0
+            for p in postings:
+                if read and read + len(p) > self.MAX_POSTINGS:
+                    break
+                counts.update(p)
+                read += len(p)
+            candidates = [key_id for key_id, _ in counts.most_common(self.CANDIDATES)]
+        if exact_id is not None and exact_id not in candidates:
+            candidates.append(exact_id)
+
+        # Rank the shortlisted keys by Dice similarity over all their trigrams
+        scored = []
+        for key_id in candidates:
+            candidate = self.keys[key_id]
+            if key_id == exact_id:
+                score = 1.0
+            else:
+                candidate_grams = self.trigrams(candidate)
+                score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            if score >= min_score:
+                scored.append((score, key_id))
+        return [(score, list(self.payloads[key_id])) for score, key_id in heapq.nlargest(k, scored)]
+
+
+class _Inotify:
+    """Minimal ctypes binding for the Linux inotify API"""
+
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.watches[wd] = path
+
+    def move_watches(self, old_path, new_path):
+        """Keep watch paths correct after a watched directory is renamed"""
+        for wd, path in self.watches.items():
+            if path == old_path or path.startswith(old_path + os.sep):
+                self.watches[wd] = new_path + path[len(old_path):]
+
+    def read_events(self, timeout):
+        """Return a list of (mask, cookie, path) events, waiting at most timeout seconds"""
+        import select
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self.fd, 256 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+            offset += 16
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            parent = self.watches.get(wd)
+            if parent is None and not mask & self.IN_Q_OVERFLOW:
+                continue
+            events.append((mask, cookie, os.path.join(parent, name) if parent and name else parent))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class IndexWatcher:
+    """Keeps a FileIndex current by applying filesystem change deltas in the background"""
+
+    def __init__(self, file_index, poll_interval=30.0):
+        self.file_index = file_index
+        self.poll_interval = poll_interval
+        self.backend = None
+        self.events_applied = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._recent = collections.deque()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Return counters for applied events and index lag"""
+        now = time.time()
+        while self._recent and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+        return {
+            "backend": self.backend,
+            "events_applied": self.events_applied,
+            "events_per_second": sum(count for _, count in self._recent) / 60.0,
+            "last_lag_ms": self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
+
+    def _apply(self, changes, observed_at):
+        if not changes:
+            return
+        self.file_index.apply(changes)
+        now = time.time()
+        self.events_applied += len(changes)
+        self._recent.append((now, len(changes)))
+        self.last_lag = now - observed_at
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+    def _run(self):
+        self.file_index.ready.wait()
+        if sys.platform.startswith("linux"):
+            try:
+                self._run_inotify()
+                return
+            except OSError:
+                # Out of watches or inotify instances (ENOSPC/EMFILE); fall back to polling
+                pass
+        self._run_polling()
+
+    @staticmethod
+    def _watch(inotify, path):
+        """Add a watch, skipping paths that vanished or cannot be read"""
+        try:
+            inotify.add_watch(path)
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            pass
+
+    def _list_subtree(self, path, inotify=None):
+        """Return add deltas for a newly created directory and everything inside it"""
+        changes = []
+        for root, dirs, files in os.walk(path, topdown=True):
+            dirs[:] = [d for d in dirs if not should_skip_dir(root, d)]
+            if inotify:
+                for d in dirs:
+                    self._watch(inotify, os.path.join(root, d))
+            changes.extend(("add", os.path.join(root, d), 'dir') for d in dirs)
+            changes.extend(("add", os.path.join(root, f), 'file') for f in files)
+        return changes
+
+    def _run_inotify(self):
+        inotify = _Inotify()
+        try:
+            for path in self.file_index.roots + self.file_index.directories():
+                self._watch(inotify, path)
+            self.backend = "inotify"
+
+            while not self._stop.is_set():
+                events = inotify.read_events(timeout=1.0)
+                observed_at = time.time()
+                changes = []
+                moved_from = {}
+                for mask, cookie, path in events:
+                    kind = 'dir' if mask & _Inotify.IN_ISDIR else 'file'
+                    if mask & _Inotify.IN_Q_OVERFLOW:
+                        # Events were dropped; only a rebuild can resync
+                        self.file_index.start_background_build()
+                    elif mask & _Inotify.IN_MOVED_FROM:
+                        moved_from[cookie] = path
+                    elif mask & _Inotify.IN_MOVED_TO and cookie in moved_from:
+                        old_path = moved_from.pop(cookie)
+                        changes.append(("rename", old_path, path))
+                        if kind == 'dir':
+                            inotify.move_watches(old_path, path)
+                    elif mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                        if kind == 'dir' and should_skip_dir(os.path.dirname(path), os.path.basename(path)):
+                            continue
+                        changes.append(("add", path, kind))
+                        if kind == 'dir':
+                            self._watch(inotify, path)
+                            changes.extend(self._list_subtree(path, inotify))
+                    elif mask & _Inotify.IN_DELETE:
+                        changes.append(("remove", path))
+                # A move out of the watched trees looks like a delete
+                changes.extend(("remove", path) for path in moved_from.values())
+                self._apply(changes, observed_at)
+        finally:
+            inotify.close()
+
+    def _run_polling(self):
+        self.backend = "polling"
+        # Seed the directory snapshot from the index instead of walking the disk
+        children = collections.defaultdict(dict)
+        for path, kind in self.file_index.entries():
+            children[os.path.dirname(path)][os.path.basename(path)] = kind
+            if kind == 'dir':
+                children.setdefault(path, {})
+        for root_dir in self.file_index.roots:
+            children.setdefault(root_dir, {})
+        mtimes = {}
+        for path in children:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+
+        while not self._stop.wait(self.poll_interval):
+            changes = []
+            observed_at = time.time()
+            for path in list(children):
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    # Removed; its parent's listing reports the delete
+                    children.pop(path, None)
+                    mtimes.pop(path, None)
+                    continue
+                if mtime == mtimes.get(path):
+                    continue
+                mtimes[path] = mtime
+
+                # Only directories whose mtime changed are listed again
+                current = {}
+                try:
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not should_skip_dir(path, entry.name):
+                                    current[entry.name] = 'dir'
+                            else:
+                                current[entry.name] = 'file'
+                except OSError:
+                    continue
+                previous = children[path]
+                for name in previous.keys() - current.keys():
+                    changes.append(("remove", os.path.join(path, name)))
+                for name in current.keys() - previous.keys():
+                    full_path = os.path.join(path, name)
+                    changes.append(("add", full_path, current[name]))
+                    if current[name] == 'dir':
+                        children[full_path] = {}
+                        mtimes[full_path] = None
+                children[path] = current
+            self._apply(changes, observed_at)
+
+
+
+APP_EXTENSIONS = ('.exe', '.lnk', '.desktop', '.bat', '.cmd', '.msi', '.appimage')
+
+
+def app_name_tokens(name):
+    """Split an app or executable name into lowercase word tokens"""
+    base = os.path.basename(name)
+    if base.lower().endswith(APP_EXTENSIONS):
+        base = os.path.splitext(base)[0]
+    # "VisualStudioCode" -> "Visual Studio Code"
+    base = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', base)
+    return re.findall(r'[a-z0-9]+', base.lower())
+
+
+def app_name_keys(name):
+    """Return (key, weight) pairs a name can be looked up by, best matches weigh most"""
+    tokens = app_name_tokens(name)
+    if not tokens:
+        return []
+    keys = [("".join(tokens), 3)]
+    if len(tokens) > 1:
+        # "vs code" for "Visual Studio Code", "vsc" for the full initials
+        keys.append(("".join(t[0] for t in tokens[:-1]) + tokens[-1], 2))
+        keys.append(("".join(t[0] for t in tokens), 2))
+        keys.extend((t, 1) for t in tokens if len(t) > 2)
+    return keys
+
+
+class AppCatalog:
+    """Catalog of launchable applications, persisted between runs"""
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or os.path.join(DATA_DIR, "app_catalog.json")
+        self.ready = threading.Event()
+        self.building = False
+        self.entries = []
+        self.source_mtimes = {}
+        self._keys = {}
+        self._load()
+
+    @staticmethod
+    def source_dirs():
+        """Return (directory, recursion depth) pairs scanned for applications on this platform"""
+        if os.name == "nt":
+            program_data = os.getenv("ProgramData", "C:\\ProgramData")
+            app_data = os.getenv("APPDATA", "")
+            dirs = [
+                (os.getenv("ProgramFiles", "C:\\Program Files"), 3),
+                (os.getenv("ProgramFiles(x86)", "C:\\Program Files (x86)"), 3),
+                (os.path.join(os.getenv("LOCALAPPDATA", ""), "Programs"), 3),
+                (os.path.join(program_data, "Microsoft", "Windows", "Start Menu", "Programs"), 4),
+                (os.path.join(app_data, "Microsoft", "Windows", "Start Menu", "Programs"), 4),
+            ]
+        else:
+            home = os.path.expanduser("~")
+            dirs = [(d, 0) for d in os.getenv("PATH", "").split(os.pathsep) if d]
+            dirs += [
+                ("/usr/share/applications", 1),
+                ("/usr/local/share/applications", 1),
+                (os.path.join(home, ".local", "share", "applications"), 1),
+                ("/var/lib/flatpak/exports/share/applications", 1),
+                ("/var/lib/snapd/desktop/applications", 1),
+            ]
+        return [(d, depth) for d, depth in dirs if os.path.isdir(d)]
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.source_mtimes = data.get("source_mtimes", {})
+        self._set_entries(data.get("entries", []))
+        self.ready.set()
+
+    def is_stale(self):
+        """Check whether any scanned directory changed since the catalog was built"""
+        if not self.ready.is_set():
+            return True
+        current = {}
+        for d, _ in self.source_dirs():
+            try:
+                current[d] = os.stat(d).st_mtime
+            except OSError:
+                continue
+        return current != self.source_mtimes
+
+    def start_background_build(self):
+        if self.building:
+            return
+        self.building = True
+        threading.Thread(target=self.build, daemon=True).start()
+
+    def build(self):
+        """Scan every source directory and save the catalog"""
+        self.building = True
+        try:
+            entries = []
+            source_mtimes = {}
+            for d, depth in self.source_dirs():
+                try:
+                    source_mtimes[d] = os.stat(d).st_mtime
+                except OSError:
+                    continue
+                base_depth = d.rstrip(os.sep).count(os.sep)
+                for root, dirs, files in os.walk(d, topdown=True):
+                    if root.count(os.sep) - base_depth >= depth:
+                        dirs[:] = []
+                    for file in files:
+                        path = os.path.join(root, file)
+                        if file.endswith(".desktop"):
+                            entry = self._parse_desktop_file(path)
+                            if entry:
+                                entries.append(entry)
+                        elif os.name == "nt":
+                            if file.lower().endswith(('.exe', '.lnk')):
+                                entries.append({"name": os.path.splitext(file)[0], "target": path})
+                        elif depth == 0 and os.access(path, os.X_OK):
+                            entries.append({"name": file, "target": path})
+
+            self.source_mtimes = source_mtimes
+            self._set_entries(entries)
+            self.ready.set()
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"source_mtimes": source_mtimes, "entries": entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        finally:
+            self.building = False
+
+    @staticmethod
+    def _parse_desktop_file(path):
+        """Read Name and Exec from a freedesktop .desktop entry"""
+        name = command = None
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                in_entry = False
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("["):
+                        in_entry = line == "[Desktop Entry]"
+                    elif in_entry and line.startswith("Name=") and name is None:
+                        name = line[5:]
+                    elif in_entry and line.startswith("Exec=") and command is None:
+                        # Drop field codes like %U and %f
+                        command = re.sub(r'\s*%[a-zA-Z]', '', line[5:]).strip()
+                    elif in_entry and line == "NoDisplay=true":
+                        return None
+        except OSError:
+            return None
+        if not name or not command:
+            return None
+        return {"name": name, "target": command, "desktop": True}
+
+    def _set_entries(self, entries):
+        keys = {}
+        for i, entry in enumerate(entries):
+            names = [entry["name"]]
+            if entry.get("desktop"):
+                # The executable name is often what people say ("code", "gimp")
+                try:
+                    names.append(os.path.basename(shlex.split(entry["target"])[0]))
+                except (ValueError, IndexError):
+                    pass
+            for name in names:
+                for key, weight in app_name_keys(name):
+                    best = keys.get(key)
+                    if best is None or (weight, -len(entry["name"])) > (best[0], -len(entries[best[1]]["name"])):
+                        keys[key] = (weight, i)
+        self.entries = entries
+        self._keys = keys
+
+    def resolve(self, app_name):
+        """Return the catalog entry for a spoken app name, or None"""
+        tokens = app_name_tokens(app_name)
+        best = self._keys.get("".join(tokens))
+        return self.entries[best[1]] if best else None
+
+    def launch(self, entry):
+        """Start the application described by a catalog entry"""
+        if entry.get("desktop"):
+            subprocess.Popen(shlex.split(entry["target"]), start_new_session=True)
+        elif entry["target"].lower().endswith(".lnk"):
+            os.startfile(entry["target"])
+        else:
+            subprocess.Popen(entry["target"])
+
+
+class ResponseCache:
+    """LRU cache of model replies with per-entry TTL, keyed by normalized utterance"""
+
+    def __init__(self, path=None, max_entries=1000, intent_ttl=7 * 24 * 3600, answer_ttl=3600, save_delay=2.0):
+        self.path = path or os.path.join(DATA_DIR, "response_cache.json")
+        self.max_entries = max_entries
+        # Changes are written this many seconds later, off the reply path, together with any that follow
+        self.save_delay = save_delay
+        # Intents are safe to keep: handle_developer_task computes time, weather etc. fresh
+        self.intent_ttl = intent_ttl
+        # Conversational answers can go out of date
+        self.answer_ttl = answer_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer = None
+        self._load()
+
+    @staticmethod
+    def normalize(utterance):
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(re.sub(r"[^\w\s]", " ", utterance.lower()).split())
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, (expires_at, text) in entries:
+            if expires_at > now:
+                self._entries[key] = (expires_at, text)
+
+    def save(self):
+        with self._lock:
+            entries = list(self._entries.items())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, utterance):
+        """Return the cached model reply for an utterance, or None"""
+        key = self.normalize(utterance)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, utterance, text):
+        """Cache a raw model reply; only well-formed JSON replies are kept"""
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        ttl = self.intent_ttl if "task" in data or "tasks" in data else self.answer_ttl
+        key = self.normalize(utterance)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._changed()
+
+    def discard(self, utterance):
+        """Forget the cached reply for an utterance"""
+        with self._lock:
+            if self._entries.pop(self.normalize(utterance), None):
+                self._changed()
+
+    def _changed(self):
+        """Schedule a save on a background timer; the caller holds _lock"""
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes now; called by the save timer and when the assistant closes"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self.save()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+class DocumentReader:
+    """Extracts the text of PDF and DOCX files piece by piece, with a disk cache
+
+    chunks() is a generator: a PDF yields one page at a time and a DOCX one
+    paragraph at a time, so the first page can be read out while the rest
+    is still being parsed. A fully read document is kept under cache_dir,
+    keyed by path, mtime and size, and served from there until it changes.
+    The least recently read documents are dropped beyond max_cache_bytes.
+    """
+
+    W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+    def __init__(self, cache_dir=None, max_cache_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(DATA_DIR, "documents")
+        self.max_cache_bytes = max_cache_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def cache_path(self, path):
+        st = os.stat(path)
+        key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jsonl")
+
+    def chunks(self, path):
+        """Yield the document's text, a page or paragraph at a time
+
+        Raises ValueError for file types other than .pdf and .docx.
+        """
+        extract = {".pdf": self.pdf_pages, ".docx": self.docx_paragraphs}.get(os.path.splitext(path)[1].lower())
+        if extract is None:
+            raise ValueError(f"cannot read {os.path.basename(path)}: only PDF and DOCX files are supported")
+        cache_path = self.cache_path(path)
+        try:
+            f = open(cache_path, encoding="utf-8")
+        except OSError:
+            pass
+        else:
+            self.hits += 1
+            os.utime(cache_path)
+            with f:
+                for line in f:
+                    yield json.loads(line)
+            return
+
+        self.misses += 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for text in extract(path):
+                    if text.strip():
+                        f.write(json.dumps(text) + "\n")
+                        yield text
+            complete = True
+        finally:
+            # Only a document read to the end is cached
+            if complete:
+                os.replace(tmp_path, cache_path)
+                self._evict()
+            else:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def pdf_pages(self, path):
+        with open(path, "rb") as f:
+            # A file object rather than a path, so PyPDF2 does not load the whole file into memory
+            reader = PyPDF2.PdfReader(f)
+            for page in reader.pages:
+                yield page.extract_text() or ""
+                # Parsed objects pile up in the reader; keep only one page's worth
+                reader.resolved_objects.clear()
+
+    def docx_paragraphs(self, path):
+        with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+            body = None
+            for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    if element.tag == self.W + "body":
+                        body = element
+                    continue
+                if element.tag != self.W + "p":
+                    continue
+                parts = []
+                for node in element.iter():
+                    if node.tag == self.W + "t":
+                        parts.append(node.text or "")
+                    elif node.tag == self.W + "tab":
+                        parts.append("\t")
+                    elif node.tag in (self.W + "br", self.W + "cr"):
+                        parts.append("\n")
+                yield "".join(parts)
+                element.clear()
+                if body is not None:
+                    # Parsed paragraphs and tables are not needed again
+                    body.clear()
+
+    def _evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".jsonl")]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        while entries and total > self.max_cache_bytes:
+            entry = entries.pop(0)
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+CONTENT_EXTENSIONS = (".txt", ".md", ".pdf", ".docx")
+CONTENT_TOKEN = re.compile(r"\w+")
+
+
+def content_tokens(text):
+    """Lowercase words of text, as ContentIndex indexes and queries them"""
+    return [token for token in CONTENT_TOKEN.findall(text.lower()) if len(token) <= 40]
+
+
+def encode_positions(positions):
+    """Delta-encode ascending word positions as varints"""
+    out = bytearray()
+    last = 0
+    for position in positions:
+        delta, last = position - last, position
+        while delta >= 0x80:
+            out.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_positions(blob):
+    positions = []
+    value = shift = last = 0
+    for byte in blob:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            last += value
+            positions.append(last)
+            value = shift = 0
+    return positions
+
+
+def document_pieces(path):
+    """The text of a document in pieces: pages, paragraphs or lines"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        yield from DocumentReader().pdf_pages(path)
+    elif extension == ".docx":
+        yield from DocumentReader().docx_paragraphs(path)
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+def index_document(path):
+    """Tokenize one document for ContentIndex; runs in a worker process
+
+    Returns (path, length in words, {term: (frequency, encoded positions)}),
+    with None for the terms when the document cannot be read.
+    """
+    positions = collections.defaultdict(list)
+    length = 0
+    try:
+        for piece in document_pieces(path):
+            for token in content_tokens(piece):
+                positions[token].append(length)
+                length += 1
+    except Exception:
+        return path, 0, None
+    return path, length, {term: (len(p), encode_positions(p)) for term, p in positions.items()}
+
+
+class ContentIndex:
+    """On-disk inverted index of the words in text, Markdown, PDF and DOCX files
+
+    Documents are tokenized in a process pool. For every document a term
+    occurs in, the index keeps the term frequency and the delta-encoded word
+    positions, so search() ranks with BM25 and puts documents holding the
+    query as an exact phrase first. update() only re-reads files whose
+    mtime or size changed since they were indexed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            -- Ids of the document's terms, encoded like positions, to find its postings again
+            terms BLOB
+        );
+        CREATE TABLE IF NOT EXISTS terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT UNIQUE NOT NULL,
+            df INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            term INTEGER NOT NULL,
+            doc INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            positions BLOB NOT NULL,
+            PRIMARY KEY (term, doc)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+    # Documents written per transaction, so searches are not held up for long
+    BATCH_SIZE = 200
+    # Fewer changed documents than this are tokenized without starting a process pool
+    POOL_THRESHOLD = 8
+
+    def __init__(self, db_path=None, file_index=None, max_bytes=20 * 1024 * 1024, workers=None):
+        self.db_path = db_path or os.path.join(DATA_DIR, "content_index.db")
+        self.file_index = file_index
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.ready = threading.Event()
+        self.updating = False
+        self._pending = set()
+        self._pending_full = False
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        if self.updated_at() is not None:
+            self.ready.set()
+
+    def updated_at(self):
+        """Return the time of the last completed full update, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def start_background_update(self, paths=None):
+        """Update in a daemon thread; requests made while one runs are merged into the next"""
+        with self._lock:
+            if paths is None:
+                self._pending_full = True
+            else:
+                self._pending.update(paths)
+            if self.updating:
+                return
+            self.updating = True
+        threading.Thread(target=self._run_updates, daemon=True, name="content-index").start()
+
+    def _run_updates(self):
+        try:
+            while True:
+                with self._lock:
+                    full, paths = self._pending_full, self._pending
+                    self._pending_full, self._pending = False, set()
+                    if not full and not paths:
+                        self.updating = False
+                        return
+                self.update(None if full else paths)
+        except Exception:
+            with self._lock:
+                self.updating = False
+            raise
+
+    def update(self, paths=None):
+        """Index new and changed documents and drop deleted ones; returns (indexed, removed)
+
+        Without paths, every document in the file index is checked.
+        """
+        with self._update_lock:
+            full = paths is None
+            if full:
+                self.file_index.ready.wait()
+                paths = [path for path, kind in self.file_index.entries()
+                         if kind == 'file' and path.lower().endswith(CONTENT_EXTENSIONS)]
+            with self._lock:
+                known = {path: (mtime, size) for path, mtime, size in
+                         self._conn.execute("SELECT path, mtime_ns, size FROM documents")}
+
+            changed = {}
+            removed = set(known) - set(paths) if full else set()
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+                if st is None or not path.lower().endswith(CONTENT_EXTENSIONS) or st.st_size > self.max_bytes:
+                    if path in known:
+                        removed.add(path)
+                elif known.get(path) != (st.st_mtime_ns, st.st_size):
+                    changed[path] = (st.st_mtime_ns, st.st_size)
+
+            with self._lock, self._conn:
+                for path in removed:
+                    self._delete(path)
+            self._index(changed)
+            if full:
+                with self._lock, self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('updated_at', ?)", (str(time.time()),))
+                self.ready.set()
+            return len(changed), len(removed)
+
+    def _index(self, changed):
+        if not changed:
+            return
+        with self._lock:
+            vocabulary = dict(self._conn.execute("SELECT term, id FROM terms"))
+        batch = []
+        if len(changed) < self.POOL_THRESHOLD:
+            results = map(index_document, changed)
+            pool = None
+        else:
+            # spawn rather than fork: this process runs threads (and maybe Tk)
+            pool = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            results = pool.map(index_document, changed, chunksize=4)
+        try:
+            for result in results:
+                batch.append(result)
+                if len(batch) >= self.BATCH_SIZE:
+                    self._write(batch, changed, vocabulary)
+                    batch = []
+            self._write(batch, changed, vocabulary)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    def _write(self, batch, changed, vocabulary):
+        with self._lock, self._conn:
+            postings = []
+            df = collections.Counter()
+            for path, length, terms in batch:
+                self._delete(path)
+                mtime, size = changed[path]
+                terms = terms or {}
+                for term in terms:
+                    if term not in vocabulary:
+                        vocabulary[term] = self._conn.execute("INSERT INTO terms (term, df) VALUES (?, 0)",
+                                                              (term,)).lastrowid
+                term_ids = sorted(vocabulary[term] for term in terms)
+                # Unreadable documents are recorded too, so they are not retried until they change
+                doc = self._conn.execute(
+                    "INSERT INTO documents (path, mtime_ns, size, length, terms) VALUES (?, ?, ?, ?, ?)",
+                    (path, mtime, size, length, encode_positions(term_ids))).lastrowid
+                postings.extend((vocabulary[term], doc, tf, blob) for term, (tf, blob) in terms.items())
+                df.update(term_ids)
+            # In key order, so the inserts land next to each other in the B-tree
+            postings.sort()
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+            self._conn.executemany("UPDATE terms SET df = df + ? WHERE id = ?", [(n, term) for term, n in df.items()])
+
+    def _delete(self, path):
+        row = self._conn.execute("SELECT id, terms FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        doc, term_ids = row[0], decode_positions(row[1] or b"")
+        self._conn.executemany("UPDATE terms SET df = df - 1 WHERE id = ?", [(term,) for term in term_ids])
+        self._conn.executemany("DELETE FROM postings WHERE term = ? AND doc = ?", [(term, doc) for term in term_ids])
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (doc,))
+
+    def search(self, query, limit=10):
+        """Return up to limit {"path", "score", "phrase"} matches for query, best first"""
+        words = content_tokens(query)
+        if not words:
+            return []
+        with self._lock:
+            count, average_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM documents").fetchone()
+            if not count:
+                return []
+            average_length = average_length or 1
+            term_ids = {}
+            scores = collections.defaultdict(float)
+            for word in dict.fromkeys(words):
+                row = self._conn.execute("SELECT id, df FROM terms WHERE term = ?", (word,)).fetchone()
+                if row is None or not row[1]:
+                    continue
+                term_ids[word], df = row
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for doc, tf, length in self._conn.execute(
+                        "SELECT p.doc, p.tf, d.length FROM postings p JOIN documents d ON d.id = p.doc "
+                        "WHERE p.term = ?", (term_ids[word],)):
+                    norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                    scores[doc] += idf * tf * (self.K1 + 1) / (tf + norm)
+
+            # Of the best candidates, those with the words next to each other in order come first
+            candidates = heapq.nlargest(limit * 3, scores.items(), key=lambda item: item[1])
+            results = []
+            for doc, score in candidates:
+                phrase = len(words) > 1 and len(term_ids) == len(set(words)) and self._has_phrase(doc, words, term_ids)
+                path = self._conn.execute("SELECT path FROM documents WHERE id = ?", (doc,)).fetchone()[0]
+                results.append({"path": path, "score": score, "phrase": phrase})
+        results.sort(key=lambda r: (r["phrase"], r["score"]), reverse=True)
+        return results[:limit]
+
+    def _has_phrase(self, doc, words, term_ids):
+        positions = {}
+        for word, term in term_ids.items():
+            row = self._conn.execute("SELECT positions FROM postings WHERE term = ? AND doc = ?", (term, doc)).fetchone()
+            if row is None:
+                return False
+            positions[word] = set(decode_positions(row[0]))
+        return any(all(start + i in positions[word] for i, word in enumerate(words[1:], 1))
+                   for start in positions[words[0]])
+
+    def stats(self):
+        with self._lock:
+            documents, words = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents").fetchone()
+            terms = self._conn.execute("SELECT COUNT(*) FROM terms WHERE df > 0").fetchone()[0]
+        return {"documents": documents, "words": words, "terms": terms, "bytes": os.path.getsize(self.db_path)}
+
+
+FILETYPE_WORDS = {
+    "text": ".txt", "txt": ".txt", "python": ".py", "word": ".docx", "docx": ".docx",
+    "excel": ".xlsx", "pdf": ".pdf", "markdown": ".md", "html": ".html", "json": ".json",
+    "csv": ".csv", "javascript": ".js", "powerpoint": ".pptx",
+}
+URL_SUFFIXES = r"com|org|net|io|edu|gov|dev|ai|pk|co\.uk|co|me|tv|info"
+
+
+class WeatherProvider:
+    """Current weather from OpenWeatherMap over one pooled session, with a per-location cache
+
+    Concurrent lookups of the same location share one upstream request.
+    A report older than ttl but younger than stale_ttl is refreshed in the
+    background; if the refresh takes longer than revalidate_wait seconds
+    the old report is served instead of waiting.
+    """
+
+    def __init__(self, api_key, base_url="http://api.openweathermap.org", ttl=600, stale_ttl=3600,
+                 revalidate_wait=1.0, timeout=10, max_workers=4):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.revalidate_wait = revalidate_wait
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._session = None
+        self.upstream_latency = LatencyRecorder()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["weather_api_key"], config.get("weather_base_url") or "http://api.openweathermap.org",
+                   config.get("weather_ttl", 600))
+
+    @property
+    def session(self):
+        """The pooled HTTP session, created on first use so requests is imported lazily"""
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers)
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    @staticmethod
+    def normalize(location):
+        return " ".join(location.lower().split())
+
+    def current(self, location):
+        """Return OpenWeatherMap's current-weather JSON for a location
+
+        Raises LookupError when the service rejects the location and
+        requests.RequestException when it cannot be reached.
+        """
+        key = self.normalize(location)
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[0] if entry else None
+            if entry and age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._pool.submit(self._fetch, key, location)
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if entry and age < self.stale_ttl:
+            try:
+                data = future.result(timeout=self.revalidate_wait)
+            except (concurrent.futures.TimeoutError, LookupError, requests.RequestException):
+                # Upstream is slow or failing: the refresh carries on, the old report is good enough
+                with self._lock:
+                    self.stale_hits += 1
+                return entry[1]
+        else:
+            data = future.result()
+        with self._lock:
+            self.misses += 1
+        return data
+
+    def _fetch(self, key, location):
+        try:
+            start = time.perf_counter()
+            response = self.session.get(f"{self.base_url}/data/2.5/weather", timeout=self.timeout,
+                                        params={"q": location, "appid": self.api_key, "units": "metric"})
+            self.upstream_latency.record(time.perf_counter() - start)
+            data = response.json()
+            if response.status_code != 200:
+                raise LookupError(data.get("message", "Unknown error"))
+            with self._lock:
+                self._entries[key] = (time.monotonic(), data)
+            return data
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.stale_hits) / served if served else 0.0,
+                "upstream_calls": self.upstream_latency.count,
+                "upstream_ms": self.upstream_latency.percentiles(),
+            }
+
+
+class LocationService:
+    """The user's approximate location from IP geolocation, looked up once per network
+
+    The answer is kept on disk, so a restart on the same network costs no
+    request at all. prefetch() looks it up in the background at startup.
+    """
+
+    def __init__(self, endpoint="https://ipinfo.io/json", path=None, ttl=24 * 3600, timeout=5):
+        self.endpoint = endpoint
+        self.path = path or os.path.join(DATA_DIR, "location.json")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lookups = 0
+        self._entry = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_config(cls, config, path=None):
+        return cls(config.get("location_endpoint") or "https://ipinfo.io/json", path,
+                   ttl=config.get("location_ttl", 24 * 3600))
+
+    @staticmethod
+    def network_id():
+        """Local address of the default route; it changes when the machine moves to another network"""
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                # connect() on a UDP socket only picks a route, nothing is sent
+                s.connect(("192.0.2.1", 9))
+                return s.getsockname()[0]
+        except OSError:
+            return None
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entry = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entry, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def _is_fresh(self, network):
+        entry = self._entry
+        return (entry is not None and entry.get("network") == network
+                and time.time() - entry.get("fetched_at", 0) < self.ttl)
+
+    def current(self):
+        """Return ipinfo-style data (city, region, country, loc), or None when it cannot be found"""
+        network = self.network_id()
+        with self._lock:
+            # Callers that arrive during a lookup wait for it instead of starting another
+            if not self._is_fresh(network):
+                self.lookups += 1
+                response = requests.get(self.endpoint, timeout=self.timeout)
+                if response.status_code != 200:
+                    return None
+                self._entry = {"fetched_at": time.time(), "network": network, "data": response.json()}
+                self._save()
+            return self._entry["data"]
+
+    def city(self):
+        """The user's city, or None"""
+        try:
+            data = self.current()
+        except (requests.RequestException, ValueError):
+            # ValueError: the reply was not JSON, e.g. a captive portal's login page
+            return None
+        return data.get("city") if isinstance(data, dict) else None
+
+    def prefetch(self):
+        threading.Thread(target=self.city, daemon=True).start()
+
+
+def resolve_spoken_location(location):
+    """Turn "d drive", "desktop" or "documents" into a real path; other values pass through"""
+    if not location:
+        return None
+    spoken = location.strip().lower()
+    drive = re.fullmatch(r"(?:drive )?([a-z])(?::\\?)?(?: drive)?", spoken)
+    if drive:
+        return f"{drive.group(1).upper()}:\\" if os.name == "nt" else location
+    for folder in ("Desktop", "Documents", "Downloads", "Music", "Pictures", "Videos"):
+        if spoken in (folder.lower(), f"my {folder.lower()}", f"the {folder.lower()}"):
+            return os.path.join(os.path.expanduser("~"), folder)
+    return location
+
+
+class IntentRouter:
+    """Rule-based classifier for deterministic commands, so they skip the model
+
+    route() returns the same task JSON the model would, or None when no
+    rule matches the whole utterance.
+    """
+
+    def __init__(self, is_known_app=None):
+        # Optional predicate so "open <x>" is only routed for installed apps
+        self.is_known_app = is_known_app
+        self.routed = 0
+        self.passed = 0
+        self._rules = [(re.compile(pattern, re.IGNORECASE), handler) for pattern, handler in (
+            (r"(?:what(?: is|s) the |tell me the |the |current )?time(?: is it)?(?: now| right now)?"
+             r"|what time is it(?: now| right now)?", self._current("current_time")),
+            (r"(?:what(?: is|s) )?(?:the |today(?:s)? )?date(?: today)?(?: is it)?"
+             r"|what date is (?:it|today)(?: today)?", self._current("current_date")),
+            (r"what day is (?:it|today)(?: today)?|which day is (?:it|today)|what(?: is|s) today",
+             self._current("current_day")),
+            (r"what year is (?:it|this)|(?:what(?: is|s) the )?current year", self._current("current_year")),
+            (r"where am i|(?:what(?: is|s) )?my (?:current )?location", self._current("get_location")),
+            (r"(?:what(?: is|s) |hows |how is )?(?:the )?weather(?: like)?(?: today| now)?"
+             r"(?: in (?P<name>[a-z .'-]+?))?(?: today| now)?", self._weather),
+            (r"(?:open|go to|visit|launch) (?P<domain>[a-z0-9-]+(?:\.[a-z0-9-]+)*\.(?:" + URL_SUFFIXES + "))",
+             self._url),
+            (r"(?:create|make) (?:a )?(?:new )?(?:folder|directory)(?: called| named)? (?P<name>.+?)"
+             r"(?: (?:in|on|at|inside) (?P<location>.+))?", self._create_folder),
+            (r"(?:create|make) (?:a )?(?:new )?(?:(?P<type>\w+) )?file(?: called| named)? (?P<name>.+?)"
+             r"(?: (?:in|on|at|inside) (?P<location>.+))?", self._create_file),
+            (r"(?P<operation>find|search for|look for|open|show me) (?:the |my |a )?"
+             r"(?:file|document|doc|report|note|pdf)s? (?:that |which )?(?:mentions?|contains?|says?|talks? about|"
+             r"(?:is |are )?about) (?P<name>.+)", self._find_content),
+            (r"(?:open|launch|start|run) (?P<name>[a-z0-9 .+-]+?)(?: app| application)?", self._open_app),
+        )]
+
+    @staticmethod
+    def normalize(utterance):
+        """Drop apostrophes, commas and trailing punctuation; case is kept for names"""
+        text = utterance.replace("'", "").replace("\u2019", "").replace(",", " ")
+        return " ".join(text.strip().rstrip("?!.").split())
+
+    # "... and open chrome": several commands in one utterance are split by the model
+    COMPOUND = re.compile(r"\b(?:and|then|also)(?: then| also)? (?:open|launch|start|run|create|make|tell|show|"
+                          r"play|read|what|whats|where|how|search|close|get|go)\b", re.IGNORECASE)
+
+    def route(self, utterance):
+        text = self.normalize(utterance)
+        # "please" and "dennis" add nothing to the intent
+        text = re.sub(r"^(?:hey |hi |ok |okay )?(?:dennis )?(?:please |can you |could you )*"
+                      r"|(?: please| dennis)+$", "", text, flags=re.IGNORECASE)
+        if self.COMPOUND.search(text):
+            self.passed += 1
+            return None
+        for pattern, handler in self._rules:
+            match = pattern.fullmatch(text)
+            if match:
+                intent = handler(match)
+                if intent:
+                    self.routed += 1
+                    return intent
+        self.passed += 1
+        return None
+
+    @staticmethod
+    def _intent(task, operation, name=None, location=None, filetype=None):
+        return {"task": task, "operation": operation, "name": name, "location": location, "filetype": filetype}
+
+    def _current(self, task):
+        return lambda match: self._intent(task, "get")
+
+    def _weather(self, match):
+        name = match.group("name")
+        return self._intent("get_weather", "get", name.strip().title() if name else None)
+
+    def _url(self, match):
+        return self._intent("open_url", "open", f"https://{match.group('domain').lower()}")
+
+    def _create_folder(self, match):
+        name = match.group("name").strip()
+        return self._intent("create_folder", "create", name, resolve_spoken_location(match.group("location")))
+
+    def _create_file(self, match):
+        name = match.group("name").strip()
+        filetype = FILETYPE_WORDS.get((match.group("type") or "").lower())
+        stem, ext = os.path.splitext(name)
+        if stem and ext.lower() in FILETYPE_WORDS.values():
+            name, filetype = stem, ext.lower()
+        if not filetype:
+            # The model is better at guessing a file type
+            return None
+        return self._intent("create_file", "create", name, resolve_spoken_location(match.group("location")), filetype)
+
+    def _find_content(self, match):
+        operation = "open" if match.group("operation").lower() == "open" else "find"
+        return self._intent("find_content", operation, match.group("name").strip())
+
+    def _open_app(self, match):
+        name = match.group("name").strip()
+        if self.is_known_app and self.is_known_app(name):
+            return self._intent("open_app", "open", name)
+        return None
+
+
+DEFAULT_CONFIG = {
+    "api_key": "",
+    "model": "gemini-2.5-flash-preview-04-17",
+    # Point at a local stand-in server for testing, None for the real API
+    "model_base_url": None,
+    "temperature": 0.7,
+    "warm_up": True,
+    # Render and speak the reply while the model is still generating it
+    "stream_responses": True,
+    # Requests processed at the same time; replies are still shown in order
+    "max_in_flight": 2,
+    # Tasks of one compound command ("create X and open chrome") run at the same time
+    "max_parallel_tasks": 4,
+    # Tasks slower than this many seconds are kept in the slow-task log
+    "slow_task_seconds": 1.0,
+    # Show which tasks take the most time in the status bar
+    "show_task_stats": False,
+    # A new message cancels requests that have not answered yet
+    "supersede_requests": False,
+    # Estimated tokens of recent turns sent along for follow-up context; older turns become a digest
+    "history_tokens": 1500,
+    # Register the system instruction once as cached content instead of sending it every turn
+    "cache_system_instruction": True,
+    # The mic button keeps one stream open and segments utterances locally
+    "continuous_listening": True,
+    # Speech recognizer: "google" (online), "vosk" or "whisper" (offline, on CPU)
+    "speech_backend": "google",
+    # Vosk model directory or whisper.cpp model name/path; None uses the backend's default
+    "speech_model": None,
+    "weather_api_key": "8d2de98e089f1c28e1a22fc19a24ef04",  # Free OpenWeatherMap key
+    # Point at a local stub server for testing
+    "weather_base_url": "http://api.openweathermap.org",
+    # Seconds a weather report is served from cache before it is fetched again
+    "weather_ttl": 600,
+    # Used for "what's the weather" when the user's own city cannot be found
+    "weather_default_city": "Karachi",
+    # Address of the local JSON API when started with --daemon
+    "daemon_host": "127.0.0.1",
+    "daemon_port": 8765,
+    # API requests processed at the same time in daemon mode
+    "daemon_max_in_flight": 8,
+    # Bearer token the daemon API requires; None generates one into daemon_token in the data directory
+    "daemon_token": None,
+    # IP geolocation; point at a local stand-in for testing
+    "location_endpoint": "https://ipinfo.io/json",
+    # Seconds the looked-up location is trusted while the network stays the same
+    "location_ttl": 24 * 3600,
+    # Characters of a PDF or DOCX read out per request; the rest is left for opening the document
+    "read_aloud_chars": 20000,
+    # Extracted document text kept on disk, in MB
+    "document_cache_mb": 200,
+    # Index the words inside txt, md, pdf and docx files for find_content
+    "content_index": True,
+    # Larger documents are not indexed
+    "content_max_mb": 20,
+    # Processes tokenizing documents; None uses every CPU
+    "content_workers": None,
+}
+
+
+def load_config(path=None):
+    """Read config.json from the data directory over the defaults; env vars win"""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path or os.path.join(DATA_DIR, "config.json"), encoding="utf-8") as f:
+            config.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    config["api_key"] = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or config["api_key"]
+    config["model"] = os.getenv("DENNIS_MODEL") or config["model"]
+    return config
+
+
+SYSTEM_INSTRUCTION = """
+      You are a Desktop Virtual Assistant named "Dennis". Your responsibilities include understanding user commands and responding in a natural, helpful manner. You operate in two modes:
+
+Model-Handled Tasks (within your control):  
+You can directly respond to the following tasks:  
+- Thinking, reasoning, and simple conversation  
+- Web searches  
+- General queries that don’t require real-time system access or dynamic data  
+
+For these, respond naturally and conversationally without referencing internal logic, code structures, or developer concepts.  
+If user ask to open anything on this system, you will respond with the following message:
+```json
+{
+  "response": "Please tell me which file,folder or app you want me to open."
+}
+```
+Developer-Handled Tasks (outside your control):  
+You cannot perform system-level tasks or provide real-time data (like current date/time/weather). Instead, your role is to:  
+- Extract the user’s intent  
+- Identify the operation type (e.g., creation, deletion, opening)  
+- Parse the name of the file, folder, application, or media  
+- Determine the location/path if mentioned  
+- Return a structured JSON-style object to guide backend implementation  
+For model handled tasks, respond naturally. For developer-handled tasks, provide a JSON object with the following structure:
+```json
+{
+  "response": "<natural_response>"
+}
+```
+For developer-handled tasks, return a JSON object with the following structure:
+Tasks in this category include:  
+- open_app / 
+- create_file / open_file / read_file  
+- create_folder / open_folder /
+- current_date / current_day / current_year / current_time  
+- read_pdf / read_docx  
+- play_music  
+- get_weather / get_location / get_path / open_url  
+- find_content (files by what they say: put the words to look for in "name"; operation "open" opens the best match, "find" lists matches)  
+For opening apps if user give wrong name you will assign the name that is in its .exe file inorder to run the app but donot add the extension in the json obj key "name": by analyzing on your own.
+For url decide the domain type (e.g., .com, .org, etc.) on your own.
+For files, decide the file type (e.g., .txt, .pdf, etc.) on your own.
+For developer-handled tasks, return a JSON object with the following structure:
+JSON Output Format (only for developer-handled tasks):  
+```json
+{
+  "task": "<task_name>",
+  "operation": "<operation_type>",
+  "name": "<entity_name>",
+  "location": "<location_path>",
+  "filetype": "<file_extension>"
+}
+```
+If one message asks for several things, return every part in the order the user said them, in one object:
+```json
+{
+  "tasks": [
+    {"task": "create_folder", "operation": "create", "name": "Reports", "location": "D:/", "filetype": null},
+    {"task": "open_folder", "operation": "open", "name": "Reports", "location": "D:/", "filetype": null},
+    {"response": "<natural_response for a part you can answer yourself>"}
+  ]
+}
+```
+Repeat the name instead of writing "it". Add "after": [<index>] to a task that must wait for earlier tasks in the list;
+tasks on the same name already run in the order given.
+
+        """
+
+
+class ModelSession:
+    """One long-lived Gemini client with the request config built once
+
+    The client keeps its HTTP connection pool, so turns after the first
+    skip connection setup and the TLS handshake. The system instruction is
+    registered once as cached content, so each turn only sends the
+    conversation; if the model or account cannot cache it, it is sent
+    inline as before.
+    """
+
+    def __init__(self, api_key, model, base_url=None, temperature=0.7, system_instruction=SYSTEM_INSTRUCTION,
+                 cache_system_instruction=True, cache_ttl=3600):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.temperature = temperature
+        self.system_instruction = system_instruction
+        self.cache_system_instruction = cache_system_instruction
+        self.cache_ttl = cache_ttl
+        self.cache_name = None
+        self._cache_expires_at = 0
+        self._client = None
+        self._config = None
+        self._cached_config = None
+        self._lock = threading.Lock()
+        # Token counts of recent model calls: {"prompt", "cached", "output"}
+        self.usage = collections.deque(maxlen=100)
+        self.calls = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["api_key"], config["model"], config.get("model_base_url"), config.get("temperature", 0.7),
+                   cache_system_instruction=config.get("cache_system_instruction", True))
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+                self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+                self._config = types.GenerateContentConfig(
+                    temperature=self.temperature,
+                    response_mime_type="application/json",
+                    system_instruction=[types.Part.from_text(text=self.system_instruction)],
+                )
+            return self._client
+
+    def warm_up(self):
+        """Open the pooled connection and cache the system instruction ahead of the first user turn"""
+        try:
+            self.client.models.get(model=self.model)
+            self.request_config()
+        except Exception:
+            # Warm-up is best effort; the first real request reports errors
+            pass
+
+    def request_config(self):
+        """Config for one turn: the cached system instruction when there is one, inline otherwise"""
+        client = self.client
+        if not self.cache_system_instruction:
+            return self._config
+        with self._lock:
+            # Renew a minute early so a turn never lands on an expired cache
+            if self._cached_config is None or time.monotonic() > self._cache_expires_at - 60:
+                try:
+                    cache = client.caches.create(model=self.model, config=types.CreateCachedContentConfig(
+                        system_instruction=self.system_instruction,
+                        ttl=f"{self.cache_ttl}s",
+                        display_name="dennis-system-instruction",
+                    ))
+                    if not cache.name:
+                        raise ValueError("No cached content name in the reply")
+                except Exception:
+                    # Too short for this model's minimum, or caching is unavailable
+                    self.cache_system_instruction = False
+                    return self._config
+                self.cache_name = cache.name
+                self._cache_expires_at = time.monotonic() + self.cache_ttl
+                self._cached_config = types.GenerateContentConfig(
+                    temperature=self.temperature,
+                    response_mime_type="application/json",
+                    cached_content=cache.name,
+                )
+            return self._cached_config
+
+    def _drop_cache(self):
+        with self._lock:
+            self._cached_config = None
+
+    @staticmethod
+    def contents(user_input, history=()):
+        """Earlier (role, text) turns followed by the new user turn"""
+        return [types.Content(role=role, parts=[types.Part.from_text(text=text)])
+                for role, text in list(history) + [("user", user_input)]]
+
+    def _record_usage(self, usage):
+        self.calls += 1
+        if usage is not None:
+            self.usage.append({
+                "prompt": usage.prompt_token_count or 0,
+                "cached": usage.cached_content_token_count or 0,
+                "output": usage.candidates_token_count or 0,
+            })
+
+    def generate(self, user_input, history=()):
+        """Send one user turn with the conversation so far and return the model's raw JSON text"""
+        client = self.client
+        config = self.request_config()
+        contents = self.contents(user_input, history)
+        try:
+            response = client.models.generate_content(model=self.model, contents=contents, config=config)
+        except Exception:
+            if config is self._config:
+                raise
+            # The cache may have been evicted early; send the instruction inline this once
+            self._drop_cache()
+            response = client.models.generate_content(model=self.model, contents=contents, config=self._config)
+        self._record_usage(response.usage_metadata)
+        return response.text
+
+    def stream(self, user_input, history=()):
+        """Send one user turn with the conversation so far and yield the raw JSON text as it is generated"""
+        client = self.client
+        config = self.request_config()
+        contents = self.contents(user_input, history)
+        try:
+            chunks = iter(client.models.generate_content_stream(model=self.model, contents=contents, config=config))
+            first = next(chunks, None)
+        except Exception:
+            if config is self._config:
+                raise
+            self._drop_cache()
+            chunks = iter(client.models.generate_content_stream(model=self.model, contents=contents,
+                                                                config=self._config))
+            first = next(chunks, None)
+        usage = None
+        for chunk in itertools.chain([first] if first is not None else [], chunks):
+            # The last chunk carries the token counts of the whole call
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+        self._record_usage(usage)
+
+
+class ConversationMemory:
+    """Recent turns sent with each request so follow-ups like "open it" make sense
+
+    The window is kept under max_tokens (estimated at four characters per
+    token). Turns that fall out of it are folded into a one-line-per-turn
+    digest, which is itself capped at digest_tokens.
+    """
+
+    # Words that only mean something given earlier turns
+    CONTEXT_DEPENDENT = re.compile(
+        r"\b(?:it|its|that|this|those|these|them|there|he|she|they|him|her|his|one|again|same|previous|"
+        r"last|instead|too|also)\b|^(?:and|what about|how about|and what about)\b", re.IGNORECASE)
+
+    def __init__(self, max_tokens=1500, digest_tokens=200):
+        self.max_tokens = max_tokens
+        self.digest_tokens = digest_tokens
+        self._turns = collections.deque()
+        self._digest = collections.deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text):
+        return len(text) // 4 + 1
+
+    def is_context_dependent(self, utterance):
+        """True for utterances whose meaning depends on the conversation so far"""
+        return bool(self._turns or self._digest) and bool(self.CONTEXT_DEPENDENT.search(utterance))
+
+    @staticmethod
+    def _digest_line(user_input, reply):
+        try:
+            data = json.loads(reply)
+        except (TypeError, ValueError):
+            data = {"response": str(reply)}
+        if "tasks" in data:
+            outcome = "; ".join(f"{task.get('task', 'replied')} {task.get('name') or ''}".strip()
+                                for task in data["tasks"] if isinstance(task, dict))
+        elif "task" in data:
+            outcome = f"{data['task']} {data.get('name') or ''}".strip()
+        else:
+            outcome = " ".join(str(data.get("response", "")).split()[:15])
+        return f"- user: {' '.join(user_input.split()[:15])} -> {outcome}"
+
+    def add(self, user_input, reply):
+        """Remember a finished turn; reply is the model's raw JSON text"""
+        with self._lock:
+            self._turns.append((user_input, reply, self.estimate_tokens(user_input) + self.estimate_tokens(reply)))
+            while len(self._turns) > 1 and sum(turn[2] for turn in self._turns) > self.max_tokens:
+                old_input, old_reply, _ = self._turns.popleft()
+                self._digest.append(self._digest_line(old_input, old_reply))
+            while self._digest and sum(self.estimate_tokens(line) for line in self._digest) > self.digest_tokens:
+                self._digest.popleft()
+
+    def history(self):
+        """(role, text) pairs to send before the next user turn"""
+        with self._lock:
+            history = []
+            if self._digest:
+                history.append(("user", "Summary of the earlier conversation:\n" + "\n".join(self._digest)))
+                history.append(("model", json.dumps({"response": "Noted."})))
+            for user_input, reply, _ in self._turns:
+                history.append(("user", user_input))
+                history.append(("model", reply))
+            return history
+
+    def tokens(self):
+        """Estimated tokens the history adds to each request"""
+        return sum(self.estimate_tokens(text) for _, text in self.history())
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._digest.clear()
+
+
+class ResponseFieldExtractor:
+    """Decodes the top-level "response" string of a JSON reply while the reply is still streaming in
+
+    A "response" nested deeper, such as a part of a {"tasks": [...]} reply,
+    is not streamed; that reply is only complete once its tasks have run.
+    """
+
+    _START = re.compile(r'"response"\s*:\s*"')
+    _KEY = '"response"'
+    _ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+    def __init__(self):
+        self.done = False
+        self._buffer = ""
+        self._pos = None
+        # Where scanning for the key resumes, and the JSON nesting there
+        self._scan = 0
+        self._depth = 0
+        self._in_string = False
+
+    def _find_start(self):
+        """Return where the top-level response string begins, or None if it has not arrived yet"""
+        text = self._buffer
+        i = self._scan
+        while i < len(text):
+            c = text[i]
+            if self._in_string:
+                if c == '\\':
+                    if i + 1 >= len(text):
+                        break
+                    i += 1
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                if self._depth == 1:
+                    match = self._START.match(text, i)
+                    if match:
+                        return match.end()
+                    tail = text[i:]
+                    if (self._KEY.startswith(tail) or tail.startswith(self._KEY)
+                            and re.fullmatch(r'\s*(:\s*)?', tail[len(self._KEY):])):
+                        # The key may be split across chunks
+                        break
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+            i += 1
+        self._scan = i
+        return None
+
+    def feed(self, chunk):
+        """Add raw text and return the newly decoded part of the response field"""
+        self._buffer += chunk
+        if self._pos is None:
+            self._pos = self._find_start()
+            if self._pos is None:
+                return ""
+
+        out = []
+        text = self._buffer
+        i = self._pos
+        while i < len(text) and not self.done:
+            c = text[i]
+            if c == '"':
+                self.done = True
+                i += 1
+            elif c == '\\':
+                # Wait for the rest of an escape that was split across chunks
+                if i + 1 >= len(text):
+                    break
+                if text[i + 1] == 'u':
+                    length = 6
+                    if i + 6 <= len(text) and 0xD800 <= int(text[i + 2:i + 6], 16) < 0xDC00:
+                        length = 12
+                    if i + length > len(text):
+                        break
+                    out.append(json.loads(f'"{text[i:i + length]}"'))
+                    i += length
+                else:
+                    out.append(self._ESCAPES.get(text[i + 1], text[i + 1]))
+                    i += 2
+            else:
+                out.append(c)
+                i += 1
+        self._pos = i
+        return "".join(out)
+
+
+class SentenceBuffer:
+    """Collects streamed text and hands back whole sentences for speech"""
+
+    _END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        """Return the sentences completed by text"""
+        parts = self._END.split(self._pending + text)
+        self._pending = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self):
+        rest, self._pending = self._pending.strip(), ""
+        return [rest] if rest else []
+
+
+class PipelineRequest:
+    """One user message travelling through the RequestPipeline"""
+
+    def __init__(self, request_id, text, pipeline):
+        self.id = request_id
+        self.text = text
+        self.cancelled = threading.Event()
+        self.finished = False
+        # The handler has been called; cancelling then relies on it checking cancelled
+        self.started = False
+        # Its assistant_response has gone out, so cancelling it would change nothing
+        self.answered = False
+        self.future = None
+        # Task names the reply ran ("response" for a model answer), for reporting
+        self.tasks = []
+        self._pipeline = pipeline
+        self._buffer = []
+
+    def post(self, message_type, message):
+        """Send a (type, message) pair to the UI once every earlier request has answered"""
+        self._pipeline._post(self, (message_type, message))
+
+
+class RequestPipeline:
+    """Runs user requests on one background asyncio loop
+
+    At most max_in_flight requests run at once. Messages from a request
+    are held back until every earlier request has finished, so replies
+    always arrive in the order the messages were sent. Cancelled
+    requests are dropped along with anything they post afterwards; a
+    request whose reply was already released is left alone.
+    """
+
+    def __init__(self, handler, output_queue, max_in_flight=2, supersede=False):
+        self.handler = handler
+        self.output_queue = output_queue
+        self.max_in_flight = max_in_flight
+        self.supersede = supersede
+        self._ids = itertools.count(1)
+        self._order = collections.deque()
+        self._lock = threading.Lock()
+        # Messages released in order but not yet handed to output_queue
+        self._released = collections.deque()
+        self._delivering = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight,
+                                                               thread_name_prefix="request")
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        threading.Thread(target=self._run_loop, daemon=True).start()
+        self._started.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._loop.call_soon(self._started.set)
+        self._loop.run_forever()
+
+    def submit(self, text, supersede=None):
+        """Queue a message from any thread and return its PipelineRequest"""
+        if self.supersede if supersede is None else supersede:
+            self.cancel_all()
+        with self._lock:
+            request = PipelineRequest(next(self._ids), text, self)
+            self._order.append(request)
+        request.future = asyncio.run_coroutine_threadsafe(self._process(request), self._loop)
+        return request
+
+    def pending(self):
+        """Return the number of requests that have not been released yet"""
+        with self._lock:
+            return len(self._order)
+
+    def cancel(self, request):
+        """Cancel a request unless it has answered; returns whether it was cancelled
+
+        A request that has not started is never run. A running handler is
+        told through request.cancelled and keeps its slot until it returns,
+        so the next request does not queue behind it unseen.
+        """
+        with self._lock:
+            if request.answered or request.finished:
+                return False
+            request.cancelled.set()
+        if request.future and not request.started:
+            request.future.cancel()
+        self._finish(request)
+        return True
+
+    def cancel_all(self):
+        with self._lock:
+            requests = list(self._order)
+        return sum(self.cancel(request) for request in requests)
+
+    async def _process(self, request):
+        try:
+            async with self._semaphore:
+                request.started = True
+                if not request.cancelled.is_set():
+                    await self._loop.run_in_executor(self._executor, self.handler, request)
+        finally:
+            self._finish(request)
+
+    def _post(self, request, message):
+        with self._lock:
+            if request.cancelled.is_set() or request.finished:
+                return
+            if self._order and self._order[0] is request:
+                self._release(request, [message])
+            else:
+                request._buffer.append(message)
+        self._deliver()
+
+    def _release(self, request, messages):
+        """Queue a request's messages for delivery; the caller holds _lock"""
+        self._released.extend(messages)
+        if any(message[0] == "assistant_response" for message in messages):
+            request.answered = True
+
+    def _finish(self, request):
+        with self._lock:
+            if request.finished:
+                return
+            request.finished = True
+            if request.cancelled.is_set():
+                request._buffer.clear()
+            # Release the next requests in submission order
+            while self._order and self._order[0].finished:
+                self._order.popleft()
+                if self._order:
+                    head = self._order[0]
+                    self._release(head, head._buffer)
+                    head._buffer = []
+        self._deliver()
+
+    def _deliver(self):
+        """Hand released messages to output_queue in order, outside _lock
+
+        Whoever holds _delivering drains for everyone; other threads
+        return at once instead of waiting behind a slow put().
+        """
+        while self._delivering.acquire(blocking=False):
+            try:
+                while True:
+                    with self._lock:
+                        if not self._released:
+                            break
+                        messages = list(self._released)
+                        self._released.clear()
+                    for message in messages:
+                        self.output_queue.put(message)
+            finally:
+                self._delivering.release()
+            # Messages released just before the lock was let go are picked up by another pass
+            with self._lock:
+                if not self._released:
+                    return
+
+
+class TaskRegistry:
+    """Task handlers by name, with metadata and per-task timing
+
+    Each handler is registered with the task_data fields it takes as
+    arguments, whether it blocks (non-blocking tasks may run inline), its
+    expected latency class ("instant", "local" or "network") and whether
+    its result is served from a cache and may be reused.
+    """
+
+    # Upper bounds of the latency histogram buckets, in ms
+    BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, slow_threshold=1.0, slow_log_size=50):
+        self.slow_threshold = slow_threshold
+        # Most recent (time, task, arguments, seconds) of tasks slower than slow_threshold
+        self.slow_log = collections.deque(maxlen=slow_log_size)
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, handler, args=(), blocking=True, latency="local", cacheable=False):
+        self._tasks[name] = {
+            "handler": handler, "args": args, "blocking": blocking, "latency": latency, "cacheable": cacheable,
+            "count": 0, "errors": 0, "total": 0.0,
+            "histogram": [0] * (len(self.BUCKETS_MS) + 1), "latencies": LatencyRecorder(),
+        }
+
+    def get(self, name):
+        """Return the metadata of a registered task, or None"""
+        return self._tasks.get(name)
+
+    def dispatch(self, name, task_data):
+        """Run the handler for task_data; raises KeyError for unknown tasks"""
+        task = self._tasks[name]
+        args = tuple(task_data.get(arg) for arg in task["args"])
+        start = time.perf_counter()
+        try:
+            return task["handler"](*args)
+        except Exception:
+            with self._lock:
+                task["errors"] += 1
+            raise
+        finally:
+            self._record(name, task, args, time.perf_counter() - start)
+
+    def _record(self, name, task, args, seconds):
+        with self._lock:
+            task["count"] += 1
+            task["total"] += seconds
+            task["histogram"][bisect.bisect_right(self.BUCKETS_MS, seconds * 1000)] += 1
+            task["latencies"].record(seconds)
+            if seconds >= self.slow_threshold:
+                self.slow_log.append((time.time(), name, args, seconds))
+
+    def stats(self):
+        """Per-task counts, errors, latency percentiles and histogram for tasks that have run"""
+        with self._lock:
+            stats = {}
+            for name, task in self._tasks.items():
+                if not task["count"]:
+                    continue
+                buckets = [f"<{ms}ms" for ms in self.BUCKETS_MS] + [f">={self.BUCKETS_MS[-1]}ms"]
+                stats[name] = {
+                    "count": task["count"],
+                    "errors": task["errors"],
+                    "total_ms": task["total"] * 1000,
+                    **task["latencies"].percentiles(),
+                    "histogram": dict(zip(buckets, task["histogram"])),
+                    "blocking": task["blocking"],
+                    "latency": task["latency"],
+                    "cacheable": task["cacheable"],
+                }
+            return stats
+
+    def summary(self, top=3):
+        """One line naming the tasks that took the most time in total"""
+        stats = sorted(self.stats().items(), key=lambda item: item[1]["total_ms"], reverse=True)[:top]
+        return ", ".join(f"{name} p95 {s['p95']:.0f} ms x{s['count']}" for name, s in stats)
+
+
+class ChatTranscript:
+    """Chat history rendered into a single tagged Text widget
+
+    Appending is an insert at the end of one widget, and only the last
+    max_messages messages are kept, so cost and memory stay flat no
+    matter how long the conversation runs.
+    """
+
+    def __init__(self, parent, max_messages=1000):
+        self.max_messages = max_messages
+        # (message id, sender) for every message still shown
+        self.messages = collections.deque()
+        self._ids = itertools.count()
+
+        self.text = tk.Text(parent, bg="#343541", fg="white", wrap=tk.WORD, relief=tk.FLAT,
+                            font=("Arial", 11), padx=10, pady=10, highlightthickness=0,
+                            cursor="arrow", state=tk.DISABLED)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=self.scrollbar.set)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.text.tag_configure("user_name", foreground="#10a37f", font=("Arial", 11, "bold"),
+                                background="#40414f", spacing1=10, lmargin1=10)
+        self.text.tag_configure("assistant_name", foreground="#5c64f4", font=("Arial", 11, "bold"),
+                                background="#444654", spacing1=10, lmargin1=10)
+        self.text.tag_configure("user", background="#40414f", lmargin1=10, lmargin2=10, rmargin=10, spacing3=10)
+        self.text.tag_configure("assistant", background="#444654", lmargin1=10, lmargin2=10, rmargin=10,
+                                spacing3=10)
+        self.text.tag_configure("gap", font=("Arial", 4))
+
+    def add(self, sender, message):
+        """Append a message and return its id"""
+        message_id = f"m{next(self._ids)}"
+        tag = "user" if sender == "user" else "assistant"
+        at_bottom = self.text.yview()[1] >= 0.999
+
+        self.text.configure(state=tk.NORMAL)
+        self.text.mark_set(f"{message_id}.start", "end-1c")
+        self.text.mark_gravity(f"{message_id}.start", tk.LEFT)
+        self.text.insert("end", "You\n" if sender == "user" else "Dennis\n", f"{tag}_name")
+        self.text.insert("end", message, tag)
+        self.text.insert("end", "\n", tag)
+        self.text.insert("end", "\n", "gap")
+        # Streamed text goes in at the end mark (just before the body's newline), which moves along with it
+        self.text.mark_set(f"{message_id}.end", "end-3c")
+        self.text.mark_gravity(f"{message_id}.end", tk.RIGHT)
+        self.messages.append((message_id, tag))
+        self._trim()
+        self.text.configure(state=tk.DISABLED)
+
+        # Follow new messages unless the user scrolled up to read
+        if at_bottom:
+            self.text.see("end")
+        return message_id
+
+    def append(self, message_id, text):
+        at_bottom = self.text.yview()[1] >= 0.999
+        tag = self._tag(message_id)
+        if tag is None:
+            return
+        self.text.configure(state=tk.NORMAL)
+        self.text.insert(f"{message_id}.end", text, tag)
+        self.text.configure(state=tk.DISABLED)
+        if at_bottom:
+            self.text.see("end")
+
+    def replace(self, message_id, text):
+        """Replace the body of a message, keeping its header"""
+        tag = self._tag(message_id)
+        if tag is None:
+            return
+        self.text.configure(state=tk.NORMAL)
+        body_start = f"{message_id}.start +1 lines linestart"
+        self.text.delete(body_start, f"{message_id}.end")
+        self.text.insert(f"{message_id}.end", text, tag)
+        self.text.configure(state=tk.DISABLED)
+
+    def _tag(self, message_id):
+        for shown_id, tag in reversed(self.messages):
+            if shown_id == message_id:
+                return tag
+        return None
+
+    def _trim(self):
+        while len(self.messages) > self.max_messages:
+            old_id, _ = self.messages.popleft()
+            next_id = self.messages[0][0]
+            self.text.delete("1.0", f"{next_id}.start")
+            self.text.mark_unset(f"{old_id}.start", f"{old_id}.end")
+
+
+class SpeechWorker:
+    """Speaks queued text on one long-lived thread that owns the TTS engine
+
+    Lower priority numbers are spoken first. interrupt() drops everything
+    queued and cuts off the current utterance (barge-in). Short phrases
+    that come up more than once are rendered to WAV once with
+    save_to_file and replayed from the disk cache afterwards.
+    """
+
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 1
+
+    def __init__(self, cache_dir=None, cache_max_chars=80, engine_factory=None, on_speech_start=None):
+        self.cache_dir = cache_dir or os.path.join(DATA_DIR, "tts_cache")
+        self.cache_max_chars = cache_max_chars
+        self.engine_factory = engine_factory or (lambda: pyttsx3.init())
+        self.on_speech_start = on_speech_start
+        self.latency = LatencyRecorder()
+        self.spoken = 0
+        self.cache_hits = 0
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._generation = 0
+        self._stop_current = threading.Event()
+        self._seen = collections.Counter()
+        self._engine = None
+        # The engine is created on warm_up() or the first speak(), not at startup
+        self._started = threading.Event()
+        self.ready = threading.Event()
+        threading.Thread(target=self._run, daemon=True, name="speech").start()
+
+    def warm_up(self):
+        """Create the TTS engine in the background ahead of the first reply"""
+        self._started.set()
+
+    def speak(self, text, priority=PRIORITY_NORMAL):
+        if text and text.strip():
+            self._queue.put((priority, next(self._seq), self._generation, text, time.perf_counter()))
+            self._started.set()
+
+    def interrupt(self):
+        """Stop the current utterance and drop everything queued"""
+        self._generation += 1
+        self._stop_current.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "spoken": self.spoken,
+            "cache_hits": self.cache_hits,
+            "start_latency_ms": self.latency.percentiles(),
+        }
+
+    def _run(self):
+        self._started.wait()
+        # pyttsx3 engines must be used from the thread that created them
+        self._engine = self.engine_factory()
+        self._engine.connect('started-word', self._on_word)
+        self.ready.set()
+        while True:
+            _, _, generation, text, enqueued_at = self._queue.get()
+            if generation != self._generation:
+                continue
+            self._stop_current.clear()
+            if generation != self._generation:
+                # Interrupted between get() and clear()
+                continue
+            self.latency.record(time.perf_counter() - enqueued_at)
+            self.spoken += 1
+            if self.on_speech_start:
+                self.on_speech_start(text)
+            try:
+                self._speak_now(text)
+            except Exception:
+                # A broken audio device must not kill the worker
+                pass
+
+    def _on_word(self, name, location, length):
+        if self._stop_current.is_set():
+            self._engine.stop()
+
+    def _speak_now(self, text):
+        path = os.path.join(self.cache_dir, hashlib.sha1(text.encode("utf-8")).hexdigest() + ".wav")
+        if os.path.exists(path) and self._play(path):
+            self.cache_hits += 1
+            return
+
+        self._seen[text] += 1
+        if len(text) <= self.cache_max_chars and self._seen[text] > 1:
+            # Repeated phrase: render it once, then play the file from now on
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp.wav"
+            self._engine.save_to_file(text, tmp_path)
+            self._engine.runAndWait()
+            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 0:
+                os.replace(tmp_path, path)
+                if self._play(path):
+                    return
+
+        self._engine.say(text)
+        self._engine.runAndWait()
+
+    def _play(self, path):
+        """Play a cached WAV file, stopping early on interrupt; False if no player is available"""
+        if os.name == "nt":
+            import winsound
+            with wave.open(path) as w:
+                duration = w.getnframes() / float(w.getframerate())
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            if self._stop_current.wait(duration):
+                winsound.PlaySound(None, 0)
+            return True
+
+        player = shutil.which("paplay") or shutil.which("aplay") or shutil.which("afplay")
+        if not player:
+            return False
+        process = subprocess.Popen([player, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        while process.poll() is None:
+            if self._stop_current.wait(0.05):
+                process.terminate()
+                break
+        return True
+
+
+class BufferedRecognition:
+    """Collects an utterance and transcribes it once it ends, for backends that cannot stream"""
+
+    def __init__(self, backend, sample_rate, sample_width):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._frames = []
+
+    def feed(self, frame):
+        """Add audio; returns partial text when there is new text, otherwise None"""
+        self._frames.append(frame)
+        return None
+
+    def audio(self):
+        return sr.AudioData(b"".join(self._frames), self.sample_rate, self.sample_width)
+
+    def finish(self):
+        """Return the final text, raising sr.UnknownValueError when nothing was understood"""
+        return self.backend.transcribe(self.audio())
+
+
+class RecognizerBackend:
+    """Turns speech into text; subclasses override transcribe() and, if they can, start_stream()"""
+
+    name = None
+
+    def transcribe(self, audio):
+        """Transcribe a whole sr.AudioData, raising sr.UnknownValueError when nothing was understood"""
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate, sample_width):
+        """Return a recognition to feed() while the user is still speaking"""
+        return BufferedRecognition(self, sample_rate, sample_width)
+
+
+class GoogleBackend(RecognizerBackend):
+    """The free Google Web Speech API; needs a network connection"""
+
+    name = "google"
+
+    def __init__(self, model=None):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio)
+
+
+class VoskRecognition:
+    """Feeds audio to a Vosk recognizer as it arrives, so the transcript is ready when speech ends"""
+
+    def __init__(self, backend, sample_rate):
+        self._recognizer = backend.vosk.KaldiRecognizer(backend.model, sample_rate)
+        # Text of the stretches Vosk has already finalised within this utterance
+        self._done = []
+        self._partial = ""
+
+    def feed(self, frame):
+        if self._recognizer.AcceptWaveform(frame):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._done.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        text = " ".join(self._done + [partial]).strip()
+        if text == self._partial:
+            return None
+        self._partial = text
+        return text
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        text = " ".join(self._done + [text]).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class VoskBackend(RecognizerBackend):
+    """Offline recognition with Vosk (pip install vosk)
+
+    model is a model directory; without one Vosk downloads its small English model.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model=None):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("Vosk is not installed, run: pip install vosk")
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(model) if model else vosk.Model(lang="en-us")
+
+    def transcribe(self, audio):
+        recognition = VoskRecognition(self, audio.sample_rate)
+        recognition.feed(audio.get_raw_data(convert_width=2))
+        return recognition.finish()
+
+    def start_stream(self, sample_rate, sample_width):
+        if sample_width != 2:
+            return BufferedRecognition(self, sample_rate, sample_width)
+        return VoskRecognition(self, sample_rate)
 
 
+class WhisperRecognition(BufferedRecognition):
+    """Re-transcribes the utterance so far at most every partial_interval seconds
+
+    Whisper cannot decode incrementally, so partials come from decoding the
+    growing buffer, the same way whisper.cpp's stream example works. The
+    interval is wall-clock time, so a slow decode skips partials rather than
+    falling behind the microphone.
+    """
+
+    def __init__(self, backend, sample_rate, sample_width, partial_interval):
+        super().__init__(backend, sample_rate, sample_width)
+        self.partial_interval = partial_interval
+        self._last_partial = time.perf_counter()
+
+    def feed(self, frame):
+        super().feed(frame)
+        if self.partial_interval is None or time.perf_counter() - self._last_partial < self.partial_interval:
+            return None
+        try:
+            text = self.backend.transcribe(self.audio())
+        except sr.UnknownValueError:
+            text = None
+        self._last_partial = time.perf_counter()
+        return text
+
+
+class WhisperCppBackend(RecognizerBackend):
+    """Offline recognition with whisper.cpp through pywhispercpp (pip install pywhispercpp)
+
+    model is a whisper.cpp model name such as "base.en" (downloaded on first
+    use) or a path to a ggml model file.
+    """
+
+    name = "whisper"
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model=None, threads=None, partial_interval=1.0):
+        try:
+            from pywhispercpp.model import Model
+        except ImportError:
+            raise RuntimeError("pywhispercpp is not installed, run: pip install pywhispercpp")
+        import numpy
+        self.numpy = numpy
+        self.partial_interval = partial_interval
+        self.model = Model(model or "base.en", n_threads=threads or min(4, os.cpu_count() or 1),
+                           print_progress=False, print_realtime=False)
+
+    def transcribe(self, audio):
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = self.numpy.frombuffer(raw, dtype=self.numpy.int16).astype(self.numpy.float32) / 32768
+        text = " ".join(segment.text.strip() for segment in self.model.transcribe(samples))
+        # Whisper marks silence and noise with bracketed tags such as [BLANK_AUDIO]
+        text = re.sub(r"\[[^\]]*\]|\([^)]*\)", "", text).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def start_stream(self, sample_rate, sample_width):
+        return WhisperRecognition(self, sample_rate, sample_width, self.partial_interval)
+
+
+RECOGNIZER_BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "whisper": WhisperCppBackend,
+}
+
+
+def make_recognizer_backend(name, model=None):
+    """Create the speech recognizer backend called name; raises ValueError for unknown names"""
+    try:
+        backend_class = RECOGNIZER_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown speech backend {name!r}, choose from {', '.join(RECOGNIZER_BACKENDS)}")
+    return backend_class(model)
+
+
+class MicrophoneSource:
+    """Keeps one microphone stream open and hands out raw audio chunks"""
+
+    def __init__(self):
+        self._microphone = sr.Microphone()
+        self._source = self._microphone.__enter__()
+        self.sample_rate = self._source.SAMPLE_RATE
+        self.sample_width = self._source.SAMPLE_WIDTH
+        self.chunk_frames = self._source.CHUNK
+
+    def read(self):
+        return self._source.stream.read(self.chunk_frames)
+
+    def close(self):
+        self._microphone.__exit__(None, None, None)
+
+
+class WavFileSource:
+    """Reads a mono WAV file in chunks like a microphone, for tests and benchmarks
+
+    With realtime=True reads are paced to the audio's duration.
+    """
+
+    def __init__(self, path, chunk_ms=30, realtime=False):
+        self._wav = wave.open(path, "rb")
+        if self._wav.getnchannels() != 1:
+            raise ValueError("Only mono WAV files are supported")
+        self.sample_rate = self._wav.getframerate()
+        self.sample_width = self._wav.getsampwidth()
+        self.chunk_frames = self.sample_rate * chunk_ms // 1000
+        self.realtime = realtime
+        self._started_at = None
+        self._frames_read = 0
+
+    def read(self):
+        """Return the next chunk, or b"" at the end of the file"""
+        if self.realtime:
+            if self._started_at is None:
+                self._started_at = time.perf_counter()
+            due = self._started_at + self._frames_read / self.sample_rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        data = self._wav.readframes(self.chunk_frames)
+        self._frames_read += self.chunk_frames
+        return data
+
+    def close(self):
+        self._wav.close()
+
+
+def frame_rms(frame, sample_width):
+    """Root mean square energy of a chunk of signed PCM audio"""
+    if audioop is not None:
+        return audioop.rms(frame, sample_width)
+    if sample_width != 2:
+        raise ValueError("Only 16-bit audio is supported without audioop")
+    samples = array('h', frame[:len(frame) - len(frame) % 2])
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(x * x for x in samples) / len(samples)))
+
+
+class EnergyVAD:
+    """Energy-based voice activity detector with a rolling noise floor
+
+    feed() takes fixed-size frames and returns the bytes of a finished
+    utterance, or None. The noise floor keeps adapting during silence,
+    so no calibration pause is needed before listening.
+    """
+
+    def __init__(self, frame_ms=30, threshold_ratio=3.0, min_threshold=300, start_frames=3,
+                 hangover_ms=600, preroll_ms=300, min_speech_ms=250, max_speech_ms=15000):
+        self.frame_ms = frame_ms
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = min_threshold
+        self.start_frames = start_frames
+        self.hangover_frames = hangover_ms // frame_ms
+        self.min_speech_frames = min_speech_ms // frame_ms
+        self.max_speech_frames = max_speech_ms // frame_ms
+        self.noise_floor = None
+        self.in_speech = False
+        self._preroll = collections.deque(maxlen=preroll_ms // frame_ms)
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._speech = []
+        # How many frames of the current utterance came from the pre-roll buffer
+        self._preroll_frames = 0
+
+    @property
+    def threshold(self):
+        return max(self.min_threshold, (self.noise_floor or 0) * self.threshold_ratio)
+
+    def reset(self):
+        """Forget any utterance in progress; the noise floor is kept"""
+        self.in_speech = False
+        self._preroll.clear()
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._speech = []
+        self._preroll_frames = 0
+
+    def current_speech(self):
+        """Frames of the utterance in progress, pre-roll included"""
+        return list(self._speech)
+
+    def feed(self, frame, rms):
+        voiced = rms > self.threshold
+        if not self.in_speech:
+            # Only silence updates the noise floor
+            if not voiced:
+                self.noise_floor = rms if self.noise_floor is None else 0.95 * self.noise_floor + 0.05 * rms
+            self._preroll.append(frame)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self.in_speech = True
+                self._speech = list(self._preroll)
+                self._preroll_frames = len(self._speech)
+                self._preroll.clear()
+                self._silent_run = 0
+            return None
+
+        self._speech.append(frame)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= self.hangover_frames or len(self._speech) >= self.max_speech_frames:
+            self.in_speech = False
+            self._voiced_run = 0
+            speech = self._speech[:len(self._speech) - self._silent_run] if self._silent_run else self._speech
+            self._speech = []
+            # The pre-roll is mostly silence kept for context, so it does not count toward the minimum
+            if len(speech) - self._preroll_frames >= self.min_speech_frames:
+                return b"".join(speech)
+        return None
+
+
+class ContinuousListener:
+    """Listens on one open audio stream and transcribes each utterance the VAD finds
+
+    Audio is streamed to the recognizer backend while the user speaks, on a
+    separate worker, so listening never waits for recognition. backend_factory
+    is called once, on first use, because offline models take a while to load.
+    """
+
+    def __init__(self, source_factory, backend_factory, on_text, on_partial=None, on_speech_start=None,
+                 on_error=None, on_stop=None, vad=None):
+        self.source_factory = source_factory
+        self.backend_factory = backend_factory
+        self.on_text = on_text
+        self.on_partial = on_partial
+        self.on_speech_start = on_speech_start
+        self.on_error = on_error
+        # Called when listening ends by itself, e.g. the microphone failed or the file ran out
+        self.on_stop = on_stop
+        self.vad = vad or EnergyVAD()
+        self.segments = 0
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        # Segment end to transcript ready, per utterance
+        self.recognition_latency = LatencyRecorder()
+        self._running = threading.Event()
+        self._thread = None
+        self._recognizer_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                      thread_name_prefix="recognize")
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def get_backend(self):
+        """Return the recognizer backend, creating it on first use"""
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = self.backend_factory()
+            return self._backend
+
+    def start(self):
+        if self._running.is_set():
+            return
+        # Each run gets its own flag, so a run that is still winding down cannot be revived
+        self._running = threading.Event()
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, args=(self._running,), daemon=True, name="listener")
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+
+    def wait(self):
+        """Block until the source is exhausted and every segment is transcribed"""
+        if self._thread:
+            self._thread.join()
+        self._recognizer_pool.submit(lambda: None).result()
+
+    def _run(self, running):
+        try:
+            backend = self.get_backend()
+            source = self.source_factory()
+        except Exception as e:
+            running.clear()
+            if self.on_error:
+                self.on_error(f"Could not open audio input: {e}")
+            if self.on_stop:
+                self.on_stop()
+            return
+        try:
+            frame_bytes = source.sample_rate * self.vad.frame_ms // 1000 * source.sample_width
+            pending = b""
+            recognition = None
+            self.vad.reset()
+            while running.is_set():
+                chunk = source.read()
+                if not chunk:
+                    break
+                pending += chunk
+                while len(pending) >= frame_bytes:
+                    frame, pending = pending[:frame_bytes], pending[frame_bytes:]
+                    was_speaking = self.vad.in_speech
+                    segment = self.vad.feed(frame, frame_rms(frame, source.sample_width))
+                    if self.vad.in_speech and not was_speaking:
+                        if self.on_speech_start:
+                            self.on_speech_start()
+                        recognition = backend.start_stream(source.sample_rate, source.sample_width)
+                        for speech_frame in self.vad.current_speech():
+                            self._recognizer_pool.submit(self._feed, recognition, speech_frame)
+                    elif was_speaking:
+                        self._recognizer_pool.submit(self._feed, recognition, frame)
+                        if not self.vad.in_speech:
+                            # Too-short blips are dropped without a transcript
+                            if segment:
+                                self.segments += 1
+                                self._recognizer_pool.submit(self._finish, recognition, time.perf_counter())
+                            recognition = None
+        finally:
+            source.close()
+            if running.is_set():
+                running.clear()
+                if self.on_stop:
+                    self.on_stop()
+
+    def _feed(self, recognition, frame):
+        try:
+            partial = recognition.feed(frame)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(f"Error with speech recognition service; {e}")
+            return
+        if partial and self.on_partial:
+            self.on_partial(partial)
+
+    def _finish(self, recognition, segment_end):
+        try:
+            text = recognition.finish()
+        except sr.UnknownValueError:
+            return
+        except Exception as e:
+            if self.on_error:
+                self.on_error(f"Error with speech recognition service; {e}")
+            return
+        self.recognition_latency.record(time.perf_counter() - segment_end)
+        if text:
+            self.on_text(text)
+
 
 class DennisAssistantUI:
-    def __init__(self, root):
+    # Fallback polling interval bounds; worker messages normally wake the loop directly
+    MIN_POLL_MS = 50
+    MAX_POLL_MS = 1000
+    # How often the wake-up flag is checked where Tk cannot watch a socket (Windows):
+    # quickly while a reply or speech is expected, slowing down to the maximum when idle
+    WAKE_POLL_MS = 15
+    MAX_WAKE_POLL_MS = 250
+    # Messages applied per pass, so input and redraws get a turn during a flood
+    MAX_BATCH = 500
+
+    def __init__(self, root, assistant=None, warm_up=True):
         self.root = root
         self.root.title("Dennis Assistant")
         self.root.geometry("800x600")
@@ -29,22 +3209,83 @@ class DennisAssistantUI:
             pass
         
         # Create the message queue for thread-safe communication
-        self.message_queue = queue.Queue()
+        self.message_queue = assistant.message_queue if assistant else UIMessageQueue()
         self.processing = False
+        self.poll_interval = self.MIN_POLL_MS
+
+        # Enqueue-to-render latency; replace the hook to send samples elsewhere
+        self.render_latency = LatencyRecorder()
+        self.on_message_rendered = lambda message_type, latency: self.render_latency.record(latency)
+
+        # Streaming state: the bubble receiving deltas and whether its sentences are spoken
+        self.live_message = None
+        self.live_text = ""
+        self.sentence_buffer = SentenceBuffer()
+        self.speak_live = False
+        self.turn_started_at = None
+        self.first_token_at = None
+        self.first_audio_at = None
+        self.turn_model_calls = 0
         
-        # Initialize text-to-speech engine
-        self.tts_engine = pyttsx3.init()
+        # Text-to-speech runs on one worker thread that owns the engine
+        self.speech = SpeechWorker(on_speech_start=self.on_speech_start)
         self.speech_enabled = True
         
-        # Initialize the speech recognizer
-        self.recognizer = sr.Recognizer()
         self.is_listening = False
         
         # Create Dennis Assistant backend
-        self.assistant = DennisAssistant(self.message_queue)
+        self.assistant = assistant or DennisAssistant(self.message_queue)
+
+        self.listener = ContinuousListener(
+            MicrophoneSource,
+            self.create_recognizer_backend,
+            on_text=lambda text: self.message_queue.put(("input_fill", (text, True))),
+            on_partial=lambda text: self.message_queue.put(("input_fill", (text, False))),
+            on_speech_start=self.on_voice_start,
+            on_error=lambda error: self.message_queue.put(("status", error)),
+            on_stop=lambda: self.message_queue.put(("mic_state", False)),
+        )
+
+        # Messages are processed on the pipeline's event loop, replies come back in order
+        self.pipeline = RequestPipeline(self.process_message, self.message_queue,
+                                        max_in_flight=self.assistant.config.get("max_in_flight", 2),
+                                        supersede=self.assistant.config.get("supersede_requests", False))
         
         self.setup_ui()
+        # Workers wake the Tk loop through a socket it watches. A Tk call from a
+        # worker thread would block until the main loop ran it, and could deadlock.
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._wake_pending = False
+        try:
+            self.root.tk.createfilehandler(self._wake_reader, tk.READABLE, self.on_wake)
+            self.wake_by_socket = True
+        except (AttributeError, tk.TclError):
+            # No file handlers on Windows; a short timer picks up the flag instead
+            self.wake_by_socket = False
+            self.wake_poll_interval = self.WAKE_POLL_MS
+            self.root.after(self.wake_poll_interval, self.check_wake_flag)
+        self.message_queue.notify = self.notify_message
         self.check_message_queue()
+
+        # Heavy subsystems load once the window is on screen
+        self.warmed_up = not warm_up
+        self.root.bind("<Map>", self.on_map, add="+")
+
+    def on_map(self, event):
+        if event.widget is self.root and not self.warmed_up:
+            self.warmed_up = True
+            # Idle callbacks run after the first frame has been drawn
+            self.root.after_idle(self.warm_up)
+
+    def warm_up(self):
+        """Start loading TTS, speech recognition, the model client and HTTP in the background"""
+        self.assistant.warm_up()
+        self.speech.warm_up()
+        if self.assistant.config.get("speech_backend", "google") != "google":
+            # Load the offline model now rather than on the first mic press
+            threading.Thread(target=self.listener.get_backend, daemon=True).start()
     
     def setup_ui(self):
         # Create main frame
@@ -55,22 +3296,8 @@ class DennisAssistantUI:
         self.chat_frame = tk.Frame(main_frame, bg="#343541")
         self.chat_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Create a canvas with a frame inside it for the messages
-        self.canvas = tk.Canvas(self.chat_frame, bg="#343541", highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(self.chat_frame, orient="vertical", command=self.canvas.yview)
-        self.messages_frame = tk.Frame(self.canvas, bg="#343541")
-        
-        # Configure the canvas
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Create a window in the canvas for the messages frame
-        self.canvas_frame = self.canvas.create_window((0, 0), window=self.messages_frame, anchor="nw")
-        
-        # Configure the messages frame to expand to the width of the canvas
-        self.messages_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
+        # All messages live in one Text widget, so each one costs a few tagged lines
+        self.transcript = ChatTranscript(self.chat_frame)
         
         # Add a welcome message
         self.add_message("assistant", "Hi, I'm Dennis! How can I help you today?")
@@ -85,6 +3312,7 @@ class DennisAssistantUI:
         self.user_input.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 5), pady=10)
         self.user_input.bind("<Return>", self.on_enter_pressed)
         self.user_input.bind("<Shift-Return>", lambda e: None)  # Allow Shift+Enter for new line
+        self.root.bind("<Escape>", self.cancel_requests)
         self.user_input.focus_set()
         
         # Buttons frame
@@ -115,6 +3343,8 @@ class DennisAssistantUI:
         self.status_var = tk.StringVar(value="Ready")
         self.status_bar = tk.Label(self.root, textvariable=self.status_var, bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        # Shown inside the status bar while a long task reports progress
+        self.progress_bar = ttk.Progressbar(self.status_bar, length=150)
         
         # Configure the style
         self.style = ttk.Style()
@@ -122,42 +3352,13 @@ class DennisAssistantUI:
         self.style.configure("TScrollbar", background="#40414f", troughcolor="#343541", 
                        arrowcolor="white", bordercolor="#40414f")
     
-    def on_canvas_configure(self, event):
-        # Update the width of the frame inside the canvas when the canvas is resized
-        self.canvas.itemconfig(self.canvas_frame, width=event.width)
-    
     def add_message(self, sender, message):
-        # Create frame for the message
-        message_frame = tk.Frame(self.messages_frame, bg="#343541")
-        message_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
-        
-        # Set the background and text colors based on sender
-        if sender == "user":
-            bg_color, fg_color = "#40414f", "white"
-            avatar_text = "You"
-        else:
-            bg_color, fg_color = "#444654", "white"
-            avatar_text = "Dennis"
-        
-        # Create avatar label
-        avatar_frame = tk.Frame(message_frame, bg=bg_color, width=50)
-        avatar_frame.pack(side=tk.LEFT, fill=tk.Y)
-        
-        avatar_label = tk.Label(avatar_frame, text=avatar_text[0], bg="#5c64f4" if sender == "assistant" else "#10a37f",
-                                fg="white", width=2, height=1, font=("Arial", 12, "bold"))
-        avatar_label.pack(pady=10)
-        
-        # Create message text
-        msg_frame = tk.Frame(message_frame, bg=bg_color, padx=10, pady=10)
-        msg_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        msg_label = tk.Label(msg_frame, text=message, justify=tk.LEFT, bg=bg_color, fg=fg_color,
-                            font=("Arial", 11), wraplength=600)
-        msg_label.pack(anchor=tk.W)
-        
-        # Auto-scroll to the bottom of the canvas
-        self.canvas.update_idletasks()
-        self.canvas.yview_moveto(1.0)
+        """Show a message and return its id for streaming updates"""
+        return self.transcript.add(sender, message)
+
+    def append_to_message(self, message_id, text):
+        """Append streamed text to a message that is already shown"""
+        self.transcript.append(message_id, text)
     
     def send_message(self):
         """Send the message from the input field"""
@@ -169,85 +3370,283 @@ class DennisAssistantUI:
             # Show thinking status
             self.status_var.set("Dennis is thinking...")
             self.processing = True
+            self.start_turn_metrics()
+
+            # Barge-in: a new message stops whatever Dennis is still saying
+            self.speech.interrupt()
             
-            # Process the message in a separate thread
-            threading.Thread(target=self.process_message, args=(user_message,), daemon=True).start()
+            # Process the message on the request pipeline
+            self.pipeline.submit(user_message)
     
-    def process_message(self, message):
-        """Process the user message in a background thread"""
-        self.assistant.process_user_input(message)
+    def process_message(self, request):
+        """Process the user message on a pipeline worker thread"""
+        self.assistant.process_user_input(request.text, request)
+
+    def cancel_requests(self, event=None):
+        """Cancel every request that has not answered yet"""
+        if self.pipeline.cancel_all():
+            self.processing = False
+            self.live_message = None
+            self.speech.interrupt()
+            self.status_var.set("Cancelled")
     
-    def check_message_queue(self):
-        """Check for messages from the assistant thread"""
+    def check_message_queue(self, event=None):
+        """Apply every pending message from the worker threads in one batch
+
+        Runs when a worker posts (see notify_message) and on a fallback
+        timer that backs off while the queue stays idle.
+        """
+        self.message_queue.drained()
+        batch = []
         try:
-            while True:
-                message_type, message = self.message_queue.get_nowait()
-                
-                if message_type == "assistant_response":
-                    self.add_message("assistant", message)
-                    self.processing = False
-                    self.status_var.set("Ready")
-                    
-                    # Speak the response if speech is enabled
-                    if self.speech_enabled:
-                        threading.Thread(target=self.speak_response, args=(message,), daemon=True).start()
-                
-                elif message_type == "status":
-                    self.status_var.set(message)
-                
+            while len(batch) < self.MAX_BATCH:
+                message = self.message_queue.get_nowait()
+                batch.append((message, self.message_queue.last_enqueued_at))
                 self.message_queue.task_done()
         except queue.Empty:
             pass
-        finally:
-            # Schedule the next check
-            self.root.after(100, self.check_message_queue)
+        else:
+            # More is waiting; come back once pending input and redraws have run
+            self.notify_message()
+
+        for (message_type, message), enqueued_at in self.coalesce_messages(batch):
+            self.handle_message(message_type, message)
+            if self.on_message_rendered:
+                self.on_message_rendered(message_type, time.perf_counter() - enqueued_at)
+
+        if event is None:
+            # Fallback poll, in case a wake-up event could not be delivered
+            self.poll_interval = self.MIN_POLL_MS if batch else min(self.poll_interval * 2, self.MAX_POLL_MS)
+            self.root.after(self.poll_interval, self.check_message_queue)
+
+    @staticmethod
+    def coalesce_messages(batch):
+        """Merge consecutive deltas into one append; of consecutive state updates keep the last
+
+        An input_fill that sends the message is never dropped.
+        """
+        merged = []
+        for (message_type, message), enqueued_at in batch:
+            previous = merged[-1][0] if merged else None
+            mergeable = previous is not None and previous[0] == message_type and (
+                message_type in ("assistant_delta", "status", "mic_state", "progress")
+                or message_type == "input_fill" and not previous[1][1])
+            if mergeable:
+                previous, first_enqueued_at = merged[-1]
+                text = previous[1] + message if message_type == "assistant_delta" else message
+                merged[-1] = ((message_type, text), first_enqueued_at)
+            else:
+                merged.append(((message_type, message), enqueued_at))
+        return merged
+
+    def handle_message(self, message_type, message):
+        """Apply one message from the worker threads to the UI"""
+        if message_type == "assistant_response":
+            if self.live_message is not None:
+                # The streamed text is replaced by the complete reply
+                self.transcript.replace(self.live_message, message)
+                self.live_message = None
+                if self.speak_live:
+                    for sentence in self.sentence_buffer.flush():
+                        self.speak_response(sentence)
+                    # Speak whatever the final reply adds to what was streamed
+                    if message.startswith(self.live_text) and message[len(self.live_text):].strip():
+                        self.speak_response(message[len(self.live_text):].strip())
+            else:
+                self.add_message("assistant", message)
+
+                # Speak the response if speech is enabled
+                if self.speech_enabled:
+                    self.speak_response(message)
+            self.processing = False
+            status = self.turn_metrics_text("Ready")
+            if self.assistant.config.get("show_task_stats"):
+                summary = self.assistant.tasks.summary()
+                if summary:
+                    status = f"{status} | slowest tasks: {summary}"
+            self.status_var.set(status)
+
+        elif message_type == "assistant_delta":
+            if self.live_message is None:
+                self.live_message = self.add_message("assistant", message)
+                self.first_token_at = time.perf_counter()
+                self.status_var.set(self.turn_metrics_text("Dennis is responding..."))
+                self.sentence_buffer = SentenceBuffer()
+                self.speak_live = self.speech_enabled
+                self.live_text = message
+            else:
+                self.append_to_message(self.live_message, message)
+                self.live_text += message
+            if self.speak_live:
+                for sentence in self.sentence_buffer.feed(message):
+                    self.speak_response(sentence)
+
+        elif message_type == "status":
+            self.status_var.set(message)
+
+        elif message_type == "input_fill":
+            # Recognized speech: partial words so far, or a finished utterance to send
+            text, send = message
+            self.user_input.delete("1.0", tk.END)
+            self.user_input.insert(tk.END, text)
+            if send:
+                self.send_message()
+
+        elif message_type == "mic_state":
+            self.set_mic_state(message)
+
+        elif message_type == "progress":
+            self.set_progress(message)
+
+    def set_mic_state(self, listening):
+        """Show whether the microphone is listening"""
+        self.is_listening = listening
+        if listening:
+            self.mic_button.config(bg="#ff4c4c", activebackground="#ff6b6b")
+        else:
+            self.mic_button.config(bg="#40414f", activebackground="#565869")
+
+    def set_progress(self, progress):
+        """Show (label, fraction) in the status bar; a None fraction means busy, None hides it"""
+        if progress is None:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+            return
+        label, fraction = progress
+        self.status_var.set(label)
+        if fraction is None:
+            if str(self.progress_bar.cget("mode")) != "indeterminate":
+                self.progress_bar.config(mode="indeterminate")
+                self.progress_bar.start(20)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=fraction * 100)
+        if not self.progress_bar.winfo_ismapped():
+            self.progress_bar.pack(side=tk.RIGHT, padx=5)
+
+    def notify_message(self):
+        """Wake the Tk loop; safe from any thread and never blocks"""
+        self._wake_pending = True
+        if self.wake_by_socket:
+            try:
+                self._wake_writer.send(b"\0")
+            except OSError:
+                # Buffer full means a wake-up is already pending; closed means shutting down
+                pass
+
+    def on_wake(self, *args):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        self._wake_pending = False
+        self.check_message_queue(event="wake")
+
+    def check_wake_flag(self):
+        if self._wake_pending:
+            self._wake_pending = False
+            self.check_message_queue(event="wake")
+            self.wake_poll_interval = self.WAKE_POLL_MS
+        elif self.processing or self.is_listening:
+            self.wake_poll_interval = self.WAKE_POLL_MS
+        else:
+            self.wake_poll_interval = min(self.wake_poll_interval * 2, self.MAX_WAKE_POLL_MS)
+        self.root.after(self.wake_poll_interval, self.check_wake_flag)
     
     def toggle_speech(self):
         """Toggle speech output"""
         self.speech_enabled = not self.speech_enabled
         self.speech_toggle.config(text="🔊" if self.speech_enabled else "🔇")
+        if not self.speech_enabled:
+            self.speak_live = False
+            self.speech.interrupt()
     
     def speak_response(self, text):
-        """Speak the response using TTS"""
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+        """Queue text on the speech worker"""
+        self.speech.speak(text)
+
+    def on_speech_start(self, text):
+        """Called on the speech thread when an utterance starts playing"""
+        if self.first_audio_at is None and self.turn_started_at is not None:
+            self.first_audio_at = time.perf_counter()
+            status = "Dennis is responding..." if self.processing else "Ready"
+            self.message_queue.put(("status", self.turn_metrics_text(status)))
+
+    def start_turn_metrics(self):
+        self.turn_started_at = time.perf_counter()
+        self.first_token_at = None
+        self.first_audio_at = None
+        self.turn_model_calls = self.assistant.model_session.calls
+
+    def turn_metrics_text(self, status):
+        """Add time-to-first-token and time-to-first-audio of the current turn to a status"""
+        if self.turn_started_at is None:
+            return status
+        parts = []
+        if self.first_token_at is not None:
+            parts.append(f"first token {self.first_token_at - self.turn_started_at:.2f}s")
+        if self.first_audio_at is not None:
+            parts.append(f"first audio {self.first_audio_at - self.turn_started_at:.2f}s")
+        session = self.assistant.model_session
+        if session.calls > self.turn_model_calls and session.usage:
+            usage = session.usage[-1]
+            parts.append(f"{usage['prompt'] - usage['cached']} tokens sent")
+        return f"{status} ({', '.join(parts)})" if parts else status
     
     def toggle_speech_input(self):
         """Toggle speech recognition for input"""
         if self.is_listening:
-            self.is_listening = False
-            self.mic_button.config(bg="#40414f", activebackground="#565869")
+            self.listener.stop()
+            self.set_mic_state(False)
             self.status_var.set("Speech input stopped")
         else:
-            self.is_listening = True
-            self.mic_button.config(bg="#ff4c4c", activebackground="#ff6b6b")
+            self.speech.interrupt()
+            self.set_mic_state(True)
             self.status_var.set("Listening...")
-            threading.Thread(target=self.listen_for_speech, daemon=True).start()
+            if self.assistant.config.get("continuous_listening"):
+                self.listener.start()
+            else:
+                threading.Thread(target=self.listen_for_speech, daemon=True).start()
+
+    def create_recognizer_backend(self):
+        """Create the configured speech backend, falling back to Google if it cannot load"""
+        name = self.assistant.config.get("speech_backend", "google")
+        try:
+            return make_recognizer_backend(name, self.assistant.config.get("speech_model"))
+        except Exception as e:
+            self.message_queue.put(("status", f"Could not load the {name} speech recognizer ({e}), using Google"))
+            return GoogleBackend()
+
+    def on_voice_start(self):
+        """Called on the listener thread when the user starts talking"""
+        # Barge-in: stop speaking as soon as the user does
+        self.speech.interrupt()
+        self.message_queue.put(("status", "Listening..."))
     
     def listen_for_speech(self):
-        """Listen for speech input"""
+        """Listen for one phrase on a worker thread; the UI is only updated through the message queue"""
+        post = self.message_queue.put
+        recognizer = sr.Recognizer()
         with sr.Microphone() as source:
             try:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = self.recognizer.listen(source, timeout=5)
-                self.status_var.set("Processing speech...")
+                recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                audio = recognizer.listen(source, timeout=5)
+                post(("status", "Processing speech..."))
                 
-                text = self.recognizer.recognize_google(audio)
-                self.user_input.delete("1.0", tk.END)
-                self.user_input.insert(tk.END, text)
+                text = self.listener.get_backend().transcribe(audio)
                 
                 # Automatically send the recognized speech
-                self.root.after(100, self.send_message)
+                post(("input_fill", (text, True)))
                 
             except sr.WaitTimeoutError:
-                self.status_var.set("No speech detected")
+                post(("status", "No speech detected"))
             except sr.UnknownValueError:
-                self.status_var.set("Could not understand audio")
+                post(("status", "Could not understand audio"))
             except sr.RequestError as e:
-                self.status_var.set(f"Error with speech recognition service; {e}")
+                post(("status", f"Error with speech recognition service; {e}"))
             finally:
-                self.is_listening = False
-                self.mic_button.config(bg="#40414f", activebackground="#565869")
+                post(("mic_state", False))
     
     def on_enter_pressed(self, event):
         """Handle Enter key press"""
@@ -257,210 +3656,456 @@ class DennisAssistantUI:
 
 
 class DennisAssistant:
-    def __init__(self, message_queue):
+    def __init__(self, message_queue, file_index=None, config=None, location=None, data_dir=None):
         self.message_queue = message_queue
+        # Caches, indexes and config.json live here; tests point it at a temporary directory
+        self.data_dir = data_dir or DATA_DIR
+        self.config = config or load_config(os.path.join(self.data_dir, "config.json"))
+        # The PipelineRequest the current worker thread is handling, if any
+        self._local = threading.local()
+
+        # One model client for the whole session, connected by warm_up()
+        self.model_session = ModelSession.from_config(self.config)
+
+        # Filename index used by get_path, open_file and open_folder
+        self.file_index = file_index or FileIndex(os.path.join(self.data_dir, "file_index.db"))
+        if self.file_index.is_stale():
+            self.file_index.start_background_build()
+
+        # Deterministic commands are answered without the model
+        self.intent_router = IntentRouter(
+            is_known_app=lambda name: self.app_catalog.ready.is_set() and self.app_catalog.resolve(name) is not None)
+
+        # Repeated utterances skip the model round-trip
+        self.response_cache = ResponseCache(os.path.join(self.data_dir, "response_cache.json"))
+
+        # Recent turns, so follow-ups can refer back to them
+        self.conversation = ConversationMemory(self.config.get("history_tokens", 1500))
+
+        # Task handlers by name, with per-task timing
+        self.tasks = self.register_tasks()
+
+        # Workers for the tasks of compound commands
+        self.task_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config.get("max_parallel_tasks", 4), thread_name_prefix="task")
+
+        # Weather lookups share one connection pool and cache
+        self.weather = WeatherProvider.from_config(self.config)
+
+        # Looked up by warm_up() so "what's the weather" needs no extra round-trip
+        self.location = location or LocationService.from_config(
+            self.config, os.path.join(self.data_dir, "location.json"))
+
+        # Text of documents read aloud, cached so a second reading starts at once
+        self.documents = DocumentReader(os.path.join(self.data_dir, "documents"),
+                                        self.config.get("document_cache_mb", 200) * 1024 * 1024)
+
+        # Words inside the indexed documents, for find_content; kept next to the file index
+        self.content_index = ContentIndex(
+            os.path.join(os.path.dirname(self.file_index.db_path), "content_index.db"), self.file_index,
+            max_bytes=self.config.get("content_max_mb", 20) * 1024 * 1024,
+            workers=self.config.get("content_workers"))
+
+        # Disk search used until the index is available
+        self.live_search = ParallelSearch()
+
+        # Fuzzy name search shared by the file, folder and app lookups
+        self.fuzzy_indexes = {'file': FuzzyIndex(strip_extension=True), 'dir': FuzzyIndex()}
+        self.fuzzy_ready = threading.Event()
+        self._fuzzy_apps = None
+        self.file_index.listeners.append(self._on_index_changes)
+        threading.Thread(target=self._build_fuzzy_indexes, daemon=True).start()
+
+        # Apply filesystem changes to the index as they happen
+        self.index_watcher = IndexWatcher(self.file_index)
+        self.index_watcher.start()
+
+        # Catalog of installed applications used by open_application
+        self.app_catalog = AppCatalog(os.path.join(self.data_dir, "app_catalog.json"))
+        if self.app_catalog.is_stale():
+            self.app_catalog.start_background_build()
+
+    def close(self):
+        """Stop the background workers this assistant started and write pending cache changes"""
+        self.index_watcher.stop()
+        self.task_pool.shutdown(wait=False, cancel_futures=True)
+        self.response_cache.flush()
+
+    def warm_up(self):
+        """Import the heavy modules and open connections in the background
+
+        The UI calls this once its window is on screen. Anything used
+        before warm-up gets to it is loaded on the spot.
+        """
+        def run():
+            requests.load()
+            self.location.prefetch()
+            for module in LAZY_MODULES.values():
+                try:
+                    module.load()
+                except ImportError:
+                    # Optional at this point; the feature reports it when used
+                    pass
+            if self.config.get("warm_up"):
+                self.model_session.warm_up()
+            if self.config.get("content_index", True):
+                # Catch up with documents changed while the assistant was not running
+                self.content_index.start_background_update()
+
+        threading.Thread(target=run, daemon=True, name="warm-up").start()
+
+    def post(self, message_type, message):
+        """Send a message to the UI, through the current pipeline request when there is one"""
+        request = getattr(self._local, "request", None)
+        if request is not None:
+            request.post(message_type, message)
+        else:
+            self.message_queue.put((message_type, message))
+
+    def cancelled(self):
+        """Check whether the request being handled on this thread was cancelled"""
+        request = getattr(self._local, "request", None)
+        return request is not None and request.cancelled.is_set()
+
+    def process_user_input(self, user_input, request=None):
+        self._local.request = request
+        try:
+            self._process_user_input(user_input)
+        finally:
+            self._local.request = None
 
-    def process_user_input(self, user_input):
+    def _process_user_input(self, user_input):
         # Get response from Gemini API
-        response = self.generate_response(user_input)
+        try:
+            response = self.generate_response(
+                user_input, on_delta=lambda delta: self.post("assistant_delta", delta))
+        except Exception as e:
+            self.post("assistant_response", f"I couldn't reach the language model: {str(e)}")
+            return
+        if self.cancelled():
+            return
         
         try:
             response_data = json.loads(response)
+            request = getattr(self._local, "request", None)
+            if request is not None:
+                request.tasks = self.reply_tasks(response_data)
             
             if "response" in response_data:
                 # Model-handled task - just display the response
-                self.message_queue.put(("assistant_response", response_data["response"]))
+                self.post("assistant_response", response_data["response"])
+            elif "tasks" in response_data:
+                # Several commands in one utterance; one reply for all of them
+                self.post("assistant_response", self.run_tasks(response_data["tasks"]))
             else:
                 # Developer-handled task - process it
                 result = self.handle_developer_task(response_data)
-                self.message_queue.put(("assistant_response", result))
+                self.post("assistant_response", result)
         except json.JSONDecodeError:
-            self.message_queue.put(("assistant_response", "I couldn't process that request. Please try again."))
+            self.post("assistant_response", "I couldn't process that request. Please try again.")
+        except Exception as e:
+            # A reply that breaks must not be replayed from the cache, and the user still gets an answer
+            self.response_cache.discard(user_input)
+            self.post("assistant_response", f"Sorry, I encountered an error while processing your request: {e}")
 
-    def generate_response(self, user_input):
-        client = genai.Client(
-            api_key=("Your-Api-Key"),
-        )
+    @staticmethod
+    def reply_tasks(response_data):
+        """Names of the tasks a model reply asks for, "response" for a plain answer"""
+        if not isinstance(response_data, dict) or "response" in response_data:
+            return ["response"]
+        if "tasks" in response_data:
+            return [task.get("task", "response") for task in response_data["tasks"] if isinstance(task, dict)]
+        return [response_data.get("task")]
 
-        model = "gemini-2.5-flash-preview-04-17"
-        
-        system_instruction = """
-      You are a Desktop Virtual Assistant named "Dennis". Your responsibilities include understanding user commands and responding in a natural, helpful manner. You operate in two modes:
+    def generate_response(self, user_input, on_delta=None):
+        """Return the model's JSON reply, served locally or from the response cache when possible
 
-Model-Handled Tasks (within your control):  
-You can directly respond to the following tasks:  
-- Thinking, reasoning, and simple conversation  
-- Web searches  
-- General queries that don’t require real-time system access or dynamic data  
+        When streaming is enabled, on_delta receives the "response" text
+        piece by piece while the model is still generating.
+        """
+        intent = self.intent_router.route(user_input)
+        if intent:
+            response = json.dumps(intent)
+            self.conversation.add(user_input, response)
+            return response
 
-For these, respond naturally and conversationally without referencing internal logic, code structures, or developer concepts.  
-If user ask to open anything on this system, you will respond with the following message:
-```json
-{
-  "response": "Please tell me which file,folder or app you want me to open."
-}
-```
-Developer-Handled Tasks (outside your control):  
-You cannot perform system-level tasks or provide real-time data (like current date/time/weather). Instead, your role is to:  
-- Extract the user’s intent  
-- Identify the operation type (e.g., creation, deletion, opening)  
-- Parse the name of the file, folder, application, or media  
-- Determine the location/path if mentioned  
-- Return a structured JSON-style object to guide backend implementation  
-For model handled tasks, respond naturally. For developer-handled tasks, provide a JSON object with the following structure:
-```json
-{
-  "response": "<natural_response>"
-}
-```
-For developer-handled tasks, return a JSON object with the following structure:
-Tasks in this category include:  
-- open_app / 
-- create_file / open_file / read_file  
-- create_folder / open_folder /
-- current_date / current_day / current_year / current_time  
-- read_pdf / read_docx  
-- play_music  
-- get_weather / get_location / get_path / open_url  
-For opening apps if user give wrong name you will assign the name that is in its .exe file inorder to run the app but donot add the extension in the json obj key "name": by analyzing on your own.
-For url decide the domain type (e.g., .com, .org, etc.) on your own.
-For files, decide the file type (e.g., .txt, .pdf, etc.) on your own.
-For developer-handled tasks, return a JSON object with the following structure:
-JSON Output Format (only for developer-handled tasks):  
-```json
-{
-  "task": "<task_name>",
-  "operation": "<operation_type>",
-  "name": "<entity_name>",
-  "location": "<location_path>",
-  "filetype": "<file_extension>"
-}
+        # "open it" means something different after every turn, so it is never cached
+        cacheable = not self.conversation.is_context_dependent(user_input)
+        cached = self.response_cache.get(user_input) if cacheable else None
+        if cached is not None:
+            self.conversation.add(user_input, cached)
+            return cached
+        history = self.conversation.history()
+        if on_delta and self.config.get("stream_responses"):
+            response = self.stream_model(user_input, on_delta, history)
+        else:
+            response = self.request_model(user_input, history)
+        if self.cancelled():
+            return response
+        if cacheable:
+            self.response_cache.put(user_input, response)
+        self.conversation.add(user_input, response)
+        return response
 
-        """
-        
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=user_input)],
-            )
-        ]
-        
-        generate_content_config = types.GenerateContentConfig(
-            temperature=0.7,
-            response_mime_type="application/json",
-            system_instruction=[types.Part.from_text(text=system_instruction)],
-        )
+    def request_model(self, user_input, history=()):
+        return self.model_session.generate(user_input, history)
 
-        response = client.models.generate_content(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
-        )
-        
-        return response.text
+    def stream_model(self, user_input, on_delta, history=()):
+        extractor = ResponseFieldExtractor()
+        chunks = []
+        for chunk in self.model_session.stream(user_input, history):
+            if self.cancelled():
+                break
+            chunks.append(chunk)
+            delta = extractor.feed(chunk)
+            if delta:
+                on_delta(delta)
+        return "".join(chunks)
+
+    def register_tasks(self):
+        """Build the registry handle_developer_task dispatches through"""
+        registry = TaskRegistry(slow_threshold=self.config.get("slow_task_seconds", 1.0))
+        for name, handler, args, options in (
+            ("open_app", self.open_application, ("name",), {}),
+            ("create_file", self.create_file, ("name", "location", "filetype"), {}),
+            ("create_folder", self.create_folder, ("name", "location"), {}),
+            ("open_folder", self.open_folder, ("name",), {}),
+            ("open_url", self.open_url, ("name",), {"blocking": False}),
+            ("open_file", self.open_file, ("name", "filetype"), {}),
+            ("play_music", self.play_music, ("name",), {"latency": "network"}),
+            ("read_pdf", self.read_pdf, ("name", "location"), {}),
+            ("read_docx", self.read_docx, ("name", "location"), {}),
+            ("current_date", self.get_current_date, (), {"blocking": False, "latency": "instant"}),
+            ("current_time", self.get_current_time, (), {"blocking": False, "latency": "instant"}),
+            ("current_day", self.get_current_day, (), {"blocking": False, "latency": "instant"}),
+            ("current_year", self.get_current_year, (), {"blocking": False, "latency": "instant"}),
+            ("get_weather", self.get_weather, ("name",), {"latency": "network", "cacheable": True}),
+            ("get_location", self.get_location, (), {"latency": "network", "cacheable": True}),
+            ("close_folder", self.close_folder, ("name",), {}),
+            ("get_path", self.get_path, ("name",), {}),
+            ("find_content", self.find_content, ("name", "operation"), {}),
+        ):
+            registry.register(name, handler, args, **options)
+        return registry
 
     def handle_developer_task(self, task_data):
         task = task_data.get("task")
-        operation = task_data.get("operation")
-        name = task_data.get("name")
-        location = task_data.get("location", None)
-        filetype = task_data.get("filetype", None)
-        
+        if self.tasks.get(task) is None:
+            operation = task_data.get("operation")
+            name = task_data.get("name")
+            return f"I received your request to {operation} {task} '{name}', but this feature isn't implemented yet."
         try:
-            if task == "open_app":
-                return self.open_application(name)
-            elif task == "create_file":
-                return self.create_file(name, location, filetype)
-            elif task == "create_folder":
-                return self.create_folder(name, location)
-            elif task == "open_folder":
-                return self.open_folder(name)
-            elif task == "open_url":
-                return self.open_url(name)
-            elif task == "open_file":
-                return self.open_file(name, filetype)
-            elif task == "play_music":
-                return self.play_music(name)
-            elif task == "read_pdf":
-                return self.read_pdf(name, location)
-            elif task == "read_docx":
-                return self.read_docx(name, location)
-            elif task == "current_date":
-                return self.get_current_date()
-            elif task == "current_time":
-                return datetime.now().strftime("%I:%M %p")
-            elif task == "get_weather":
-                return self.get_weather(name)
-            elif task == "get_location":
-                return self.get_location()
-            elif task == "close_folder":
-                return self.close_folder(name)
-            elif task == "play_music":
-                return self.play_music(name)
-            elif task == "get_path":
-                return self.get_path(name)
-            else:
-                return f"I received your request to {operation} {task} '{name}', but this feature isn't implemented yet."
+            return self.tasks.dispatch(task, task_data)
         except Exception as e:
             return f"Sorry, I encountered an error while processing your request: {str(e)}"
 
+    @staticmethod
+    def task_dependencies(tasks):
+        """For each task, the indexes of earlier tasks it has to wait for
+
+        A task waits for the tasks listed in its "after" field and for the
+        last earlier task on the same name, so "create Reports and open
+        Reports" keeps its order while unrelated tasks run side by side.
+        """
+        dependencies = []
+        last_on_name = {}
+        for i, task in enumerate(tasks):
+            after = task.get("after")
+            # Only a list of earlier task indexes means anything; other values are ignored
+            after = {j for j in after if type(j) is int and 0 <= j < i} if isinstance(after, list) else set()
+            name = task.get("name")
+            if isinstance(name, str) and name.strip():
+                key = os.path.splitext(name.strip().lower())[0]
+                if key in last_on_name:
+                    after.add(last_on_name[key])
+                last_on_name[key] = i
+            dependencies.append(after)
+        return dependencies
+
+    def run_tasks(self, tasks):
+        """Run the tasks of a compound command on the task pool and return one combined reply"""
+        tasks = [task for task in tasks if isinstance(task, dict)]
+        if not tasks:
+            # Would otherwise be an empty reply; as an error it is explained and not cached
+            raise ValueError("the model listed no tasks I can run")
+        request = getattr(self._local, "request", None)
+        dependencies = self.task_dependencies(tasks)
+        waiting = [len(after) for after in dependencies]
+        dependents = [[] for _ in tasks]
+        for i, after in enumerate(dependencies):
+            for j in after:
+                dependents[j].append(i)
+        futures = [None] * len(tasks)
+        lock = threading.Lock()
+        all_done = threading.Semaphore(0)
+
+        def run(task):
+            # Posts and cancellation checks belong to the request this batch came from
+            previous = getattr(self._local, "request", None)
+            self._local.request = request
+            try:
+                if self.cancelled():
+                    return None
+                if "response" in task:
+                    return task["response"]
+                return self.handle_developer_task(task)
+            finally:
+                self._local.request = previous
+
+        def is_inline(task):
+            # Replies and cheap tasks are not worth a trip through the pool
+            spec = self.tasks.get(task.get("task"))
+            return "response" in task or (spec is not None and not spec["blocking"])
+
+        def start(ready):
+            inline = []
+            for i in ready:
+                if is_inline(tasks[i]):
+                    inline.append(i)
+                else:
+                    futures[i] = self.task_pool.submit(run, tasks[i])
+                    futures[i].add_done_callback(lambda future, i=i: finished(i))
+            # Run after the pool tasks are queued, so they are not held up
+            for i in inline:
+                futures[i] = concurrent.futures.Future()
+                futures[i].set_result(run(tasks[i]))
+                finished(i)
+
+        def finished(i):
+            # A task is queued once everything it waits for is done, so no worker sits idle waiting
+            with lock:
+                ready = []
+                for j in dependents[i]:
+                    waiting[j] -= 1
+                    if waiting[j] == 0:
+                        ready.append(j)
+            start(ready)
+            all_done.release()
+
+        start([i for i in range(len(tasks)) if not dependencies[i]])
+        for _ in tasks:
+            all_done.acquire()
+        results = [future.result() for future in futures]
+        return "\n".join(str(result) for result in results if result)
+
     # Implementations of all task methods with parameters
 
     
 
+    # Lowest fuzzy score we act on when opening something
+    MIN_MATCH_SCORE = 0.6
+
+    def find_indexed(self, name, kind):
+        """Look a name up in the file index, searching the disk while the first build runs"""
+        if self.file_index.ready.is_set():
+            return self.file_index.find(name, kind)
+
+        self.file_index.start_background_build()
+        target = name.lower()
+        want_dir = kind == 'dir'
+
+        def match(entry):
+            return entry.name.lower() == target and entry.is_dir(follow_symlinks=False) == want_dir
+
+        def progress(scanned):
+            self.post("progress", (f"Searching... scanned {scanned} folders", None))
+
+        try:
+            path = self.live_search.search(self.file_index.roots, match, progress)
+        finally:
+            self.post("progress", None)
+        return [path] if path else []
+
+    def _build_fuzzy_indexes(self):
+        """Load every indexed name into fresh fuzzy indexes"""
+        self.file_index.ready.wait()
+        indexes = {'file': FuzzyIndex(strip_extension=True), 'dir': FuzzyIndex()}
+        for name, kind in self.file_index.names():
+            indexes[kind].add(name, name)
+        self.fuzzy_indexes = indexes
+        self.fuzzy_ready.set()
+
+    def _on_index_changes(self, changes):
+        if changes is None:
+            # The file index was rebuilt from scratch
+            threading.Thread(target=self._build_fuzzy_indexes, daemon=True).start()
+            if self.config.get("content_index", True) and self.content_index.ready.is_set():
+                self.content_index.start_background_update()
+            return
+        documents = [path for change in changes for path in change[1:]
+                     if isinstance(path, str) and path.lower().endswith(CONTENT_EXTENSIONS)]
+        if documents and self.config.get("content_index", True):
+            self.content_index.start_background_update(documents)
+        for change in changes:
+            if change[0] == "add":
+                name = os.path.basename(change[1])
+                self.fuzzy_indexes[change[2]].add(name, name)
+            elif change[0] == "rename":
+                # The kind is unknown here; lookups filter by kind anyway
+                name = os.path.basename(change[2])
+                for index in self.fuzzy_indexes.values():
+                    index.add(name, name)
+
+    def search_candidates(self, name, kind, k=5):
+        """Return up to k {"name", "path", "score"} matches for a 'file', 'folder' or 'app', best first"""
+        if kind == 'app':
+            return self._search_app_candidates(name, k)
+
+        index_kind = 'dir' if kind == 'folder' else 'file'
+        candidates = [{"name": os.path.basename(path), "path": path, "score": 1.0}
+                      for path in self.find_indexed(name, index_kind)]
+        if len(candidates) < k and self.fuzzy_ready.is_set():
+            seen = {c["path"] for c in candidates}
+            wanted_ext = os.path.splitext(name)[1].lower() if index_kind == 'file' else ''
+            for score, matches in self.fuzzy_indexes[index_kind].search(name, k):
+                for match in matches:
+                    # Same stem with another extension ranks below the one asked for
+                    match_score = score
+                    if wanted_ext and not match.lower().endswith(wanted_ext):
+                        match_score *= 0.9
+                    for path in self.file_index.lookup(match, index_kind):
+                        if path not in seen:
+                            seen.add(path)
+                            candidates.append({"name": match, "path": path, "score": match_score})
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates[:k]
+
+    def _search_app_candidates(self, name, k):
+        if not self.app_catalog.ready.is_set():
+            self.post("status", "Building application catalog, please wait...")
+            self.app_catalog.start_background_build()
+            self.app_catalog.ready.wait()
+
+        entries = self.app_catalog.entries
+        candidates = []
+        entry = self.app_catalog.resolve(name)
+        if entry:
+            candidates.append({"name": entry["name"], "path": entry["target"], "score": 1.0, "entry": entry})
+
+        # Rebuild the app trigram index whenever the catalog was rebuilt
+        if self._fuzzy_apps is None or self._fuzzy_apps[0] is not entries:
+            index = FuzzyIndex()
+            for i, e in enumerate(entries):
+                index.add(e["name"], i)
+            self._fuzzy_apps = (entries, index)
+
+        for score, ids in self._fuzzy_apps[1].search(name, k):
+            for i in ids:
+                if entries[i] is not entry:
+                    candidates.append({"name": entries[i]["name"], "path": entries[i]["target"],
+                                       "score": score, "entry": entries[i]})
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates[:k]
+
     def get_path(self, name):
         try:
             # Show searching message
-            self.message_queue.put(("status", "Searching for file, please wait..."))
-            
-            found_paths = []
-            lock = threading.Lock()
-            threads = []
-    
-            def search_drive(drive, target_name):
-                drive_path = f"{drive}:\\"
-                skip_dirs = [
-                    'Windows', 
-                    'System32', 
-                    'SysWOW64', 
-                    'Program Files', 
-                    'Program Files (x86)',
-                    '$Recycle.Bin',
-                    'System Volume Information'
-                ]
-    
-                if os.path.exists(drive_path):
-                    for root, dirs, files in os.walk(drive_path, topdown=True):
-                        try:
-                            # Skip system directories
-                            dirs[:] = [d for d in dirs if not d.startswith('$') 
-                                     and d not in skip_dirs 
-                                     and not any(skip_dir in root for skip_dir in skip_dirs)]
-                            
-                            # Check files with the specific extension
-                            if target_name in files:
-                                full_path = os.path.join(root, target_name)
-                                with lock:
-                                    found_paths.append(full_path)
-                                    return  # Exit after finding first match
-                        except PermissionError:
-                            continue
-                        except Exception:
-                            continue
-    
-            # Search all available drives
-            for drive in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if os.path.exists(f"{drive}:"):
-                    t = threading.Thread(target=search_drive, args=(drive, name))
-                    t.start()
-                    threads.append(t)
-    
-            # Wait for all searches to complete
-            for t in threads:
-                t.join()
-    
-            if found_paths:
-                return f"Found file: {found_paths[0]}"
+            self.post("status", "Searching for file, please wait...")
+
+            candidates = self.search_candidates(name, 'file', 1)
+
+            if candidates and candidates[0]["score"] >= self.MIN_MATCH_SCORE:
+                return f"Found file: {candidates[0]['path']}"
             else:
                 return f"Could not find file: {name}"
     
@@ -470,57 +4115,17 @@ JSON Output Format (only for developer-handled tasks):
     def open_file(self, name, filetype=None):
         try:
             # Show searching message
-            self.message_queue.put(("status", "Searching for file, please wait..."))
-            
-            found_paths = []
-            lock = threading.Lock()
-            threads = []
-    
-            def search_drive(drive, target_name, target_type):
-                drive_path = f"{drive}:\\"
-                skip_dirs = [
-                    'Windows', 
-                    'System32', 
-                    'SysWOW64', 
-                    'Program Files', 
-                    'Program Files (x86)',
-                    '$Recycle.Bin',
-                    'System Volume Information'
-                ]
-    
-                if os.path.exists(drive_path):
-                    for root, dirs, files in os.walk(drive_path, topdown=True):
-                        try:
-                            # Skip system directories
-                            dirs[:] = [d for d in dirs if not d.startswith('$') 
-                                     and d not in skip_dirs 
-                                     and not any(skip_dir in root for skip_dir in skip_dirs)]
-                            
-                            # Check files with the specific extension
-                            target_filename = f"{target_name}{target_type}" if target_type else target_name
-                            if target_filename in files:
-                                full_path = os.path.join(root, target_filename)
-                                with lock:
-                                    found_paths.append(full_path)
-                                    return  # Exit after finding first match
-                        except PermissionError:
-                            continue
-                        except Exception:
-                            continue
-    
-            # Search all available drives
-            for drive in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if os.path.exists(f"{drive}:"):
-                    t = threading.Thread(target=search_drive, args=(drive, name, filetype))
-                    t.start()
-                    threads.append(t)
-    
-            # Wait for all searches to complete
-            for t in threads:
-                t.join()
-    
+            self.post("status", "Searching for file, please wait...")
+
+            target_filename = f"{name}{filetype}" if filetype else name
+            found_paths = [c["path"] for c in self.search_candidates(target_filename, 'file', 1)
+                           if c["score"] >= self.MIN_MATCH_SCORE]
+            if not found_paths and not filetype:
+                # No extension given, accept any "name.ext"
+                found_paths = self.file_index.lookup(f"{name}.", 'file', mode="prefix")
+
             if found_paths:
-                os.startfile(found_paths[0])
+                open_path(found_paths[0])
                 return f"Found and opened file: {os.path.basename(found_paths[0])}"
             else:
                 return f"Could not find file: {name}{f'{filetype}' if filetype else ''}"
@@ -528,69 +4133,46 @@ JSON Output Format (only for developer-handled tasks):
         except Exception as e:
             return f"Error while trying to open file: {str(e)}"
 
+    def find_content(self, query, operation=None):
+        try:
+            if not query:
+                return "What should the document mention?"
+            if not self.config.get("content_index", True):
+                return "Searching inside documents is turned off (content_index in the config)."
+            if not self.content_index.ready.is_set():
+                self.content_index.start_background_update()
+                return "I'm still indexing your documents; please ask again in a little while."
+
+            results = self.content_index.search(query, limit=5)
+            if not results:
+                return f"No documents mention '{query}'."
+            if operation == "open":
+                open_path(results[0]["path"])
+                return f"Opened {os.path.basename(results[0]['path'])}, which mentions '{query}'"
+            lines = [f"{i}. {result['path']}" for i, result in enumerate(results, 1)]
+            return f"Documents mentioning '{query}':\n" + "\n".join(lines)
+        except Exception as e:
+            return f"Error while searching documents: {str(e)}"
+
     def open_application(self, app_name):
         try:
-            # Get all available drives
-            drives = [f"{d}:\\" for d in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' if os.path.exists(f"{d}:\\")]
-            
-            # Common executable extensions
-            extensions = ['.exe', '.msi', '.bat', '.cmd']
-            
-            # Common install directories relative to drive root
-            common_dirs = [
-                'Program Files',
-                'Program Files (x86)',
-                f'Users\\{os.getenv("USERNAME")}\\AppData\\Local',
-                f'Users\\{os.getenv("USERNAME")}\\AppData\\Local\\Programs',
-                f'Users\\{os.getenv("USERNAME")}\\AppData\\Roaming',
-                'Windows',
-                'Windows\\System32',
-                'Windows\\SysWOW64',
-                'Windows\\System',
-                # dynamic path from differnt folder and 
-            ]
-    
-            # First try direct launch
+            # Catalog lookup is a dictionary hit, so launching costs only the spawn
+            for candidate in self.search_candidates(app_name, 'app', 3):
+                if candidate["score"] < self.MIN_MATCH_SCORE:
+                    break
+                try:
+                    self.app_catalog.launch(candidate["entry"])
+                    return f"Launched {candidate['name']}"
+                except Exception:
+                    continue
+
+            # Not in the catalog, try a direct launch
             try:
-                if app_name.lower() == "Visual Studio Code":
-                    app_name = "Code.exe"
                 subprocess.Popen(app_name)
                 return f"Launched {app_name}"
             except:
                 pass
-    
-            # Function to check if a filename matches our search
-            def is_match(filename, search_term):
-                name_lower = filename.lower()
-                search_lower = search_term.lower()
-                # Check if the search term appears as a whole word
-                return (search_lower == name_lower or 
-                       search_lower == name_lower.replace('.exe', '') or
-                       search_lower in name_lower.split('-') or
-                       search_lower in name_lower.split('_') or
-                       search_lower in name_lower.split(' '))
-    
-           
-    
-            # Search in drives if registry search failed
-            for drive in drives:
-                for base_dir in common_dirs:
-                    search_dir = os.path.join(drive, base_dir)
-                    if not os.path.exists(search_dir):
-                        continue
-                        
-                    for root, dirs, files in os.walk(search_dir):
-                        # Check each file in the current directory
-                        for file in files:
-                            if any(file.lower().endswith(ext) for ext in extensions):
-                                if is_match(file, app_name):
-                                    try:
-                                        app_path = os.path.join(root, file)
-                                        subprocess.Popen(app_path)
-                                        return f"Launched {file} from {root}"
-                                    except:
-                                        continue
-    
+
             # Try Windows Run as last resort
             try:
                 subprocess.run(['cmd', '/c', 'start', app_name], check=True)
@@ -607,6 +4189,7 @@ JSON Output Format (only for developer-handled tasks):
             
             with open(path, 'w') as f:
                 pass
+            self.file_index.apply([("add", os.path.abspath(path), 'file')])
             return f"Created file: {os.path.basename(path)}"
         except Exception as e:
             return f"Could not create file: {str(e)}"
@@ -615,6 +4198,7 @@ JSON Output Format (only for developer-handled tasks):
         try:
             path = os.path.join(location or os.getcwd(), name)
             os.makedirs(path, exist_ok=True)
+            self.file_index.apply([("add", os.path.abspath(path), 'dir')])
             return f"Created folder: {name}"
         except Exception as e:
             return f"Could not create folder: {str(e)}"
@@ -622,55 +4206,13 @@ JSON Output Format (only for developer-handled tasks):
     def open_folder(self, name):
         try:
             # Call the search function and show searching message
-            self.message_queue.put(("status", "Searching for folder, please wait..."))
-            
-            # Search for the folder using the search_drive method from earlier
-            found_paths = []
-            lock = threading.Lock()
-            threads = []
-    
-            def search_drive(drive, target_name):
-                drive_path = f"{drive}:\\"
-                skip_dirs = [
-                    'Windows', 
-                    'System32', 
-                    'SysWOW64', 
-                    'Program Files', 
-                    'Program Files (x86)',
-                    '$Recycle.Bin',
-                    'System Volume Information'
-                ]
-    
-                if os.path.exists(drive_path):
-                    for root, dirs, files in os.walk(drive_path, topdown=True):
-                        try:
-                            dirs[:] = [d for d in dirs if not d.startswith('$') 
-                                     and d not in skip_dirs 
-                                     and not any(skip_dir in root for skip_dir in skip_dirs)]
-                            
-                            if target_name == os.path.basename(root):
-                                with lock:
-                                    found_paths.append(root)
-                                    return  # Exit after finding first match
-                        except PermissionError:
-                            continue
-                        except Exception:
-                            continue
-    
-            # Search all available drives
-            for drive in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if os.path.exists(f"{drive}:"):
-                    t = threading.Thread(target=search_drive, args=(drive, name))
-                    t.start()
-                    threads.append(t)
-    
-            # Wait for all searches to complete
-            for t in threads:
-                t.join()
-    
-            if found_paths:
-                os.startfile(found_paths[0])
-                return f"Found and opened folder: {name}"
+            self.post("status", "Searching for folder, please wait...")
+
+            candidates = self.search_candidates(name, 'folder', 1)
+
+            if candidates and candidates[0]["score"] >= self.MIN_MATCH_SCORE:
+                open_path(candidates[0]["path"])
+                return f"Found and opened folder: {candidates[0]['name']}"
             else:
                 return f"Could not find folder: {name}"
     
@@ -689,66 +4231,124 @@ JSON Output Format (only for developer-handled tasks):
     def play_music(self, song_name):
         try:
             # Show searching message
-            self.message_queue.put(("status", "This feature is not implemented yet"))
+            self.post("status", "This feature is not implemented yet")
             return "Music playback functionality is not implemented yet. Please try again later."
         except Exception as e:
             return f"Could not play music: {str(e)}"
 
     def read_pdf(self, name, location=None):
-        try:
-            path = os.path.join(location or os.getcwd(), f"{name}.pdf")
-            os.startfile(path)
-            return f"Opened PDF: {name}"
-        except Exception as e:
-            return f"Could not read PDF: {str(e)}"
+        return self.read_document(name, location, ".pdf")
 
     def read_docx(self, name, location=None):
+        return self.read_document(name, location, ".docx")
+
+    def find_document(self, name, location, extension):
+        """Path of name+extension in location, or the best indexed match, or None"""
+        filename = name if name.lower().endswith(extension) else f"{name}{extension}"
+        if location:
+            path = os.path.join(os.path.expanduser(location), filename)
+            if os.path.isfile(path):
+                return path
+        candidates = self.search_candidates(filename, 'file', 3)
+        for candidate in candidates:
+            if candidate["score"] >= self.MIN_MATCH_SCORE and candidate["path"].lower().endswith(extension):
+                return candidate["path"]
+        return None
+
+    def read_document(self, name, location, extension):
+        """Show and speak a document a page at a time while the rest is still being extracted"""
+        kind = "PDF" if extension == ".pdf" else "document"
         try:
-            path = os.path.join(location or os.getcwd(), f"{name}.docx")
-            os.startfile(path)
-            return f"Opened document: {name}"
+            if not name:
+                return f"Which {kind} should I read?"
+            self.post("status", f"Searching for {kind}, please wait...")
+            path = self.find_document(name, location, extension)
+            if path is None:
+                return f"Could not find {kind}: {name}"
+
+            unit = "page" if extension == ".pdf" else "paragraph"
+            limit = self.config.get("read_aloud_chars", 20000)
+            chunks = self.documents.chunks(path)
+            shown = []
+            size = 0
+            try:
+                for count, text in enumerate(chunks, 1):
+                    if self.cancelled():
+                        break
+                    text = text.strip() + "\n\n"
+                    self.post("assistant_delta", text)
+                    self.post("progress", (f"Reading {os.path.basename(path)}: {unit} {count}", None))
+                    shown.append(text)
+                    size += len(text)
+                    if size >= limit:
+                        # Finish extracting in the background so the next reading comes from the cache
+                        threading.Thread(target=self._finish_extraction, args=(chunks,), daemon=True,
+                                         name="extract").start()
+                        shown.append(f"(Read the first {count} {unit}s; open the {kind} for the rest.)")
+                        break
+            finally:
+                self.post("progress", None)
+            if not shown:
+                return f"{os.path.basename(path)} has no text to read."
+            return "".join(shown).strip()
         except Exception as e:
-            return f"Could not read document: {str(e)}"
+            return f"Could not read {kind}: {str(e)}"
+
+    @staticmethod
+    def _finish_extraction(chunks):
+        """Read a document's remaining chunks; reaching the end is what writes the cache"""
+        try:
+            for _ in chunks:
+                pass
+        except Exception:
+            # Only the cache is lost; the next reading extracts the document again
+            logger.warning("Could not finish extracting a document", exc_info=True)
 
     def get_current_date(self):
         today = datetime.now().strftime("%A, %B %d, %Y")
         return f"Today's date is {today}"
 
+    def get_current_time(self):
+        return datetime.now().strftime("%I:%M %p")
+
+    def get_current_day(self):
+        return f"Today is {datetime.now().strftime('%A')}"
+
+    def get_current_year(self):
+        return f"It's {datetime.now().year}"
+
     def get_weather(self, location=None):
         try:
-            # OpenWeatherMap API configuration
-            api_key = "8d2de98e089f1c28e1a22fc19a24ef04"  # Free API key
-            loc = location or "Karachi"  # Default location if none provided
-    
             # Clean up location data if it comes as a dict
-            if isinstance(loc, dict):
-                loc = loc.get("city", "Nairobi")
+            if isinstance(location, dict):
+                location = location.get("city")
+
+            # Without a place, use the user's own city
+            loc = location or self.location.city() or self.config.get("weather_default_city", "Karachi")
     
-            # Make API request
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={loc}&appid={api_key}&units=metric"
-            response = requests.get(url, timeout=10)
-            data = response.json()
+            # Served from the cache when someone asked recently
+            try:
+                data = self.weather.current(loc)
+            except LookupError as e:
+                return f"Could not get weather for {loc}: {e}"
     
-            if response.status_code == 200:
-                # Extract weather information
-                temp = data['main']['temp']
-                humidity = data['main']['humidity']
-                desc = data['weather'][0]['description']
-                wind_speed = data['wind']['speed']
-                city = data['name']
-                country = data['sys']['country']
+            # Extract weather information
+            temp = data['main']['temp']
+            humidity = data['main']['humidity']
+            desc = data['weather'][0]['description']
+            wind_speed = data['wind']['speed']
+            city = data['name']
+            country = data['sys']['country']
     
-                # Format response
-                weather_info = (
-                    f"Weather in {city}, {country}:\n"
-                    f"🌡️ Temperature: {temp:.1f}°C\n"
-                    f"💧 Humidity: {humidity}%\n"
-                    f"🌥️ Conditions: {desc.capitalize()}\n"
-                    f"💨 Wind Speed: {wind_speed} m/s"
-                )
-                return weather_info
-            else:
-                return f"Could not get weather for {loc}: {data.get('message', 'Unknown error')}"
+            # Format response
+            weather_info = (
+                f"Weather in {city}, {country}:\n"
+                f"🌡️ Temperature: {temp:.1f}°C\n"
+                f"💧 Humidity: {humidity}%\n"
+                f"🌥️ Conditions: {desc.capitalize()}\n"
+                f"💨 Wind Speed: {wind_speed} m/s"
+            )
+            return weather_info
         
         except requests.Timeout:
             return "Weather service request timed out. Please try again."
@@ -759,10 +4359,9 @@ JSON Output Format (only for developer-handled tasks):
 
     def get_location(self):
         try:
-            # Use IP-based geolocation API
-            response = requests.get('https://ipinfo.io/json', timeout=5)
-            if response.status_code == 200:
-                data = response.json()
+            # IP-based geolocation, looked up once per network
+            data = self.location.current()
+            if data:
                 city = data.get('city', 'Unknown')
                 region = data.get('region', 'Unknown')
                 country = data.get('country', 'Unknown')
@@ -781,12 +4380,347 @@ JSON Output Format (only for developer-handled tasks):
             return f"Could not close folder: {str(e)}"
 
 
+class HeadlessRequest:
+    """One message from an API client; its messages go back to that client"""
+
+    def __init__(self, request_id, text):
+        self.id = request_id
+        self.text = text
+        self.cancelled = threading.Event()
+        self.future = None
+        self.tasks = []
+        self.events = queue.Queue()
+
+    def post(self, message_type, message):
+        if not self.cancelled.is_set():
+            self.events.put((message_type, message))
+
+
+class AssistantDaemon:
+    """Runs DennisAssistant without Tk behind a local HTTP JSON API
+
+    POST /message with {"text": ..., "stream": true} answers with one JSON
+    object per line (NDJSON): the request's messages as {"type": ...,
+    "message": ...}, using the UIMessageQueue types, then {"type": "done",
+    "ms": ..., "tasks": [...]}. With "stream": false the answer is a single
+    {"response", "events", "ms", "tasks"} object. GET /events streams
+    messages that belong to no request, GET /stats reports request and task
+    latencies and GET /health answers once the daemon is serving.
+
+    Every endpoint but /health needs "Authorization: Bearer <token>", and
+    POST bodies must be sent as application/json. Requests naming another
+    host or coming from a foreign web page (Host/Origin) are refused.
+    """
+
+    def __init__(self, assistant=None, host=None, port=None, max_in_flight=None):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        # The daemon is the assistant's message queue; messages outside a request go to /events
+        self.assistant = assistant or DennisAssistant(self)
+        self.assistant.message_queue = self
+        config = self.assistant.config
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight or config.get("daemon_max_in_flight", 8), thread_name_prefix="daemon")
+        self._ids = itertools.count(1)
+        self.started_at = time.time()
+        self.in_flight = 0
+        # End-to-end latency of API requests, per task name
+        self.latencies = collections.defaultdict(LatencyRecorder)
+        self.token = config.get("daemon_token") or self._load_token(self.assistant.data_dir)
+        self.server = make_daemon_server(self, host or config.get("daemon_host", "127.0.0.1"),
+                                         config.get("daemon_port", 8765) if port is None else port)
+
+    @staticmethod
+    def _load_token(data_dir):
+        """Read the generated API token, creating it readable only by this user"""
+        path = os.path.join(data_dir, "daemon_token")
+        try:
+            with open(path, encoding="utf-8") as f:
+                token = f.read().strip()
+            if token:
+                return token
+        except OSError:
+            pass
+        token = secrets.token_urlsafe(32)
+        os.makedirs(data_dir, exist_ok=True)
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            f.write(token)
+        return token
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def put(self, message):
+        """Message from the assistant outside any request"""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(message)
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.remove(subscriber)
+
+    def submit(self, text):
+        request = HeadlessRequest(next(self._ids), text)
+        request.future = self.executor.submit(self._process, request)
+        return request
+
+    def _process(self, request):
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            self.assistant.process_user_input(request.text, request)
+        except Exception as e:
+            request.post("assistant_response", f"Sorry, I encountered an error while processing your request: {e}")
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                for task in request.tasks or ["response"]:
+                    self.latencies[task].record(seconds)
+            request.events.put(("done", {"ms": seconds * 1000, "tasks": request.tasks}))
+
+    def stats(self):
+        with self._lock:
+            requests = {task: {"count": recorder.count, **recorder.percentiles()}
+                        for task, recorder in self.latencies.items()}
+            in_flight = self.in_flight
+        return {"uptime": time.time() - self.started_at, "in_flight": in_flight,
+                "requests": requests, "tasks": self.assistant.tasks.stats()}
+
+    def serve_forever(self):
+        self.assistant.warm_up()
+        self.server.serve_forever()
+
+    def start(self):
+        """Serve on a background thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True, name="daemon").start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.assistant.close()
+
+
+def make_daemon_server(daemon, host, port):
+    """The HTTP server behind AssistantDaemon"""
+    # Imported here so the desktop window does not wait for http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit
+
+    # Names a local client may use in Host and Origin; anything else is a
+    # foreign page or a DNS-rebinding attempt
+    local_hosts = {"localhost", "127.0.0.1", "::1"}
+    if host not in ("", "0.0.0.0", "::"):
+        local_hosts.add(host.lower())
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, with streamed replies sent chunked
+        protocol_version = "HTTP/1.1"
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                # A client that goes away between requests is not an error
+                pass
+
+        def refused(self, path):
+            """Answer and return True unless the request comes from a local, authorized client"""
+            try:
+                host_name = urlsplit("//" + self.headers.get("Host", "")).hostname
+                origin = self.headers.get("Origin")
+                origin_name = urlsplit(origin).hostname if origin else None
+            except ValueError:
+                host_name = origin_name = None
+            if host_name not in local_hosts or (origin and origin_name not in local_hosts):
+                self.send_json(403, {"error": "requests must come from this machine"})
+                return True
+            if path == "/health":
+                return False
+            scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), daemon.token.encode()):
+                self.send_json(401, {"error": "missing or wrong API token"})
+                return True
+            if self.command == "POST" and (self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                                           != "application/json"):
+                self.send_json(415, {"error": "the body must be sent as application/json"})
+                return True
+            return False
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if self.refused(path):
+                return
+            if path == "/health":
+                self.send_json(200, {"status": "ok"})
+            elif path == "/stats":
+                self.send_json(200, daemon.stats())
+            elif path == "/events":
+                subscriber = daemon.subscribe()
+                try:
+                    self.start_stream()
+                    while True:
+                        message_type, message = subscriber.get()
+                        self.send_event({"type": message_type, "message": message})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    daemon.unsubscribe(subscriber)
+            else:
+                self.send_json(404, {"error": f"no such endpoint: {path}"})
+
+        def do_POST(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if self.refused(path):
+                # Refused before the body was read, so the connection cannot be reused
+                self.close_connection = True
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except (ValueError, UnicodeDecodeError):
+                body = None
+            if path != "/message":
+                self.send_json(404, {"error": f"no such endpoint: {path}"})
+                return
+            if not isinstance(body, dict) or not isinstance(body.get("text"), str) or not body["text"].strip():
+                self.send_json(400, {"error": 'expected a JSON object with a non-empty "text"'})
+                return
+
+            request = daemon.submit(body["text"].strip())
+            if not body.get("stream", True):
+                events = []
+                while True:
+                    message_type, message = request.events.get()
+                    if message_type == "done":
+                        break
+                    events.append({"type": message_type, "message": message})
+                responses = [event["message"] for event in events if event["type"] == "assistant_response"]
+                self.send_json(200, {"response": responses[-1] if responses else None, "events": events,
+                                     "ms": message["ms"], "tasks": message["tasks"]})
+                return
+
+            try:
+                self.start_stream()
+                while True:
+                    message_type, message = request.events.get()
+                    if message_type == "done":
+                        self.send_event({"type": "done", **message})
+                        break
+                    self.send_event({"type": message_type, "message": message})
+                self.end_stream()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away; stop working on its request
+                request.cancelled.set()
+                self.close_connection = True
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def start_stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def send_event(self, event):
+            line = json.dumps(event).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def end_stream(self):
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Room for many clients connecting at once
+        request_queue_size = 128
+
+    return Server((host, port), Handler)
+
+
+def profile_startup():
+    """Print how long each part of startup takes; run with --profile-startup"""
+    rows = [("main.py imports", IMPORTS_FINISHED_AT - IMPORT_STARTED_AT)]
+
+    def step(label, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            label, result = f"{label} (failed: {e})", None
+        rows.append((label, time.perf_counter() - start))
+        return result
+
+    step("import tkinter", lambda: (tk.load(), scrolledtext.load(), ttk.load()))
+    root = step("Tk root window", tk.Tk)
+    assistant = step("DennisAssistant", lambda: DennisAssistant(UIMessageQueue()))
+    step("DennisAssistantUI", lambda: DennisAssistantUI(root, assistant, warm_up=False))
+    step("first paint", root.update)
+    first_window = time.perf_counter() - IMPORT_STARTED_AT
+
+    # What warm-up does in the background after the first paint, one step at a time
+    for name, module in LAZY_MODULES.items():
+        step(f"import {name}", module.load)
+    step("TTS engine (pyttsx3.init)", lambda: pyttsx3.init())
+    step("speech recognizer", lambda: sr.Recognizer())
+    step("model client", lambda: assistant.model_session.client)
+    step("HTTP session", lambda: assistant.weather.session)
+
+    width = max(len(label) for label, _ in rows)
+    for label, seconds in rows:
+        print(f"{label:<{width}} {seconds * 1000:8.1f} ms")
+    print(f"time to first window: {first_window * 1000:.1f} ms")
+    root.destroy()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dennis desktop assistant")
+    parser.add_argument("--daemon", action="store_true", help="run without a window, behind a local HTTP JSON API")
+    parser.add_argument("--host", help="daemon address (default: daemon_host from the config)")
+    parser.add_argument("--port", type=int, help="daemon port (default: daemon_port from the config)")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each part of startup takes")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+        sys.exit()
+    if args.daemon:
+        daemon = AssistantDaemon(host=args.host, port=args.port)
+        print(f"Dennis is listening on {daemon.url}", flush=True)
+        if not daemon.assistant.config.get("daemon_token"):
+            print(f"API token: {os.path.join(daemon.assistant.data_dir, 'daemon_token')}", flush=True)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        daemon.assistant.close()
+        sys.exit()
 
-    
     root = tk.Tk()
     app = DennisAssistantUI(root)
     root.mainloop()
+    app.assistant.close()
 
 # obj = DennisAssistant(None)
 # # obj.open_file("Ct-22025-CCN-Lab9", "pdf")
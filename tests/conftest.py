@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Set before main is imported, so nothing a test does can reach the user's ~/.dennis
+os.environ["DENNIS_DATA_DIR"] = tempfile.mkdtemp(prefix="dennis_tests_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_assistant(tmp_path):
+    """The benchmarks' make_assistant, each assistant in its own directory under tmp_path and closed afterwards"""
+    from benchmarks import make_assistant as make
+
+    made = []
+
+    def factory(*args, **kwargs):
+        base = tmp_path / f"assistant{len(made)}"
+        base.mkdir()
+        assistant = make(str(base), *args, **kwargs)
+        made.append(assistant)
+        return assistant
+
+    yield factory
+    for assistant in made:
+        assistant.close()
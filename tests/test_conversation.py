@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from benchmarks import CONVERSATION, StubGenaiClient
+from main import ConversationMemory, ModelSession, ResponseCache
+
+
+def converse(make_assistant, cache_supported, turns=40, history_tokens=300):
+    client = StubGenaiClient(cache_supported)
+    session = ModelSession("stand-in-key", "stand-in")
+    # Build the request configs, then talk to the stub instead of the API
+    session.client
+    session._client = client
+    assistant = make_assistant(history_tokens=history_tokens)
+    assistant.model_session = session
+    for turn in range(turns):
+        assistant.process_user_input(CONVERSATION[turn % len(CONVERSATION)] + f" ({turn})")
+    return assistant, client, [usage["prompt"] - usage["cached"] for usage in session.usage]
+
+
+def test_cached_system_instruction_is_sent_once(make_assistant):
+    _, client, cached_sent = converse(make_assistant, cache_supported=True)
+    _, _, plain_sent = converse(make_assistant, cache_supported=False)
+    assert client.caches_created == 1
+    assert max(cached_sent) < min(plain_sent)
+
+
+def test_history_stays_within_the_token_budget(make_assistant):
+    assistant, _, sent = converse(make_assistant, cache_supported=True, history_tokens=300)
+    history = assistant.conversation.history()
+    assert history[0][1].startswith("Summary of the earlier conversation")
+    # The window holds at most history_tokens, plus the digest and its acknowledgement
+    budget = 300 + assistant.conversation.digest_tokens + 50
+    assert assistant.conversation.tokens() <= budget
+    # What each turn sends stays bounded however long the conversation gets
+    assert max(sent) <= budget + 50
+
+
+def test_follow_ups_are_kept_out_of_the_response_cache(make_assistant):
+    assistant, _, _ = converse(make_assistant, cache_supported=True, turns=len(CONVERSATION))
+    assistant.response_cache.flush()
+    with open(assistant.response_cache.path, encoding="utf-8") as f:
+        cached_keys = {key for key, _ in json.load(f)}
+    follow_ups = [u for u in CONVERSATION if ConversationMemory.CONTEXT_DEPENDENT.search(u)]
+    assert follow_ups
+    assert not [key for key in cached_keys if any(key.startswith(ResponseCache.normalize(f)) for f in follow_ups)]
+
+
+@pytest.mark.parametrize("reply, line", [
+    (json.dumps({"response": "Canberra is the capital."}), "- user: capital -> Canberra is the capital."),
+    (json.dumps({"task": "open_app", "name": "chrome"}), "- user: capital -> open_app chrome"),
+    ("not json", "- user: capital -> not json"),
+])
+def test_digest_lines(reply, line):
+    assert ConversationMemory._digest_line("capital", reply) == line
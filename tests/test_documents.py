@@ -0,0 +1,31 @@
+import logging
+import os
+
+from benchmarks import write_docx_fixture
+from main import DennisAssistant, DocumentReader
+
+
+def test_finishing_an_extraction_writes_the_cache(tmp_path):
+    path = str(tmp_path / "thesis.docx")
+    write_docx_fixture(path, 50)
+    reader = DocumentReader(cache_dir=str(tmp_path / "cache"))
+    chunks = reader.chunks(path)
+    first = next(chunks)
+    assert not os.path.exists(reader.cache_path(path))
+
+    DennisAssistant._finish_extraction(chunks)
+    assert os.path.exists(reader.cache_path(path))
+    cached = list(reader.chunks(path))
+    assert reader.hits == 1
+    assert cached[0] == first and len(cached) == 50
+
+
+def test_a_failed_extraction_is_logged(caplog):
+    def chunks():
+        yield "page 1"
+        raise ValueError("damaged page")
+
+    with caplog.at_level(logging.WARNING):
+        DennisAssistant._finish_extraction(chunks())
+    assert "Could not finish extracting a document" in caplog.text
+    assert "damaged page" in caplog.text
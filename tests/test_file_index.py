@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from main import FileIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    root = tmp_path / "root"
+    for i in range(30):
+        folder = root / f"d{i:02}"
+        folder.mkdir(parents=True)
+        # Many case variants, and the exact name last
+        (folder / ("Report.TXT" if i < 29 else "report.txt")).touch()
+    for name in ("a\U0001F600b.txt", "a\uffffz.txt", "ab.txt", "b.txt"):
+        (root / name).touch()
+    index = FileIndex(str(tmp_path / "index.db"), roots=[str(root)])
+    index.build()
+    return index
+
+
+def test_exact_lookup_is_not_crowded_out_by_case_variants(index):
+    paths = index.lookup("report.txt", "file", limit=5)
+    assert [os.path.relpath(p, index.roots[0]) for p in paths] == [os.path.join("d29", "report.txt")]
+    assert len(index.lookup("report.txt", "file", mode="nocase", limit=50)) == 30
+
+
+def test_prefix_lookup_includes_names_beyond_the_bmp(index):
+    names = sorted(os.path.basename(p) for p in index.lookup("a", "file", mode="prefix"))
+    assert names == sorted(["a\U0001F600b.txt", "a\uffffz.txt", "ab.txt"])
+
+
+@pytest.mark.parametrize("prefix, end", [
+    ("ab", "ac"),
+    ("a\U0010ffff", "b"),
+    ("\U0010ffff", None),
+    ("a퟿", "a"),
+])
+def test_prefix_end(prefix, end):
+    assert FileIndex._prefix_end(prefix) == end
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs with tkinter unimportable, as on a server without Tk
+SCRIPT = textwrap.dedent("""
+    import json, sys, threading, urllib.request
+    sys.modules["tkinter"] = None
+    import main
+    daemon = main.AssistantDaemon(host="127.0.0.1", port=0)
+    threading.Thread(target=daemon.server.serve_forever, daemon=True).start()
+    port = daemon.server.server_address[1]
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=10) as response:
+        print(json.dumps({"status": response.status}))
+    daemon.shutdown()
+""")
+
+
+def test_the_daemon_runs_without_tkinter(tmp_path):
+    env = dict(os.environ, DENNIS_DATA_DIR=str(tmp_path))
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == {"status": 200}
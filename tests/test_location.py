@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import main
+from main import LocationService
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        # Plain ValueError, as older requests versions and simplejson raise
+        try:
+            return json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise ValueError(str(e)) from None
+
+
+@pytest.fixture
+def location(tmp_path, monkeypatch):
+    service = LocationService(path=str(tmp_path / "location.json"))
+    monkeypatch.setattr(service, "network_id", lambda: "192.0.2.10")
+
+    def serve(body):
+        monkeypatch.setattr(main.requests, "get", lambda url, timeout: FakeResponse(body), raising=False)
+        return service
+
+    return serve
+
+
+def test_city_comes_from_the_reply(location):
+    assert location('{"city": "Lisbon"}').city() == "Lisbon"
+
+
+@pytest.mark.parametrize("body", ["<html>Sign in to the Wi-Fi</html>", "[]", "null"])
+def test_a_reply_without_a_city_gives_none(location, body):
+    assert location(body).city() is None
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks import COMPOUND_COMMAND, COMPOUND_TASKS
+from main import DennisAssistant, ResponseCache, ResponseFieldExtractor
+
+TASK_SECONDS = 0.05
+
+
+class StubTaskAssistant(DennisAssistant):
+    """The model answers with a fixed reply; every task takes TASK_SECONDS and is logged"""
+
+    model_reply = {"tasks": COMPOUND_TASKS}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model_calls = []
+        self.events = []
+        self.events_lock = threading.Lock()
+
+    def request_model(self, user_input, history=()):
+        self.model_calls.append(user_input)
+        return json.dumps(self.model_reply)
+
+    def handle_developer_task(self, task_data):
+        with self.events_lock:
+            self.events.append(("start", task_data["task"], time.perf_counter()))
+        time.sleep(TASK_SECONDS)
+        with self.events_lock:
+            self.events.append(("end", task_data["task"], time.perf_counter()))
+        return f"{task_data['task']} done"
+
+
+def replies(assistant):
+    return [message for message_type, message in list(assistant.message_queue.queue)
+            if message_type == "assistant_response"]
+
+
+@pytest.fixture
+def assistant(make_assistant):
+    assistant = make_assistant(StubTaskAssistant)
+    assistant.response_cache = ResponseCache(os.path.join(assistant.data_dir, "cache.json"), max_entries=0)
+    return assistant
+
+
+def test_compound_command_runs_in_parallel_and_in_order(assistant):
+    assistant.process_user_input(COMPOUND_COMMAND)
+    times = {(kind, task): at for kind, task, at in assistant.events}
+    assert len(assistant.model_calls) == 1
+    # Tasks that do not touch the folder start while it is being created
+    for task in ("open_app", "current_time", "get_weather"):
+        assert times[("start", task)] < times[("end", "create_folder")]
+    # Opening the folder waits until it exists
+    assert times[("start", "open_folder")] >= times[("end", "create_folder")]
+    assert replies(assistant) == ["\n".join(f"{task['task']} done" for task in COMPOUND_TASKS)]
+
+
+@pytest.mark.parametrize("after", [3, "0", [True, None], {"0": 1}, None, -1])
+def test_malformed_after_is_ignored(assistant, after):
+    assistant.model_reply = {"tasks": [{"task": "current_time"}, {"task": "open_app", "after": after}]}
+    assistant.process_user_input("what time is it and open chrome")
+    assert replies(assistant) == ["current_time done\nopen_app done"]
+    assert DennisAssistant.task_dependencies(assistant.model_reply["tasks"]) == [set(), set()]
+
+
+def test_a_reply_that_breaks_is_answered_and_not_cached(make_assistant):
+    assistant = make_assistant(StubTaskAssistant)
+    assistant.model_reply = {"tasks": 5}
+    assistant.process_user_input("do five things")
+    assert len(replies(assistant)) == 1
+    assert assistant.response_cache.get("do five things") is None
+
+
+@pytest.mark.parametrize("tasks", [[], [None, "open_app"], "open_app"])
+def test_a_reply_without_usable_tasks_is_explained_and_not_cached(make_assistant, tasks):
+    assistant = make_assistant(StubTaskAssistant)
+    assistant.model_reply = {"tasks": tasks}
+    assistant.process_user_input("do nothing")
+    assert replies(assistant) == [
+        "Sorry, I encountered an error while processing your request: the model listed no tasks I can run"]
+    assert assistant.events == []
+    assert assistant.response_cache.get("do nothing") is None
+
+
+def streamed(reply, size):
+    extractor = ResponseFieldExtractor()
+    return "".join(extractor.feed(reply[i:i + size]) for i in range(0, len(reply), size))
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_only_a_top_level_response_streams(size):
+    compound = json.dumps({"tasks": [{"response": "Sure."}, {"task": "current_time"}]})
+    plain = json.dumps({"note": '"response": "no"', "meta": {"response": "no"},
+                        "response": "Yes \"quoted\" é \U0001F600."})
+    assert streamed(compound, size) == ""
+    assert streamed(plain, size) == json.loads(plain)["response"]
@@ -0,0 +1,102 @@
+import concurrent.futures
+import queue
+import random
+import threading
+import time
+
+import pytest
+
+from main import RequestPipeline
+
+TIMEOUT = 10
+
+
+def run_all(requests):
+    for request in requests:
+        try:
+            request.future.result(timeout=TIMEOUT)
+        except concurrent.futures.CancelledError:
+            pass
+
+
+def replies(output):
+    return [message for message_type, message in list(output.queue) if message_type == "assistant_response"]
+
+
+def random_backend(seed, max_delay=0.005):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def backend(request):
+        # Replies take a random time, so later requests often finish first
+        with lock:
+            delay = rng.random() * max_delay
+        time.sleep(delay)
+        request.post("status", f"working on {request.text}")
+        request.post("assistant_response", request.text)
+    return backend
+
+
+def test_replies_arrive_in_submission_order():
+    output = queue.Queue()
+    pipeline = RequestPipeline(random_backend(3), output, max_in_flight=4)
+    requests = [pipeline.submit(f"request {i}") for i in range(200)]
+    run_all(requests)
+    assert replies(output) == [r.text for r in requests]
+    assert pipeline.pending() == 0
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_supersede_drops_exactly_the_cancelled_requests(seed):
+    output = queue.Queue()
+    pipeline = RequestPipeline(random_backend(seed), output, max_in_flight=4)
+    requests = [pipeline.submit(f"request {i}", supersede=True) for i in range(100)]
+    run_all(requests)
+    assert replies(output) == [r.text for r in requests if not r.cancelled.is_set()]
+    assert not requests[-1].cancelled.is_set()
+    assert pipeline.pending() == 0
+
+
+def test_cancel_leaves_an_answered_request_alone():
+    output = queue.Queue()
+    answered = threading.Event()
+    release = threading.Event()
+
+    def backend(request):
+        request.post("assistant_response", request.text)
+        answered.set()
+        release.wait(TIMEOUT)
+
+    pipeline = RequestPipeline(backend, output)
+    request = pipeline.submit("first")
+    assert answered.wait(TIMEOUT)
+    assert pipeline.cancel(request) is False
+    assert not request.cancelled.is_set()
+    release.set()
+    run_all([request])
+    assert replies(output) == ["first"]
+
+
+def test_cancel_stops_a_running_handler_before_the_next_request_runs():
+    output = queue.Queue()
+    running = threading.Event()
+    stopped = threading.Event()
+
+    def backend(request):
+        if request.text == "slow":
+            running.set()
+            deadline = time.monotonic() + TIMEOUT
+            while not request.cancelled.is_set() and time.monotonic() < deadline:
+                time.sleep(0.001)
+            stopped.set()
+            request.post("assistant_response", "too late")
+        else:
+            request.post("assistant_response", request.text)
+
+    pipeline = RequestPipeline(backend, output, max_in_flight=1)
+    slow = pipeline.submit("slow")
+    assert running.wait(TIMEOUT)
+    fast = pipeline.submit("fast", supersede=True)
+    run_all([slow, fast])
+    assert slow.cancelled.is_set() and stopped.is_set()
+    assert replies(output) == ["fast"]
@@ -0,0 +1,98 @@
+import itertools
+import json
+import os
+import time
+
+from main import DennisAssistant, ResponseCache
+
+
+class StubModelAssistant(DennisAssistant):
+    """Counts model calls; the clock moves on every reading so a stale time would show"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model_calls = []
+        self.clock = itertools.count(1)
+
+    def request_model(self, user_input, history=()):
+        self.model_calls.append(user_input)
+        if "time" in user_input:
+            return json.dumps({"task": "current_time", "operation": None, "name": None, "path": None})
+        return json.dumps({"response": "The printing press was invented around 1440."})
+
+    def get_current_time(self):
+        return f"tick {next(self.clock)}"
+
+
+def replies(assistant):
+    return [message for message_type, message in list(assistant.message_queue.queue)
+            if message_type == "assistant_response"]
+
+
+def make_stub(make_assistant):
+    assistant = make_assistant(StubModelAssistant)
+    # Everything goes to the model, as utterances the router does not know would
+    assistant.intent_router.route = lambda utterance: None
+    return assistant
+
+
+def test_repeated_utterance_calls_the_model_once(make_assistant):
+    assistant = make_stub(make_assistant)
+    for n in range(20):
+        # Case and punctuation differences hit the same entry
+        assistant.process_user_input("WHO INVENTED THE PRINTING PRESS?" if n % 2 else "who invented the printing press")
+    assert len(assistant.model_calls) == 1
+    assert replies(assistant) == ["The printing press was invented around 1440."] * 20
+
+
+def test_current_time_is_cached_as_intent_and_answered_fresh(make_assistant):
+    assistant = make_stub(make_assistant)
+    for _ in range(5):
+        assistant.process_user_input("tell me the current time")
+    assert len(assistant.model_calls) == 1
+    cached = json.loads(assistant.response_cache.get("tell me the current time"))
+    assert cached["task"] == "current_time" and "tick" not in json.dumps(cached)
+    assert replies(assistant) == [f"tick {n}" for n in range(1, 6)]
+
+
+def test_follow_ups_are_not_cached(make_assistant):
+    assistant = make_stub(make_assistant)
+    assistant.process_user_input("who invented the printing press")
+    assistant.process_user_input("tell me more about it")
+    assistant.process_user_input("tell me more about it")
+    assert len(assistant.model_calls) == 3
+
+
+def test_entries_expire_and_can_be_discarded(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.json"), intent_ttl=60, answer_ttl=-1)
+    cache.put("what time is it", json.dumps({"task": "current_time"}))
+    cache.put("tell me a joke", json.dumps({"response": "..."}))
+    cache.put("not json", "{")
+    assert cache.get("What time is it?") is not None
+    assert cache.get("tell me a joke") is None
+    assert cache.get("not json") is None
+    cache.discard("what time is it")
+    assert cache.get("what time is it") is None
+
+
+def test_changes_are_saved_off_the_reply_path(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path, save_delay=60)
+    for n in range(10):
+        cache.put(f"question {n}", json.dumps({"response": f"answer {n}"}))
+    # Nothing is written while replies are being served
+    assert not os.path.exists(path)
+    cache.flush()
+    reloaded = ResponseCache(path)
+    assert reloaded.get("question 9") == json.dumps({"response": "answer 9"})
+    assert reloaded.stats()["entries"] == 10
+
+
+def test_the_save_timer_writes_pending_changes(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path, save_delay=0.01)
+    cache.put("question", json.dumps({"response": "answer"}))
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ResponseCache(path).get("question") is not None
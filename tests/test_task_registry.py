@@ -0,0 +1,18 @@
+import pytest
+
+from main import TaskRegistry
+
+
+@pytest.mark.parametrize("index", range(len(TaskRegistry.BUCKETS_MS)))
+def test_a_latency_on_a_bucket_edge_counts_in_the_bucket_above(index):
+    registry = TaskRegistry()
+    registry.register("task", lambda: None)
+    edge = TaskRegistry.BUCKETS_MS[index]
+    for ms in (edge - 1, edge, edge + 1):
+        registry._record("task", registry.get("task"), (), ms / 1000)
+    histogram = registry.stats()["task"]["histogram"]
+    below = f"<{edge}ms"
+    above = f"<{TaskRegistry.BUCKETS_MS[index + 1]}ms" if index + 1 < len(TaskRegistry.BUCKETS_MS) else f">={edge}ms"
+    assert histogram[below] == 1
+    assert histogram[above] == 2
+    assert sum(histogram.values()) == 3
@@ -0,0 +1,131 @@
+import random
+import threading
+
+from main import DennisAssistantUI, UIMessageQueue
+
+TIMEOUT = 10
+
+
+class HeadlessUI:
+    """DennisAssistantUI's queue draining without a window; applied messages are recorded"""
+
+    MAX_BATCH = DennisAssistantUI.MAX_BATCH
+    check_message_queue = DennisAssistantUI.check_message_queue
+    coalesce_messages = staticmethod(DennisAssistantUI.coalesce_messages)
+
+    def __init__(self):
+        self.message_queue = UIMessageQueue()
+        self.message_queue.notify = self.queue_notified
+        self.on_message_rendered = None
+        self.applied = []
+        self.wakeups = threading.Semaphore(0)
+        # Wake-ups asked for by the queue; a full batch also asks for one itself
+        self.notified = 0
+
+    def queue_notified(self):
+        self.notified += 1
+        self.notify_message()
+
+    def notify_message(self):
+        self.wakeups.release()
+
+    def handle_message(self, message_type, message):
+        self.applied.append((message_type, message))
+
+
+def test_messages_from_many_threads_leave_the_ui_consistent():
+    ui = HeadlessUI()
+    # Messages from every thread go through one lock, so the last one put is known
+    order_lock = threading.Lock()
+    last = {}
+    sent = []
+
+    def post(message):
+        with order_lock:
+            ui.message_queue.put(message)
+            last[message[0]] = message[1]
+            if message[0] == "input_fill" and message[1][1]:
+                sent.append(message[1][0])
+
+    def hammer(worker, seed):
+        rng = random.Random(seed)
+        for i in range(500):
+            post(("status", f"worker {worker} status {i}"))
+            if rng.random() < 0.1:
+                post(("progress", (f"worker {worker}", i / 500)))
+            if rng.random() < 0.05:
+                post(("input_fill", (f"worker {worker} text {i}", rng.random() < 0.2)))
+            if rng.random() < 0.02:
+                post(("mic_state", rng.random() < 0.5))
+
+    threads = [threading.Thread(target=hammer, args=(w, w)) for w in range(8)]
+    for thread in threads:
+        thread.start()
+    drains = 0
+    while any(thread.is_alive() for thread in threads) or not ui.message_queue.empty():
+        # Like the fallback timer, drain anyway if a wake-up does not come
+        ui.wakeups.acquire(timeout=0.05)
+        drains += 1
+        ui.check_message_queue(event="wake")
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    final = {}
+    for message_type, message in ui.applied:
+        final[message_type] = message
+    assert final == last
+    # Sending input is never coalesced away, and keeps its order
+    assert [message[0] for message_type, message in ui.applied
+            if message_type == "input_fill" and message[1]] == sent
+    # A burst costs one wake-up, not one per message
+    assert ui.notified <= drains + 1
+
+
+def test_coalescing_merges_deltas_and_keeps_the_last_state():
+    batch = [(message, n) for n, message in enumerate([
+        ("assistant_delta", "Hel"), ("assistant_delta", "lo"), ("status", "a"), ("status", "b"),
+        ("input_fill", ("par", False)), ("input_fill", ("partial", False)), ("input_fill", ("send me", True)),
+        ("input_fill", ("next", False)), ("assistant_response", "x"), ("assistant_response", "y"),
+    ])]
+    assert DennisAssistantUI.coalesce_messages(batch) == [
+        # A fill that sends replaces the partial text before it, but nothing replaces it
+        (("assistant_delta", "Hello"), 0), (("status", "b"), 2), (("input_fill", ("send me", True)), 4),
+        (("input_fill", ("next", False)), 7),
+        (("assistant_response", "x"), 8), (("assistant_response", "y"), 9),
+    ]
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback, *args):
+        self.scheduled.append(ms)
+
+
+def test_the_windows_wake_poll_slows_down_while_idle():
+    ui = HeadlessUI()
+    ui.root = FakeRoot()
+    ui.check_wake_flag = DennisAssistantUI.check_wake_flag.__get__(ui)
+    ui.WAKE_POLL_MS, ui.MAX_WAKE_POLL_MS = DennisAssistantUI.WAKE_POLL_MS, DennisAssistantUI.MAX_WAKE_POLL_MS
+    ui.wake_poll_interval = ui.WAKE_POLL_MS
+    ui.processing = ui.is_listening = False
+    ui._wake_pending = False
+    ui.wake_by_socket = False
+    ui.message_queue.notify = DennisAssistantUI.notify_message.__get__(ui)
+
+    for _ in range(10):
+        ui.check_wake_flag()
+    assert ui.root.scheduled[-1] == ui.MAX_WAKE_POLL_MS
+    # Under ten wake-ups a second once idle
+    assert 1000 / ui.root.scheduled[-1] < 10
+
+    ui.message_queue.put(("status", "hello"))
+    ui.check_wake_flag()
+    assert ui.applied == [("status", "hello")]
+    assert ui.root.scheduled[-1] == ui.WAKE_POLL_MS
+
+    ui.processing = True
+    for _ in range(5):
+        ui.check_wake_flag()
+    assert ui.root.scheduled[-5:] == [ui.WAKE_POLL_MS] * 5
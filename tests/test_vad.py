@@ -0,0 +1,32 @@
+from main import EnergyVAD
+
+SILENCE = 10
+VOICE = 5000
+
+
+def feed(vad, voiced_frames):
+    """Feed silence, a burst of speech and enough silence to end it; returns the finished utterances"""
+    frames = [SILENCE] * 20 + [VOICE] * voiced_frames + [SILENCE] * (vad.hangover_frames + 1)
+    results = [vad.feed(bytes([i % 256]), rms) for i, rms in enumerate(frames)]
+    return [result for result in results if result is not None]
+
+
+def test_a_short_burst_padded_by_the_preroll_is_dropped():
+    vad = EnergyVAD()
+    # 150 ms of speech; with the 300 ms pre-roll it used to pass the 250 ms minimum
+    assert feed(vad, 5) == []
+
+
+def test_speech_longer_than_the_minimum_is_returned_with_its_preroll():
+    vad = EnergyVAD()
+    utterances = feed(vad, 15)
+    assert len(utterances) == 1
+    assert len(utterances[0]) == vad._preroll.maxlen + 15 - vad.start_frames
+
+
+def test_the_minimum_counts_only_frames_after_a_short_preroll():
+    # Speech right after listening starts has less pre-roll than the buffer holds
+    vad = EnergyVAD()
+    frames = [VOICE] * (vad.start_frames + vad.min_speech_frames) + [SILENCE] * (vad.hangover_frames + 1)
+    results = [vad.feed(b"x", rms) for rms in frames]
+    assert [result for result in results if result is not None] == [b"x" * (vad.start_frames + vad.min_speech_frames)]